@@ -1,11 +1,17 @@
 import streamlit as st
-import pandas as pd
 from datetime import date, datetime, timedelta
-from database import init_db, SessionLocal, Task, Goal, Badge, UserStats, User, hash_password, verify_password
-from logic_llm import GoalAgent
-from logic_analytics import update_daily_stats, get_productivity_trends, forecast_productivity
-import plotly.express as px
-import plotly.graph_objects as go
+from database import init_db, SessionLocal, Task, Goal, UserStats, User, hash_password, verify_password
+from sqlalchemy import func, case, exc
+from logic_jobs import submit_planning_job, recover_jobs, get_queue_depth, get_recent_jobs
+from logic_analytics import get_productivity_trends, downsample_lttb, TREND_WEBGL_POINTS, forecast_productivity, get_dashboard_snapshot, get_goal_summaries, get_achievement_counts
+from logic_tasks import add_task, complete_task, delete_task, set_reminder, list_tasks, complete_tasks, delete_tasks, update_tasks, TASK_CATEGORIES, PAGE_SIZES
+from logic_reminders import get_reminder_scheduler
+from logic_timers import get_open_session, start_timer, stop_timer
+from logic_calendar import get_month_calendar, shift_month
+from logic_rollups import get_activity_heatmap, get_category_breakdown
+from logic_badges import get_unlocked_badges, BADGE_RULES
+from cache import get_cache, get_data_version
+from assets import use_stylesheet, use_script
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -14,28 +20,20 @@ st.set_page_config(
     layout="wide",
 )
 
-# Initialize Database
-init_db()
-update_daily_stats()
+# Process-wide resources: created on the first run, shared by every session and rerun
+@st.cache_resource(show_spinner=False)
+def get_session_factory():
+    """Engine-bound session factory; tables, migrations and job recovery run once per process."""
+    init_db()
+    recover_jobs()
+    return SessionLocal
+
+SessionLocal = get_session_factory()
 
 # --- Authentication ---
 def show_auth_page():
     """Show login/signup page"""
-    st.markdown("""
-        <style>
-        .auth-container {
-            max-width: 420px; margin: 60px auto; padding: 40px;
-            background: rgba(255,255,255,0.05); backdrop-filter: blur(20px);
-            border-radius: 24px; border: 1px solid rgba(255,255,255,0.1);
-        }
-        .auth-title {
-            text-align: center; font-size: 2rem; font-weight: 700; margin-bottom: 10px;
-            background: linear-gradient(90deg, #00d4ff, #a855f7);
-            -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-        }
-        .auth-subtitle { text-align: center; color: rgba(255,255,255,0.5); margin-bottom: 30px; }
-        </style>
-    """, unsafe_allow_html=True)
+    use_stylesheet("auth.css")
 
     st.markdown('<div class="auth-container">', unsafe_allow_html=True)
     st.markdown('<div class="auth-title">🚀 Productivity AI</div>', unsafe_allow_html=True)
@@ -116,99 +114,11 @@ def show_daily_reminder():
     is_dismissed_today = st.session_state.reminder_dismissed_date == current_date
     
     if is_reminder_time and not is_dismissed_today:
-        # Browser notification JavaScript (requests permission and shows notification)
-        st.markdown("""
-            <script>
-                // Request notification permission
-                if ('Notification' in window && Notification.permission === 'default') {
-                    Notification.requestPermission();
-                }
-                
-                // Show browser notification if permitted
-                if ('Notification' in window && Notification.permission === 'granted') {
-                    // Check if notification was already shown in this session
-                    if (!sessionStorage.getItem('dailyReminderShown')) {
-                        new Notification('🎯 Daily Target Reminder', {
-                            body: 'It\\'s time to set your daily targets! Stay focused and productive.',
-                            icon: '🚀',
-                            tag: 'daily-reminder'
-                        });
-                        sessionStorage.setItem('dailyReminderShown', 'true');
-                    }
-                }
-            </script>
-        """, unsafe_allow_html=True)
+        # Browser notification (asks for permission, then notifies once per browser session)
+        use_script("reminder.js")
         
-        # In-app animated reminder banner
+        # In-app animated reminder banner (styled by static/app.css)
         st.markdown("""
-            <style>
-                @keyframes reminderPulse {
-                    0%, 100% { 
-                        box-shadow: 0 0 20px rgba(0, 212, 255, 0.4), 0 0 40px rgba(168, 85, 247, 0.2);
-                    }
-                    50% { 
-                        box-shadow: 0 0 30px rgba(0, 212, 255, 0.6), 0 0 60px rgba(168, 85, 247, 0.4);
-                    }
-                }
-                @keyframes bellRing {
-                    0%, 100% { transform: rotate(0deg); }
-                    10%, 30%, 50% { transform: rotate(-10deg); }
-                    20%, 40% { transform: rotate(10deg); }
-                    60% { transform: rotate(0deg); }
-                }
-                .reminder-banner {
-                    background: linear-gradient(135deg, rgba(168, 85, 247, 0.3) 0%, rgba(0, 212, 255, 0.3) 50%, rgba(236, 72, 153, 0.3) 100%);
-                    backdrop-filter: blur(20px);
-                    -webkit-backdrop-filter: blur(20px);
-                    border: 1px solid rgba(255, 255, 255, 0.2);
-                    border-radius: 16px;
-                    padding: 20px 30px;
-                    margin-bottom: 20px;
-                    display: flex;
-                    align-items: center;
-                    justify-content: space-between;
-                    animation: reminderPulse 2s ease-in-out infinite;
-                    position: relative;
-                    overflow: hidden;
-                }
-                .reminder-banner::before {
-                    content: '';
-                    position: absolute;
-                    top: 0;
-                    left: -100%;
-                    width: 100%;
-                    height: 100%;
-                    background: linear-gradient(90deg, transparent, rgba(255,255,255,0.1), transparent);
-                    animation: shimmerBanner 3s infinite;
-                }
-                @keyframes shimmerBanner {
-                    0% { left: -100%; }
-                    100% { left: 100%; }
-                }
-                .reminder-icon {
-                    font-size: 2.5rem;
-                    margin-right: 20px;
-                    animation: bellRing 2s ease-in-out infinite;
-                    display: inline-block;
-                }
-                .reminder-content {
-                    flex: 1;
-                }
-                .reminder-title {
-                    font-size: 1.3rem;
-                    font-weight: 700;
-                    color: #fff;
-                    margin: 0 0 5px 0;
-                    background: linear-gradient(90deg, #fff, #00d4ff);
-                    -webkit-background-clip: text;
-                    -webkit-text-fill-color: transparent;
-                }
-                .reminder-subtitle {
-                    color: rgba(255, 255, 255, 0.8);
-                    font-size: 0.95rem;
-                    margin: 0;
-                }
-            </style>
             <div class="reminder-banner">
                 <span class="reminder-icon">🔔</span>
                 <div class="reminder-content">
@@ -232,385 +142,22 @@ def show_daily_reminder():
         st.markdown("<hr style='border: 1px solid rgba(255,255,255,0.1); margin: 20px 0;'>", unsafe_allow_html=True)
 
 def check_task_reminders():
-    """Check for specific task reminders"""
-    if 'shown_reminders' not in st.session_state:
-        st.session_state.shown_reminders = []
-        
-    db = SessionLocal()
-    # Get tasks with reminders set
-    tasks_with_reminders = db.query(Task).filter(Task.reminder_time.isnot(None), Task.status != "Completed").all()
-    
-    current_time = datetime.now()
-    
-    for task in tasks_with_reminders:
-        try:
-            reminder_dt = datetime.fromisoformat(task.reminder_time)
-            # Check if reminder is due (within last 15 mins) and not shown
-            if reminder_dt <= current_time and task.id not in st.session_state.shown_reminders:
-                if (current_time - reminder_dt).total_seconds() < 900: # 15 mins window
-                    st.toast(f"🔔 Reminder: {task.title}", icon="⏰")
-                    st.session_state.shown_reminders.append(task.id)
-                    # Play sound
-                    st.markdown("""
-                        <audio autoplay>
-                            <source src="https://assets.mixkit.co/active_storage/sfx/2869/2869-preview.mp3" type="audio/mpeg">
-                        </audio>
-                    """, unsafe_allow_html=True)
-        except ValueError:
-            pass
-            
-    db.close()
+    """Toast the current user's task reminders that have come due"""
+    for task_id, title in get_reminder_scheduler().pop_due(current_user_id):
+        st.toast(f"🔔 Reminder: {title}", icon="⏰")
+        # Play sound
+        st.markdown("""
+            <audio autoplay>
+                <source src="https://assets.mixkit.co/active_storage/sfx/2869/2869-preview.mp3" type="audio/mpeg">
+            </audio>
+        """, unsafe_allow_html=True)
 
 # Show reminder notification (will only display during 11 AM - 12 PM)
 show_daily_reminder()
 check_task_reminders()
 
 # --- Premium Custom Styling ---
-st.markdown("""
-    <style>
-    /* Import Google Font */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Root variables for consistent theming */
-    :root {
-        --bg-primary: #0a0a0f;
-        --bg-secondary: rgba(20, 20, 35, 0.8);
-        --accent-cyan: #00d4ff;
-        --accent-purple: #a855f7;
-        --accent-pink: #ec4899;
-        --accent-green: #10b981;
-        --glass-bg: rgba(255, 255, 255, 0.05);
-        --glass-border: rgba(255, 255, 255, 0.1);
-        --text-primary: #ffffff;
-        --text-secondary: rgba(255, 255, 255, 0.7);
-    }
-    
-    /* Main app background with animated gradient */
-    .stApp {
-        background: linear-gradient(135deg, #0a0a0f 0%, #1a1a2e 25%, #16213e 50%, #0f3460 75%, #0a0a0f 100%);
-        background-size: 400% 400%;
-        animation: gradientShift 15s ease infinite;
-    }
-    
-    @keyframes gradientShift {
-        0% { background-position: 0% 50%; }
-        50% { background-position: 100% 50%; }
-        100% { background-position: 0% 50%; }
-    }
-    
-    /* Global font */
-    /* Global font - target specific containers instead of * to avoid breaking icons */
-    html, body, [data-testid="stAppViewContainer"] {
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-    }
-    
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Sidebar styling */
-    [data-testid="stSidebar"] {
-        background: linear-gradient(180deg, rgba(10, 10, 20, 0.95) 0%, rgba(20, 20, 40, 0.95) 100%);
-        backdrop-filter: blur(20px);
-        border-right: 1px solid rgba(255, 255, 255, 0.1);
-    }
-    
-    [data-testid="stSidebar"] .stRadio > label {
-        color: white !important;
-        font-weight: 500;
-    }
-    
-    /* Glowing buttons */
-    .stButton > button {
-        width: 100%;
-        border-radius: 12px;
-        height: 3em;
-        background: linear-gradient(135deg, rgba(168, 85, 247, 0.2) 0%, rgba(0, 212, 255, 0.2) 100%);
-        color: #00d4ff;
-        border: 1px solid rgba(0, 212, 255, 0.5);
-        font-weight: 600;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        transition: all 0.3s ease;
-        box-shadow: 0 0 20px rgba(0, 212, 255, 0.1);
-    }
-    
-    .stButton > button:hover {
-        background: linear-gradient(135deg, rgba(0, 212, 255, 0.4) 0%, rgba(168, 85, 247, 0.4) 100%);
-        border-color: #00d4ff;
-        box-shadow: 0 0 30px rgba(0, 212, 255, 0.4), 0 0 60px rgba(168, 85, 247, 0.2);
-        transform: translateY(-2px);
-    }
-    
-    /* Glassmorphism cards */
-    .glass-card {
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border-radius: 16px;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        padding: 24px;
-        margin-bottom: 16px;
-        transition: all 0.3s ease;
-    }
-    
-    .glass-card:hover {
-        border-color: rgba(0, 212, 255, 0.3);
-        box-shadow: 0 8px 32px rgba(0, 212, 255, 0.1);
-        transform: translateY(-4px);
-    }
-    
-    /* KPI Cards */
-    .kpi-card {
-        background: linear-gradient(135deg, rgba(168, 85, 247, 0.1) 0%, rgba(0, 212, 255, 0.1) 100%);
-        backdrop-filter: blur(20px);
-        border-radius: 20px;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        padding: 24px;
-        text-align: center;
-        transition: all 0.3s ease;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .kpi-card::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        height: 3px;
-        background: linear-gradient(90deg, #a855f7, #00d4ff, #ec4899);
-        background-size: 200% 100%;
-        animation: shimmer 2s infinite;
-    }
-    
-    @keyframes shimmer {
-        0% { background-position: -200% 0; }
-        100% { background-position: 200% 0; }
-    }
-    
-    .kpi-card:hover {
-        transform: translateY(-8px) scale(1.02);
-        box-shadow: 0 20px 40px rgba(0, 212, 255, 0.2);
-    }
-    
-    .kpi-value {
-        font-size: 2.5rem;
-        font-weight: 700;
-        background: linear-gradient(135deg, #00d4ff, #a855f7);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-    }
-    
-    .kpi-label {
-        color: rgba(255, 255, 255, 0.7);
-        font-size: 0.9rem;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        margin-top: 8px;
-    }
-    
-    /* Task Cards */
-    .task-card {
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(10px);
-        border-radius: 16px;
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        padding: 20px;
-        margin-bottom: 12px;
-        transition: all 0.3s ease;
-        display: flex;
-        align-items: center;
-        gap: 16px;
-    }
-    
-    .task-card:hover {
-        background: rgba(255, 255, 255, 0.06);
-        border-color: rgba(0, 212, 255, 0.3);
-        transform: translateX(8px);
-    }
-    
-    .task-priority-high {
-        border-left: 4px solid #ef4444;
-    }
-    
-    .task-priority-medium {
-        border-left: 4px solid #f59e0b;
-    }
-    
-    .task-priority-low {
-        border-left: 4px solid #10b981;
-    }
-    
-    .task-title {
-        font-weight: 600;
-        font-size: 1.1rem;
-        color: #fff;
-        margin-bottom: 4px;
-    }
-    
-    .task-desc {
-        color: rgba(255, 255, 255, 0.6);
-        font-size: 0.9rem;
-    }
-    
-    /* Badge Cards */
-    .badge-card {
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(20px);
-        border-radius: 20px;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        padding: 30px 20px;
-        text-align: center;
-        transition: all 0.4s ease;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .badge-card.unlocked {
-        background: linear-gradient(135deg, rgba(168, 85, 247, 0.15) 0%, rgba(0, 212, 255, 0.15) 100%);
-    }
-    
-    .badge-card.unlocked::after {
-        content: '';
-        position: absolute;
-        top: -50%;
-        left: -50%;
-        width: 200%;
-        height: 200%;
-        background: linear-gradient(45deg, transparent, rgba(255,255,255,0.1), transparent);
-        animation: shine 3s infinite;
-    }
-    
-    @keyframes shine {
-        0% { transform: rotate(0deg); }
-        100% { transform: rotate(360deg); }
-    }
-    
-    .badge-card:hover {
-        transform: scale(1.05);
-        box-shadow: 0 10px 40px rgba(168, 85, 247, 0.3);
-    }
-    
-    .badge-icon {
-        font-size: 48px;
-        margin-bottom: 16px;
-        display: block;
-    }
-    
-    .badge-locked {
-        filter: grayscale(1) blur(1px);
-        opacity: 0.4;
-    }
-    
-    /* Form inputs */
-    .stTextInput > div > div > input,
-    .stTextArea > div > div > textarea {
-        background: rgba(255, 255, 255, 0.05) !important;
-        border: 1px solid rgba(255, 255, 255, 0.1) !important;
-        border-radius: 12px !important;
-        color: white !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stTextInput > div > div > input:focus,
-    .stTextArea > div > div > textarea:focus {
-        border-color: rgba(0, 212, 255, 0.5) !important;
-        box-shadow: 0 0 20px rgba(0, 212, 255, 0.2) !important;
-    }
-    
-    /* Selectbox and sliders */
-    .stSlider > div > div > div {
-        background: linear-gradient(90deg, #a855f7, #00d4ff) !important;
-    }
-    
-    /* Expander */
-    .streamlit-expanderHeader {
-        background: rgba(255, 255, 255, 0.05) !important;
-        border-radius: 12px !important;
-        border: 1px solid rgba(255, 255, 255, 0.1) !important;
-    }
-    
-    /* Metric styling */
-    [data-testid="stMetricValue"] {
-        font-size: 2rem !important;
-        font-weight: 700 !important;
-        background: linear-gradient(135deg, #00d4ff, #a855f7) !important;
-        -webkit-background-clip: text !important;
-        -webkit-text-fill-color: transparent !important;
-    }
-    
-    [data-testid="stMetricLabel"] {
-        color: rgba(255, 255, 255, 0.7) !important;
-        text-transform: uppercase !important;
-        letter-spacing: 1px !important;
-        font-size: 0.8rem !important;
-    }
-    
-    /* Info boxes */
-    .stAlert {
-        background: rgba(0, 212, 255, 0.1) !important;
-        border: 1px solid rgba(0, 212, 255, 0.3) !important;
-        border-radius: 12px !important;
-    }
-    
-    /* Success message */
-    .stSuccess {
-        background: rgba(16, 185, 129, 0.1) !important;
-        border: 1px solid rgba(16, 185, 129, 0.3) !important;
-        border-radius: 12px !important;
-    }
-    
-    /* Plotly chart background */
-    .js-plotly-plot {
-        border-radius: 16px !important;
-        overflow: hidden !important;
-    }
-    
-    /* Page titles */
-    h1 {
-        background: linear-gradient(135deg, #ffffff 0%, #00d4ff 50%, #a855f7 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        font-weight: 700 !important;
-        letter-spacing: -1px;
-    }
-    
-    h2, h3 {
-        color: rgba(255, 255, 255, 0.9) !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Scrollbar styling */
-    ::-webkit-scrollbar {
-        width: 8px;
-        height: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: rgba(255, 255, 255, 0.05);
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: linear-gradient(180deg, #a855f7, #00d4ff);
-        border-radius: 4px;
-    }
-    
-    /* Pulse animation for active elements */
-    @keyframes pulse {
-        0%, 100% { opacity: 1; }
-        50% { opacity: 0.7; }
-    }
-    
-    .pulse {
-        animation: pulse 2s infinite;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+use_stylesheet("app.css")
 
 # --- Sidebar Navigation ---
 # --- Sidebar Navigation ---
@@ -624,7 +171,7 @@ st.sidebar.markdown(f"""
 
 # Logout button
 if st.sidebar.button("🚪 Logout", use_container_width=True):
-    for key in ['user_id', 'username', 'navigation', 'goal_agent']:
+    for key in ['user_id', 'username', 'navigation']:
         st.session_state.pop(key, None)
     st.rerun()
 
@@ -646,21 +193,128 @@ st.sidebar.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Persistent Agents
-if 'goal_agent' not in st.session_state:
-    st.session_state.goal_agent = GoalAgent()
+# --- Task Actions ---
+# Task cards and the planner list are keyed fragments, so a click reruns only the
+# fragment it came from. Counters are fragments too: they register as listeners and
+# every action that changes task data reruns them by key.
+task_listeners = []
+task_cards = set()  # keys of the task card fragments rendered this run
+
+def task_listener(key):
+    """Decorator for a counter fragment that reruns whenever a task action changes task data."""
+    task_listeners.append(key)
+    return st.fragment(key=key)
+
+def run_task_action(task_id, action, fragment_key, celebrate=False):
+    """Button callback: apply action(db, task) to one of the user's tasks, then rerun its fragment and the listeners."""
+    db = SessionLocal()
+    task = db.query(Task).filter(Task.id == task_id, Task.user_id == current_user_id).first()
+    if task:
+        action(db, task)
+        db.commit()
+        st.session_state['celebrate'] = celebrate
+    db.close()
+    st.rerun([fragment_key, *task_listeners])
+
+def handle_timer_start(task_id):
+    """Button callback: start timing a task, then rerun its card and the card whose timer it stopped."""
+    db = SessionLocal()
+    try:
+        _, stopped = start_timer(db, current_user_id, task_id)
+        stopped_task_id = stopped.task_id if stopped else None
+        db.commit()
+    except exc.IntegrityError:
+        # A timer was started from another tab at the same moment
+        db.rollback()
+        stopped_task_id = None
+    db.close()
+    st.rerun([key for key in (f"task_card_{task_id}", f"task_card_{stopped_task_id}") if key in task_cards])
+
+def handle_timer_stop():
+    """Button callback: stop the user's running timer and credit the time to its task."""
+    db = SessionLocal()
+    stop_timer(db, current_user_id)
+    db.commit()
+    db.close()
+
+def toggle_edit_mode(task_id):
+    st.session_state[f'edit_mode_{task_id}'] = not st.session_state.get(f'edit_mode_{task_id}', False)
+
+# --- Bulk Actions ---
+# A list ("task" on My Tasks, "plan" in the Day Planner) ticks tasks with
+# {scope}_select_{id} checkboxes, or with row selection in its table view.
+def selected_task_ids(scope, task_ids):
+    table = st.session_state.get(f"{scope}_table_{st.session_state.get('bulk_runs', 0)}")
+    if table is not None:
+        return [task_ids[row] for row in table.selection.rows]
+    return [task_id for task_id in task_ids if st.session_state.get(f"{scope}_select_{task_id}")]
+
+def set_selection(scope, task_ids, selected):
+    for task_id in task_ids:
+        st.session_state[f"{scope}_select_{task_id}"] = selected
+
+def run_bulk_action(scope, action, task_ids, fragment_key=None):
+    """Button callback: apply one action to every ticked task in a single transaction."""
+    selected = selected_task_ids(scope, task_ids)
+    if not selected:
+        st.toast("Select some tasks first")
+        return
+    db = SessionLocal()
+    if action == "complete":
+        count = complete_tasks(db, current_user_id, selected)
+    elif action == "delete":
+        count = delete_tasks(db, current_user_id, selected)
+    elif action == "priority":
+        count = update_tasks(db, current_user_id, selected, priority={"Low": 1, "Medium": 2, "High": 3}[st.session_state[f"{scope}_bulk_priority"]])
+    else:
+        count = update_tasks(db, current_user_id, selected, **{action: st.session_state[f"{scope}_bulk_{action}"]})
+    db.commit()
+    db.close()
+    set_selection(scope, selected, False)
+    st.session_state['bulk_runs'] = st.session_state.get('bulk_runs', 0) + 1
+    st.toast(f"Updated {count} task(s)" if action not in ("complete", "delete") else f"{action.title()}d {count} task(s)")
+    if action == "complete" and count:
+        st.balloons()
+    if fragment_key:
+        st.rerun([fragment_key, *task_listeners])
+
+def bulk_actions_bar(scope, task_ids, fragment_key=None, table=False):
+    """
+    Complete, delete, reschedule, re-prioritize or re-categorize the ticked tasks in one go.
+    In table view rows are picked in the table itself, so the checkbox select-all/clear buttons are left out.
+    """
+    with st.expander("☑️ Bulk Actions", expanded=False):
+        b1, b2, b3, b4 = st.columns(4)
+        b1.button("✅ Complete selected", key=f"{scope}_bulk_complete", on_click=run_bulk_action, args=(scope, "complete", task_ids, fragment_key), use_container_width=True)
+        b2.button("❌ Delete selected", key=f"{scope}_bulk_delete", on_click=run_bulk_action, args=(scope, "delete", task_ids, fragment_key), use_container_width=True)
+        if table:
+            b3.caption("Pick rows in the table below; its header checkbox selects them all.")
+        else:
+            b3.button("Select all", key=f"{scope}_select_all", on_click=set_selection, args=(scope, task_ids, True), use_container_width=True)
+            b4.button("Clear selection", key=f"{scope}_select_none", on_click=set_selection, args=(scope, task_ids, False), use_container_width=True)
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            st.date_input("Reschedule to", value=date.today(), key=f"{scope}_bulk_due_date")
+            st.button("📅 Reschedule", key=f"{scope}_bulk_reschedule", on_click=run_bulk_action, args=(scope, "due_date", task_ids, fragment_key), use_container_width=True)
+        with c2:
+            st.selectbox("Priority", ["Low", "Medium", "High"], index=1, key=f"{scope}_bulk_priority")
+            st.button("Set priority", key=f"{scope}_bulk_set_priority", on_click=run_bulk_action, args=(scope, "priority", task_ids, fragment_key), use_container_width=True)
+        with c3:
+            st.selectbox("Category", TASK_CATEGORIES, key=f"{scope}_bulk_category")
+            st.button("Set category", key=f"{scope}_bulk_set_category", on_click=run_bulk_action, args=(scope, "category", task_ids, fragment_key), use_container_width=True)
 
 # --- Dashboard ---
 if menu == "Dashboard":
+    # Charting libraries are only needed on this page, so they are imported here
+    import pandas as pd
+    import plotly.graph_objects as go
+
     # Get data first
-    dates, scores, counts = get_productivity_trends()
-    db = SessionLocal()
-    streak = db.query(UserStats).order_by(UserStats.date.desc()).first()
-    streak_val = streak.streak_count if streak else 0
-    total_tasks_completed = db.query(Task).filter(Task.status == "Completed", Task.user_id == current_user_id).count()
-    pending_tasks = db.query(Task).filter(Task.status != "Completed", Task.user_id == current_user_id).count()
-    today_tasks = db.query(Task).filter(Task.due_date == date.today(), Task.status != "Completed", Task.user_id == current_user_id).all()
-    forecast = forecast_productivity()
+    _, week_scores, week_counts = get_productivity_trends(current_user_id, date.today() - timedelta(days=6), date.today())
+    snapshot = get_dashboard_snapshot(current_user_id)
+    streak_val = snapshot["streak"]
+    today_tasks = snapshot["today_tasks"]
+    forecast = forecast_productivity(current_user_id)
     
     # Time-based greeting
     current_hour = datetime.now().hour
@@ -714,7 +368,6 @@ if menu == "Dashboard":
     """, unsafe_allow_html=True)
     
     # --- Thought of the Day ---
-    import calendar as cal_mod
     thoughts = [
         "Believe you can and you're halfway there.",
         "Success is the sum of small efforts, repeated day in and day out.",
@@ -743,72 +396,26 @@ if menu == "Dashboard":
     """, unsafe_allow_html=True)
 
     # --- Full Monthly Calendar Grid ---
-    today = date.today()
-    cal_year, cal_month = today.year, today.month
-    month_name = today.strftime("%B %Y")
-    first_day_weekday = cal_mod.monthrange(cal_year, cal_month)[0]  # 0=Mon
-    days_in_month = cal_mod.monthrange(cal_year, cal_month)[1]
-
-    # Convert Monday=0 start to Sunday=0 start
-    start_offset = (first_day_weekday + 1) % 7
-
-    # Get task counts per day for this month
-    month_tasks_raw = db.query(Task).filter(
-        Task.user_id == current_user_id,
-        Task.due_date >= date(cal_year, cal_month, 1),
-        Task.due_date <= date(cal_year, cal_month, days_in_month)
-    ).all()
-    task_count_by_day = {}
-    for tk in month_tasks_raw:
-        if tk.due_date:
-            d = tk.due_date.day
-            task_count_by_day[d] = task_count_by_day.get(d, 0) + 1
-
-    day_headers = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-    header_html = "".join(
-        f'<div style="text-align:center; font-weight:700; color:{("#ef4444" if i in (0,6) else "rgba(255,255,255,0.7)")}; font-size:0.85rem; padding: 10px 0;">{d}</div>'
-        for i, d in enumerate(day_headers)
-    )
-
-    cells_html = ""
-    # Empty cells before month starts
-    for _ in range(start_offset):
-        cells_html += '<div style="min-height:70px; border: 1px solid rgba(255,255,255,0.05); padding: 6px;"></div>'
-
-    for day in range(1, days_in_month + 1):
-        is_today = (day == today.day)
-        weekday_idx = (start_offset + day - 1) % 7
-        is_weekend = weekday_idx in (0, 6)
-        tc = task_count_by_day.get(day, 0)
-
-        bg = "rgba(0,212,255,0.2)" if is_today else ("rgba(239,68,68,0.06)" if is_weekend else "rgba(255,255,255,0.02)")
-        border = "2px solid #00d4ff" if is_today else "1px solid rgba(255,255,255,0.06)"
-        num_color = "#00d4ff" if is_today else ("#ef4444" if is_weekend else "rgba(255,255,255,0.8)")
-        dot_html = f'<div style="margin-top:4px;"><span style="background:#a855f7; color:#fff; font-size:0.65rem; padding:1px 6px; border-radius:8px;">{tc} task{"s" if tc != 1 else ""}</span></div>' if tc > 0 else ""
-
-        cells_html += f'''<div style="min-height:70px; border:{border}; padding:6px; background:{bg}; border-radius:4px; transition: all 0.2s ease;">
-            <div style="font-weight:{'700' if is_today else '500'}; font-size:0.95rem; color:{num_color};">{day}</div>
-            {dot_html}
-        </div>'''
-
-    # Fill remaining cells to complete the grid
-    total_cells = start_offset + days_in_month
-    remaining = (7 - total_cells % 7) % 7
-    for _ in range(remaining):
-        cells_html += '<div style="min-height:70px; border: 1px solid rgba(255,255,255,0.05); padding: 6px;"></div>'
+    # Paging reruns only this fragment; grids are cached per data version and the
+    # neighbouring months are rendered in the background.
+    def change_month(delta):
+        today = date.today()
+        year, month = st.session_state.get('calendar_month', (today.year, today.month))
+        st.session_state['calendar_month'] = shift_month(year, month, delta) if delta else (today.year, today.month)
 
-    st.markdown(f"""
-        <div class="glass-card" style="padding: 24px; margin-bottom: 24px;">
-            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 16px;">
-                <h3 style="margin: 0; background: linear-gradient(90deg, #fff, #00d4ff); -webkit-background-clip: text; -webkit-text-fill-color: transparent;">📅 {month_name}</h3>
-                <div style="color: rgba(255,255,255,0.5); font-size: 0.85rem;">Today: {today.strftime('%A, %b %d')}</div>
-            </div>
-            <div style="display: grid; grid-template-columns: repeat(7, 1fr); gap: 2px;">
-                {header_html}
-                {cells_html}
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+    @st.fragment
+    def month_calendar():
+        today = date.today()
+        year, month = st.session_state.setdefault('calendar_month', (today.year, today.month))
+        n1, n2, n3, _ = st.columns([0.08, 0.1, 0.08, 0.74])
+        n1.button("◀", key="calendar_prev", help="Previous month", on_click=change_month, args=(-1,), use_container_width=True)
+        n2.button("Today", key="calendar_today", on_click=change_month, args=(0,), use_container_width=True)
+        n3.button("▶", key="calendar_next", help="Next month", on_click=change_month, args=(1,), use_container_width=True)
+        calendar_cache = get_month_calendar()
+        st.markdown(calendar_cache.get(current_user_id, year, month, today), unsafe_allow_html=True)
+        calendar_cache.prefetch(current_user_id, year, month, today)
+
+    month_calendar()
 
     # Main Dashboard Layout - Two Columns
     left_col, right_col = st.columns([2, 1])
@@ -820,7 +427,7 @@ if menu == "Dashboard":
         k1, k2, k3, k4 = st.columns(4)
         
         with k1:
-            score_val = scores[-1] if scores else 0
+            score_val = snapshot["score"]
             # Circular progress indicator
             st.markdown(f"""
                 <div class="kpi-card" style="position: relative;">
@@ -840,7 +447,7 @@ if menu == "Dashboard":
             """, unsafe_allow_html=True)
         
         with k2:
-            tasks_today = counts[-1] if counts else 0
+            tasks_today = snapshot["done_today"]
             st.markdown(f"""
                 <div class="kpi-card">
                     <div style="font-size: 3rem; margin-bottom: 5px;">✅</div>
@@ -859,20 +466,38 @@ if menu == "Dashboard":
             """, unsafe_allow_html=True)
         
         with k4:
-            forecast_val = f"{forecast:.0f}" if forecast else "—"
+            forecast_val = f"{forecast['values'][0]:.0f}" if forecast else "—"
+            forecast_range = f" · {forecast['lower'][0]:.0f}–{forecast['upper'][0]:.0f}" if forecast else ""
             st.markdown(f"""
-                <div class="kpi-card">
+                <div class="kpi-card" title="Tomorrow's score with its 80% prediction interval">
                     <div style="font-size: 3rem; margin-bottom: 5px;">🎯</div>
                     <div class="kpi-value" style="font-size: 2rem;">{forecast_val}</div>
-                    <div class="kpi-label">Forecast</div>
+                    <div class="kpi-label">Forecast{forecast_range}</div>
                 </div>
             """, unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
         
+        # Trend range and bucket size; buckets are grouped in SQL
+        trend_ranges = {"Last 30 days": 30, "Last 90 days": 90, "Last year": 365, "All time": None}
+        r1, r2 = st.columns(2)
+        with r1:
+            trend_range = st.selectbox("Range", list(trend_ranges), index=2, key="trend_range")
+        with r2:
+            granularity = st.selectbox("Group by", ["Day", "Week", "Month"], key="trend_granularity")
+        range_days = trend_ranges[trend_range]
+        dates, scores, counts = get_productivity_trends(
+            current_user_id, date.today() - timedelta(days=range_days - 1) if range_days else None, date.today(), granularity.lower())
+        
         # Multiple Chart Types with Tabs
         if dates:
             df = pd.DataFrame({"Date": dates, "Score": scores, "Tasks": counts})
+            # Line and area traces carry at most TREND_POINT_BUDGET points (LTTB keeps the peaks),
+            # drawn with WebGL if that is still a lot of points
+            ordinals = [d.toordinal() for d in dates]
+            keep = downsample_lttb(ordinals, scores)
+            line_dates, line_scores = [dates[i] for i in keep], [scores[i] for i in keep]
+            Scatter = go.Scattergl if len(keep) > TREND_WEBGL_POINTS else go.Scatter
             
             st.markdown("""
                 <div class="glass-card" style="padding: 20px;">
@@ -880,20 +505,22 @@ if menu == "Dashboard":
             """, unsafe_allow_html=True)
             
             # Chart type selector using tabs
-            chart_tab1, chart_tab2, chart_tab3, chart_tab4 = st.tabs([
+            chart_tab1, chart_tab2, chart_tab3, chart_tab4, chart_tab5, chart_tab6 = st.tabs([
                 "📈 Line Chart", 
                 "📊 Bar Chart", 
                 "📉 Area Chart", 
-                "🔄 Combined View"
+                "🔄 Combined View",
+                "🟩 Activity",
+                "🏷️ Categories"
             ])
             
             with chart_tab1:
                 # Line Chart - Productivity Score over time
                 fig_line = go.Figure()
-                fig_line.add_trace(go.Scatter(
-                    x=df["Date"], y=df["Score"],
+                fig_line.add_trace(Scatter(
+                    x=line_dates, y=line_scores,
                     mode='lines+markers',
-                    line=dict(color='#00d4ff', width=3, shape='spline'),
+                    line=dict(color='#00d4ff', width=3, shape='spline' if Scatter is go.Scatter else 'linear'),
                     marker=dict(size=10, color='#a855f7', line=dict(width=2, color='#00d4ff')),
                     name='Productivity Score',
                     hovertemplate='<b>Date:</b> %{x}<br><b>Score:</b> %{y:.1f}<extra></extra>'
@@ -943,8 +570,8 @@ if menu == "Dashboard":
             with chart_tab3:
                 # Area Chart - Score with gradient fill
                 fig_area = go.Figure()
-                fig_area.add_trace(go.Scatter(
-                    x=df["Date"], y=df["Score"],
+                fig_area.add_trace(Scatter(
+                    x=line_dates, y=line_scores,
                     fill='tozeroy',
                     fillcolor='rgba(0, 212, 255, 0.2)',
                     line=dict(color='#00d4ff', width=2),
@@ -956,9 +583,10 @@ if menu == "Dashboard":
                 max_score = max(scores) if scores else 100
                 max_tasks = max(1, max(counts)) if counts else 1  # Avoid division by zero
                 scale_factor = (max_score / max_tasks) * 0.8 if max_tasks > 0 else 0
-                scaled_tasks = [t * scale_factor for t in counts]
-                fig_area.add_trace(go.Scatter(
-                    x=df["Date"], y=scaled_tasks,
+                keep_tasks = downsample_lttb(ordinals, counts)
+                scaled_tasks = [counts[i] * scale_factor for i in keep_tasks]
+                fig_area.add_trace(Scatter(
+                    x=[dates[i] for i in keep_tasks], y=scaled_tasks,
                     fill='tozeroy',
                     fillcolor='rgba(168, 85, 247, 0.2)',
                     line=dict(color='#a855f7', width=2),
@@ -986,8 +614,8 @@ if menu == "Dashboard":
                 fig_combined = go.Figure()
                 
                 # Productivity Score (primary y-axis)
-                fig_combined.add_trace(go.Scatter(
-                    x=df["Date"], y=df["Score"],
+                fig_combined.add_trace(Scatter(
+                    x=line_dates, y=line_scores,
                     mode='lines+markers',
                     line=dict(color='#00d4ff', width=3),
                     marker=dict(size=8, color='#00d4ff'),
@@ -1032,12 +660,84 @@ if menu == "Dashboard":
                 st.plotly_chart(fig_combined, use_container_width=True)
                 st.caption("🔄 Combined view showing score trend with task bars")
             
+            # Both tabs read the daily rollups: one primary-key range scan over the last year
+            year_end = date.today()
+            year_start = year_end - timedelta(days=52 * 7 + year_end.weekday())  # Monday, 53 weeks back
+            
+            with chart_tab5:
+                # Contribution heatmap - one cell per day, weeks as columns
+                activity = get_activity_heatmap(current_user_id, year_start, year_end)
+                weeks = (year_end - year_start).days // 7 + 1
+                z = [[None] * weeks for _ in range(7)]
+                hover = [[""] * weeks for _ in range(7)]
+                for offset in range((year_end - year_start).days + 1):
+                    day = year_start + timedelta(days=offset)
+                    done, seconds = activity.get(day, (0, 0))
+                    z[day.weekday()][offset // 7] = done
+                    hover[day.weekday()][offset // 7] = f"{day:%a %d %b %Y}<br>{done} task(s) · {seconds / 3600:.1f}h tracked"
+                fig_heat = go.Figure(go.Heatmap(
+                    z=z, text=hover,
+                    x=[year_start + timedelta(weeks=w) for w in range(weeks)],
+                    y=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+                    colorscale=[[0, 'rgba(255,255,255,0.05)'], [0.01, '#0e4429'], [0.5, '#26a641'], [1, '#39d353']],
+                    xgap=3, ygap=3, showscale=False,
+                    hovertemplate='%{text}<extra></extra>'
+                ))
+                fig_heat.update_layout(
+                    template="plotly_dark",
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    xaxis=dict(showgrid=False, title=None, tickformat="%b", dtick="M1"),
+                    yaxis=dict(showgrid=False, title=None, autorange="reversed"),
+                    font=dict(color='rgba(255,255,255,0.7)'),
+                    margin=dict(l=40, r=20, t=20, b=40),
+                    height=220
+                )
+                st.plotly_chart(fig_heat, use_container_width=True)
+                st.caption(f"🟩 Tasks completed per day over the last year · {sum(done for done, _ in activity.values())} in total")
+            
+            with chart_tab6:
+                # Category breakdown - tasks and tracked hours per category
+                breakdown = get_category_breakdown(current_user_id, year_start, year_end)
+                if breakdown:
+                    names = [name for name, _, _, _ in breakdown]
+                    fig_cat = go.Figure()
+                    fig_cat.add_trace(go.Bar(
+                        x=names, y=[done for _, done, _, _ in breakdown],
+                        marker=dict(color='#00d4ff'),
+                        name='Tasks',
+                        hovertemplate='<b>%{x}</b><br>Tasks: %{y}<extra></extra>'
+                    ))
+                    fig_cat.add_trace(go.Bar(
+                        x=names, y=[seconds / 3600 for _, _, _, seconds in breakdown],
+                        marker=dict(color='#a855f7'),
+                        name='Hours tracked',
+                        hovertemplate='<b>%{x}</b><br>Hours: %{y:.1f}<extra></extra>'
+                    ))
+                    fig_cat.update_layout(
+                        template="plotly_dark",
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        xaxis=dict(gridcolor='rgba(255,255,255,0.05)', title=None),
+                        yaxis=dict(gridcolor='rgba(255,255,255,0.05)', title=None),
+                        font=dict(color='rgba(255,255,255,0.7)'),
+                        margin=dict(l=40, r=20, t=20, b=40),
+                        barmode='group',
+                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                        height=300,
+                        bargap=0.3
+                    )
+                    st.plotly_chart(fig_cat, use_container_width=True)
+                    st.caption("🏷️ Tasks completed and hours tracked per category over the last year")
+                else:
+                    st.info("No completed tasks or tracked time in the last year yet.")
+            
             st.markdown("</div>", unsafe_allow_html=True)
         else:
-            st.markdown("""
+            st.markdown(f"""
                 <div class="glass-card" style="text-align: center; padding: 60px 40px;">
                     <div style="font-size: 4rem; margin-bottom: 20px; opacity: 0.5;">📈</div>
-                    <h4 style="color: rgba(255,255,255,0.7); margin: 0;">No data yet</h4>
+                    <h4 style="color: rgba(255,255,255,0.7); margin: 0;">No data {"yet" if range_days is None else "in this range"}</h4>
                     <p style="color: rgba(255,255,255,0.4); margin: 10px 0 0 0;">Complete some tasks to see your productivity trends!</p>
                 </div>
             """, unsafe_allow_html=True)
@@ -1067,8 +767,8 @@ if menu == "Dashboard":
         st.markdown("<h3 style='margin-top: 30px; margin-bottom: 20px;'>🎯 Today's Focus</h3>", unsafe_allow_html=True)
         
         if today_tasks:
-            for i, task in enumerate(today_tasks[:5]):  # Show max 5
-                priority_color = "#ef4444" if task.priority == 3 else "#f59e0b" if task.priority == 2 else "#10b981"
+            for i, task in enumerate(today_tasks):  # Top 5 by priority
+                priority_color = "#ef4444" if task["priority"] == 3 else "#f59e0b" if task["priority"] == 2 else "#10b981"
                 st.markdown(f"""
                     <div style="
                         background: rgba(255,255,255,0.03);
@@ -1078,17 +778,17 @@ if menu == "Dashboard":
                         border-left: 3px solid {priority_color};
                         transition: all 0.3s ease;
                     ">
-                        <div style="font-weight: 600; color: #fff; font-size: 0.95rem;">{task.title}</div>
+                        <div style="font-weight: 600; color: #fff; font-size: 0.95rem;">{task["title"]}</div>
                         <div style="color: rgba(255,255,255,0.5); font-size: 0.8rem; margin-top: 4px;">
-                            {"🔴 High" if task.priority == 3 else "🟡 Medium" if task.priority == 2 else "🟢 Low"} priority
+                            {"🔴 High" if task["priority"] == 3 else "🟡 Medium" if task["priority"] == 2 else "🟢 Low"} priority
                         </div>
                     </div>
                 """, unsafe_allow_html=True)
             
-            if len(today_tasks) > 5:
+            if snapshot["today_pending_total"] > len(today_tasks):
                 st.markdown(f"""
                     <p style="text-align: center; color: rgba(255,255,255,0.4); font-size: 0.85rem;">
-                        +{len(today_tasks) - 5} more tasks
+                        +{snapshot["today_pending_total"] - len(today_tasks)} more tasks
                     </p>
                 """, unsafe_allow_html=True)
         else:
@@ -1103,8 +803,8 @@ if menu == "Dashboard":
         # Weekly Summary
         st.markdown("<h3 style='margin-top: 30px; margin-bottom: 20px;'>📅 This Week</h3>", unsafe_allow_html=True)
         
-        weekly_completed = sum(counts[-7:]) if len(counts) >= 7 else sum(counts)
-        weekly_avg = sum(scores[-7:]) / min(len(scores), 7) if scores else 0
+        weekly_completed = sum(week_counts)
+        weekly_avg = sum(week_scores) / len(week_scores) if week_scores else 0
         
         st.markdown(f"""
             <div class="glass-card" style="padding: 20px;">
@@ -1123,8 +823,6 @@ if menu == "Dashboard":
                 </div>
             </div>
         """, unsafe_allow_html=True)
-    
-    db.close()
 
 # --- My Tasks ---
 elif menu == "My Tasks":
@@ -1144,7 +842,7 @@ elif menu == "My Tasks":
             with col2:
                 difficulty = st.slider("Difficulty", 1, 5, 3)
             with col3:
-                category = st.selectbox("Category", ["General", "Learning", "Coding", "Health", "Work", "Personal"])
+                category = st.selectbox("Category", TASK_CATEGORIES)
             col4, col5 = st.columns(2)
             with col4:
                 due_date = st.date_input("📅 Due Date", value=date.today())
@@ -1153,200 +851,250 @@ elif menu == "My Tasks":
             submitted = st.form_submit_button("✨ Add Task")
             if submitted and title:
                 priority_map = {"Low": 1, "Medium": 2, "High": 3}
-                rem_str = None
-                if reminder_time:
-                    rem_dt = datetime.combine(due_date, reminder_time)
-                    rem_str = rem_dt.isoformat()
-                new_t = Task(title=title, description=desc, priority=priority_map[priority], difficulty=difficulty, category=category, due_date=due_date, reminder_time=rem_str, user_id=current_user_id)
-                db.add(new_t)
+                rem_dt = datetime.combine(due_date, reminder_time) if reminder_time else None
+                new_t = Task(title=title, description=desc, priority=priority_map[priority], difficulty=difficulty, category=category, due_date=due_date, reminder_at=rem_dt, user_id=current_user_id)
+                add_task(db, new_t)
                 db.commit()
                 st.success("🎉 Task added successfully!")
                 st.rerun()
 
-    # List Tasks
-    st.markdown("<h3 style='margin-top: 20px;'>📌 Pending Tasks</h3>", unsafe_allow_html=True)
-    tasks = db.query(Task).filter(Task.status != "Completed", Task.user_id == current_user_id).all()
-    
-    if tasks:
-        for t in tasks:
-            priority_class = "high" if t.priority == 3 else "medium" if t.priority == 2 else "low"
-            priority_emoji = "🔴" if t.priority == 3 else "🟡" if t.priority == 2 else "🟢"
-            
-            col1, col2, col3 = st.columns([0.65, 0.2, 0.15])
-            with col1:
-                st.markdown(f"""
-                    <div class="task-card task-priority-{priority_class}">
-                        <div>
-                            <div class="task-title">{priority_emoji} {t.title} <span style="font-size: 0.7rem; background: rgba(255,255,255,0.1); padding: 2px 6px; border-radius: 4px; margin-left: 8px; color: rgba(255,255,255,0.7);">{t.category}</span></div>
-                            <div class="task-desc">{t.description if t.description else 'No description'}</div>
-                            <div style="font-size: 0.75rem; color: rgba(255,255,255,0.4); margin-top: 5px;">
-                                ⏱️ Spent: {t.time_spent // 60}m {t.time_spent % 60}s | 📅 Due: {t.due_date} {f"| ⏰ {datetime.fromisoformat(t.reminder_time).strftime('%H:%M')}" if t.reminder_time else ""}
-                            </div>
+    # List Tasks: filters and sort run in SQL, and pages are fetched by keyset so
+    # "Load more" costs one index seek per page however long the list is
+    c1, c2, c3, c4, c5, c6 = st.columns([0.3, 0.14, 0.14, 0.14, 0.12, 0.16])
+    with c1:
+        search = st.text_input("🔍 Search", key="task_search", placeholder="Search titles...")
+    with c2:
+        sort_label = st.selectbox("Sort by", ["Due date", "Priority"], key="task_sort")
+    with c3:
+        category_filter = st.selectbox("Category", ["All", *TASK_CATEGORIES], key="task_category")
+    with c4:
+        priority_filter = st.selectbox("Priority", ["All", "Low", "Medium", "High"], key="task_priority")
+    with c5:
+        page_size = st.selectbox("Page size", PAGE_SIZES, index=PAGE_SIZES.index(25), key="task_page_size")
+    with c6:
+        view = st.radio("View", ["Cards", "Table"], key="task_view", horizontal=True)
+
+    filters = (search.strip(), sort_label, category_filter, priority_filter, page_size)
+    if st.session_state.get('task_filters') != filters:
+        st.session_state['task_filters'] = filters
+        st.session_state['task_cursors'] = [None]
+
+    tasks, cursor = [], None
+    for after in st.session_state['task_cursors']:
+        page, cursor = list_tasks(
+            db, current_user_id, sort="due" if sort_label == "Due date" else "priority", after=after, limit=page_size,
+            category=None if category_filter == "All" else category_filter,
+            priority=None if priority_filter == "All" else {"Low": 1, "Medium": 2, "High": 3}[priority_filter],
+            search=filters[0] or None)
+        tasks += page
+        if cursor is None:
+            break
+    running_timer = get_open_session(db, current_user_id)
+    db.close()
+    # Cards render from this first load; their fragment reruns reload just their own task
+    prefetched_tasks = {t.id: t for t in tasks}
+
+    def load_more(cursor):
+        st.session_state['task_cursors'].append(cursor)
+
+    @task_listener("pending_header")
+    def pending_header():
+        db = SessionLocal()
+        pending = db.query(Task).filter(Task.status != "Completed", Task.user_id == current_user_id).count()
+        db.close()
+        st.markdown(f"<h3 style='margin-top: 20px;'>📌 Pending Tasks ({pending})</h3>", unsafe_allow_html=True)
+        if not pending:
+            st.markdown("""
+                <div class="glass-card" style="text-align: center; padding: 40px;">
+                    <p style="font-size: 1.2rem; color: rgba(255,255,255,0.5);">🎉 All caught up! No pending tasks.</p>
+                </div>
+            """, unsafe_allow_html=True)
+
+    @st.fragment(run_every=1)
+    def timer_display(started_at):
+        elapsed = int((datetime.now() - started_at).total_seconds())
+        st.info(f"⏱️ {elapsed // 60}:{elapsed % 60:02d}")
+
+    def task_card(task_id, card_key):
+        if st.session_state.pop('celebrate', False):
+            st.balloons()
+
+        db = SessionLocal()
+        t = prefetched_tasks.pop(task_id, None)
+        if t:
+            t, timer = db.merge(t, load=False), running_timer
+        else:
+            t = db.query(Task).filter(Task.id == task_id, Task.user_id == current_user_id).first()
+            timer = get_open_session(db, current_user_id)
+        if t is None or t.status == "Completed":
+            # Completed or deleted: the counters rerun alongside this card and pick up the change
+            db.close()
+            return
+
+        priority_class = "high" if t.priority == 3 else "medium" if t.priority == 2 else "low"
+        priority_emoji = "🔴" if t.priority == 3 else "🟡" if t.priority == 2 else "🟢"
+        
+        col1, col2, col3 = st.columns([0.65, 0.2, 0.15])
+        with col1:
+            st.markdown(f"""
+                <div class="task-card task-priority-{priority_class}">
+                    <div>
+                        <div class="task-title">{priority_emoji} {t.title} <span style="font-size: 0.7rem; background: rgba(255,255,255,0.1); padding: 2px 6px; border-radius: 4px; margin-left: 8px; color: rgba(255,255,255,0.7);">{t.category}</span></div>
+                        <div class="task-desc">{t.description if t.description else 'No description'}</div>
+                        <div style="font-size: 0.75rem; color: rgba(255,255,255,0.4); margin-top: 5px;">
+                            ⏱️ Spent: {t.time_spent // 60}m {t.time_spent % 60}s | 📅 Due: {t.due_date} {f"| ⏰ {t.reminder_at.strftime('%H:%M')}" if t.reminder_at else ""}
                         </div>
                     </div>
-                """, unsafe_allow_html=True)
-                
-                # Inline Edit Form
-                if st.session_state.get(f'edit_mode_{t.id}', False):
-                    with st.expander("✏️ Edit Task", expanded=True):
-                        with st.form(f"edit_task_{t.id}"):
-                            new_title = st.text_input("Title", value=t.title)
-                            new_desc = st.text_area("Description", value=t.description)
-                            c1, c2, c3 = st.columns(3)
-                            with c1:
-                                new_priority = st.selectbox("Priority", ["Low", "Medium", "High"], index=["Low", "Medium", "High"].index(["Low", "Medium", "High"][t.priority-1]))
-                            with c2:
-                                reminder_val = None
-                                if t.reminder_time:
-                                    try:
-                                        reminder_val = datetime.fromisoformat(t.reminder_time).time()
-                                    except:
-                                        pass
-                                new_reminder = st.time_input("Set Reminder", value=reminder_val)
-                            with c3:
-                                new_due_date = st.date_input("Due Date", value=t.due_date)
+                </div>
+            """, unsafe_allow_html=True)
+            
+            # Inline Edit Form
+            if st.session_state.get(f'edit_mode_{t.id}', False):
+                with st.expander("✏️ Edit Task", expanded=True):
+                    with st.form(f"edit_task_{t.id}"):
+                        new_title = st.text_input("Title", value=t.title)
+                        new_desc = st.text_area("Description", value=t.description)
+                        c1, c2, c3 = st.columns(3)
+                        with c1:
+                            new_priority = st.selectbox("Priority", ["Low", "Medium", "High"], index=["Low", "Medium", "High"].index(["Low", "Medium", "High"][t.priority-1]))
+                        with c2:
+                            reminder_val = t.reminder_at.time() if t.reminder_at else None
+                            new_reminder = st.time_input("Set Reminder", value=reminder_val)
+                        with c3:
+                            new_due_date = st.date_input("Due Date", value=t.due_date)
+                            
+                        if st.form_submit_button("💾 Save Changes"):
+                            t.title = new_title
+                            t.description = new_desc
+                            t.priority = {"Low": 1, "Medium": 2, "High": 3}[new_priority]
+                            t.due_date = new_due_date
+                            if new_reminder:
+                                # Combine today/due date with time for reminder
+                                rem_dt = datetime.combine(date.today(), new_reminder)
+                                # If time is in past for today, assume it's for the due date
+                                if rem_dt < datetime.now() and new_due_date > date.today():
+                                    rem_dt = datetime.combine(new_due_date, new_reminder)
+                                set_reminder(db, t, rem_dt)
+                            else:
+                                set_reminder(db, t, None)
                                 
-                            if st.form_submit_button("💾 Save Changes"):
-                                t.title = new_title
-                                t.description = new_desc
-                                t.priority = {"Low": 1, "Medium": 2, "High": 3}[new_priority]
-                                t.due_date = new_due_date
-                                if new_reminder:
-                                    # Combine today/due date with time for reminder
-                                    rem_dt = datetime.combine(date.today(), new_reminder)
-                                    # If time is in past for today, assume it's for the due date
-                                    if rem_dt < datetime.now() and new_due_date > date.today():
-                                        rem_dt = datetime.combine(new_due_date, new_reminder)
-                                    t.reminder_time = rem_dt.isoformat()
-                                else:
-                                    t.reminder_time = None
-                                    
-                                db.commit()
-                                st.session_state[f'edit_mode_{t.id}'] = False
-                                st.success("Task updated!")
-                                st.rerun()
+                            db.commit()
+                            db.close()
+                            st.session_state[f'edit_mode_{t.id}'] = False
+                            st.rerun(scope="fragment")
 
-            with col2:
-                # Timer Controls
-                if st.session_state.get('active_timer_task_id') == t.id:
-                    # Active Timer
-                    elapsed = int((datetime.now() - st.session_state['active_timer_start']).total_seconds())
-                    st.info(f"⏱️ {elapsed // 60}:{elapsed % 60:02d}")
-                    if st.button("⏹ Stop", key=f"stop_timer_{t.id}"):
-                        t.time_spent += elapsed
-                        db.commit()
-                        st.session_state['active_timer_task_id'] = None
-                        st.rerun()
-                else:
-                    # Inactive Timer
-                    if st.button("▶ Start", key=f"start_timer_{t.id}"):
-                        st.session_state['active_timer_task_id'] = t.id
-                        st.session_state['active_timer_start'] = datetime.now()
-                        st.rerun()
-                        
-            with col3:
-                if st.button("✏️ Edit", key=f"edit_btn_{t.id}"):
-                    st.session_state[f'edit_mode_{t.id}'] = not st.session_state.get(f'edit_mode_{t.id}', False)
-                    st.rerun()
+        with col2:
+            # Timer Controls: the running session is stored server-side, so it survives reloads
+            if timer and timer.task_id == t.id:
+                # Active Timer, ticking once a second without rerunning the card
+                timer_display(timer.started_at)
+                st.button("⏹ Stop", key=f"stop_timer_{t.id}", on_click=handle_timer_stop)
+            else:
+                # Inactive Timer
+                st.button("▶ Start", key=f"start_timer_{t.id}", on_click=handle_timer_start, args=(t.id,))
                     
-                if st.button("✅ Done", key=f"done_{t.id}"):
-                    t.status = "Completed"
-                    db.commit()
-                    update_daily_stats()
-                    st.balloons()
-                    st.rerun()
+        with col3:
+            st.checkbox("Select", key=f"task_select_{t.id}")
+            st.button("✏️ Edit", key=f"edit_btn_{t.id}", on_click=toggle_edit_mode, args=(t.id,))
+            st.button("✅ Done", key=f"done_{t.id}", on_click=run_task_action, args=(t.id, complete_task, card_key), kwargs={"celebrate": True})
+            st.button("❌ Delete", key=f"del_{t.id}", on_click=run_task_action, args=(t.id, delete_task, card_key))
+        db.close()
 
-                if st.button("❌ Delete", key=f"del_{t.id}"):
-                    db.delete(t)
-                    db.commit()
-                    st.rerun()
+    def show_more_completed(cursor):
+        st.session_state['completed_cursors'].append(cursor)
+
+    @task_listener("completed_list")
+    def completed_list():
+        db = SessionLocal()
+        done_tasks, cursor = [], None
+        for after in st.session_state.setdefault('completed_cursors', [None]):
+            page, cursor = list_tasks(db, current_user_id, completed=True, sort="newest", after=after, limit=5)
+            done_tasks += page
+            if cursor is None:
+                break
+        db.close()
+        st.markdown("<h3 style='margin-top: 30px;'>✅ Completed</h3>", unsafe_allow_html=True)
+        if done_tasks:
+            for t in done_tasks:
+                st.markdown(f"""
+                    <div style="padding: 12px 20px; background: rgba(16, 185, 129, 0.1); border-radius: 10px; margin-bottom: 8px; border-left: 3px solid #10b981;">
+                        <span style="text-decoration: line-through; color: rgba(255,255,255,0.5);">{t.title}</span>
+                        <span style="float: right; color: #10b981;">✓</span>
+                    </div>
+                """, unsafe_allow_html=True)
+            if cursor is not None:
+                st.button("Show more", key="completed_more", on_click=show_more_completed, args=(cursor,))
+        else:
+            st.markdown("<p style='color: rgba(255,255,255,0.4);'>No completed tasks yet. Get started!</p>", unsafe_allow_html=True)
+
+    pending_header()
+    if tasks:
+        bulk_actions_bar("task", [t.id for t in tasks], table=view == "Table")
+    if view == "Table":
+        # One dataframe instead of a card, three columns and five buttons per task; pick rows for bulk actions
+        st.dataframe(
+            [{"Title": t.title, "Category": t.category, "Priority": {1: "Low", 2: "Medium", 3: "High"}.get(t.priority, ""),
+              "Due": t.due_date, "Reminder": t.reminder_at, "Spent (min)": (t.time_spent or 0) // 60} for t in tasks],
+            hide_index=True, use_container_width=True, on_select="rerun", selection_mode="multi-row",
+            key=f"task_table_{st.session_state.get('bulk_runs', 0)}")
     else:
-        st.markdown("""
-            <div class="glass-card" style="text-align: center; padding: 40px;">
-                <p style="font-size: 1.2rem; color: rgba(255,255,255,0.5);">🎉 All caught up! No pending tasks.</p>
-            </div>
-        """, unsafe_allow_html=True)
+        for task_id in list(prefetched_tasks):
+            card_key = f"task_card_{task_id}"
+            task_cards.add(card_key)
+            st.fragment(task_card, key=card_key)(task_id, card_key)
+    if cursor is not None:
+        st.button(f"⬇️ Load {page_size} more", key="task_load_more", on_click=load_more, args=(cursor,))
     
     # Completed Tasks
-    st.markdown("<h3 style='margin-top: 30px;'>✅ Completed</h3>", unsafe_allow_html=True)
-    done_tasks = db.query(Task).filter(Task.status == "Completed", Task.user_id == current_user_id).order_by(Task.id.desc()).limit(5).all()
-    
-    if done_tasks:
-        for t in done_tasks:
-            st.markdown(f"""
-                <div style="padding: 12px 20px; background: rgba(16, 185, 129, 0.1); border-radius: 10px; margin-bottom: 8px; border-left: 3px solid #10b981;">
-                    <span style="text-decoration: line-through; color: rgba(255,255,255,0.5);">{t.title}</span>
-                    <span style="float: right; color: #10b981;">✓</span>
-                </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.markdown("<p style='color: rgba(255,255,255,0.4);'>No completed tasks yet. Get started!</p>", unsafe_allow_html=True)
-        
-    db.close()
+    completed_list()
 
 # --- Day Planner with Calendar ---
 elif menu == "📅 Day Planner":
     st.title("📅 Day Planner")
     st.markdown("<p style='color: rgba(255,255,255,0.6); margin-top: -10px;'>Plan your day, tick off completed tasks, and stay organized</p>", unsafe_allow_html=True)
 
-    db = SessionLocal()
-
-    # Calendar date picker
-    left_col, right_col = st.columns([1, 2])
-    with left_col:
-        st.markdown("<h3>📆 Select Date</h3>", unsafe_allow_html=True)
-        selected_date = st.date_input("Pick a date", value=date.today(), key="planner_date", label_visibility="collapsed")
-
-        # Mini stats for selected date
-        day_tasks = db.query(Task).filter(Task.due_date == selected_date, Task.user_id == current_user_id).all()
-        done_count = sum(1 for t in day_tasks if t.status == "Completed")
-        pending_count = sum(1 for t in day_tasks if t.status != "Completed")
+    @task_listener("day_stats")
+    def day_stats(selected_date):
+        db = SessionLocal()
+        total, done_count = db.query(
+            func.count(Task.id), func.count(case((Task.status == "Completed", 1)))
+        ).filter(Task.due_date == selected_date, Task.user_id == current_user_id).one()
+        db.close()
+        pending_count = total - done_count
 
         st.markdown(f"""
             <div class="glass-card" style="padding: 16px; text-align: center;">
                 <div style="display: flex; justify-content: space-around;">
-                    <div><div style="font-size: 1.5rem; font-weight: bold; color: #00d4ff;">{len(day_tasks)}</div><div style="color: rgba(255,255,255,0.5); font-size: 0.8rem;">Total</div></div>
+                    <div><div style="font-size: 1.5rem; font-weight: bold; color: #00d4ff;">{total}</div><div style="color: rgba(255,255,255,0.5); font-size: 0.8rem;">Total</div></div>
                     <div><div style="font-size: 1.5rem; font-weight: bold; color: #10b981;">{done_count}</div><div style="color: rgba(255,255,255,0.5); font-size: 0.8rem;">Done</div></div>
                     <div><div style="font-size: 1.5rem; font-weight: bold; color: #f59e0b;">{pending_count}</div><div style="color: rgba(255,255,255,0.5); font-size: 0.8rem;">Pending</div></div>
                 </div>
                 <div style="margin-top: 12px; background: rgba(255,255,255,0.1); border-radius: 6px; height: 6px; overflow: hidden;">
-                    <div style="width: {(done_count / max(len(day_tasks), 1)) * 100}%; height: 100%; background: linear-gradient(90deg, #10b981, #00d4ff); border-radius: 6px;"></div>
+                    <div style="width: {(done_count / max(total, 1)) * 100}%; height: 100%; background: linear-gradient(90deg, #10b981, #00d4ff); border-radius: 6px;"></div>
                 </div>
             </div>
         """, unsafe_allow_html=True)
 
-        # Quick add task
-        st.markdown("<h4 style='margin-top: 20px;'>➕ Quick Add</h4>", unsafe_allow_html=True)
-        with st.form("quick_add_planner"):
-            q_title = st.text_input("Task", placeholder="What needs to be done?", label_visibility="collapsed")
-            q_col1, q_col2 = st.columns(2)
-            with q_col1:
-                q_priority = st.selectbox("Priority", ["Low", "Medium", "High"], index=1, key="qp_pri")
-            with q_col2:
-                q_reminder = st.time_input("⏰ Reminder", value=None, key="qp_rem")
-            if st.form_submit_button("➕ Add", use_container_width=True):
-                if q_title:
-                    rem_str = None
-                    if q_reminder:
-                        rem_str = datetime.combine(selected_date, q_reminder).isoformat()
-                    new_t = Task(title=q_title, due_date=selected_date, priority={"Low": 1, "Medium": 2, "High": 3}[q_priority], user_id=current_user_id, reminder_time=rem_str)
-                    db.add(new_t)
-                    db.commit()
-                    st.rerun()
-
-    with right_col:
+    @st.fragment(key="planner_list")
+    def planner_list(selected_date):
         st.markdown(f"<h3>📋 Tasks for {selected_date.strftime('%A, %b %d, %Y')}</h3>", unsafe_allow_html=True)
 
+        db = SessionLocal()
+        day_tasks = db.query(Task).filter(Task.due_date == selected_date, Task.user_id == current_user_id).all()
+        db.close()
         pending_tasks = [t for t in day_tasks if t.status != "Completed"]
         completed_tasks = [t for t in day_tasks if t.status == "Completed"]
 
         if pending_tasks:
+            bulk_actions_bar("plan", [t.id for t in pending_tasks], "planner_list")
             for t in pending_tasks:
                 p_emoji = "🔴" if t.priority == 3 else "🟡" if t.priority == 2 else "🟢"
                 p_color = "#ef4444" if t.priority == 3 else "#f59e0b" if t.priority == 2 else "#10b981"
-                rem_text = f" | ⏰ {datetime.fromisoformat(t.reminder_time).strftime('%I:%M %p')}" if t.reminder_time else ""
+                rem_text = f" | ⏰ {t.reminder_at.strftime('%I:%M %p')}" if t.reminder_at else ""
 
-                tc1, tc2, tc3 = st.columns([0.7, 0.15, 0.15])
+                tc0, tc1, tc2, tc3 = st.columns([0.06, 0.64, 0.15, 0.15])
+                with tc0:
+                    st.checkbox("Select", key=f"plan_select_{t.id}", label_visibility="collapsed")
                 with tc1:
                     st.markdown(f"""
                         <div style="background: rgba(255,255,255,0.03); border-radius: 12px; padding: 14px 18px; border-left: 3px solid {p_color}; margin-bottom: 4px;">
@@ -1357,16 +1105,9 @@ elif menu == "📅 Day Planner":
                         </div>
                     """, unsafe_allow_html=True)
                 with tc2:
-                    if st.button("✅", key=f"plan_done_{t.id}", help="Mark as complete"):
-                        t.status = "Completed"
-                        db.commit()
-                        update_daily_stats()
-                        st.rerun()
+                    st.button("✅", key=f"plan_done_{t.id}", help="Mark as complete", on_click=run_task_action, args=(t.id, complete_task, "planner_list"))
                 with tc3:
-                    if st.button("❌", key=f"plan_del_{t.id}", help="Delete task"):
-                        db.delete(t)
-                        db.commit()
-                        st.rerun()
+                    st.button("❌", key=f"plan_del_{t.id}", help="Delete task", on_click=run_task_action, args=(t.id, delete_task, "planner_list"))
         else:
             st.markdown("""
                 <div class="glass-card" style="text-align: center; padding: 30px;">
@@ -1385,7 +1126,36 @@ elif menu == "📅 Day Planner":
                     </div>
                 """, unsafe_allow_html=True)
 
-    db.close()
+    # Calendar date picker
+    left_col, right_col = st.columns([1, 2])
+    with left_col:
+        st.markdown("<h3>📆 Select Date</h3>", unsafe_allow_html=True)
+        selected_date = st.date_input("Pick a date", value=date.today(), key="planner_date", label_visibility="collapsed")
+
+        # Mini stats for selected date
+        day_stats(selected_date)
+
+        # Quick add task
+        st.markdown("<h4 style='margin-top: 20px;'>➕ Quick Add</h4>", unsafe_allow_html=True)
+        with st.form("quick_add_planner"):
+            q_title = st.text_input("Task", placeholder="What needs to be done?", label_visibility="collapsed")
+            q_col1, q_col2 = st.columns(2)
+            with q_col1:
+                q_priority = st.selectbox("Priority", ["Low", "Medium", "High"], index=1, key="qp_pri")
+            with q_col2:
+                q_reminder = st.time_input("⏰ Reminder", value=None, key="qp_rem")
+            if st.form_submit_button("➕ Add", use_container_width=True):
+                if q_title:
+                    rem_dt = datetime.combine(selected_date, q_reminder) if q_reminder else None
+                    new_t = Task(title=q_title, due_date=selected_date, priority={"Low": 1, "Medium": 2, "High": 3}[q_priority], user_id=current_user_id, reminder_at=rem_dt)
+                    db = SessionLocal()
+                    add_task(db, new_t)
+                    db.commit()
+                    db.close()
+                    st.rerun()
+
+    with right_col:
+        planner_list(selected_date)
 
 # --- AI Goal Planner ---
 elif menu == "AI Goal Planner":
@@ -1405,71 +1175,58 @@ elif menu == "AI Goal Planner":
         goal_desc = st.text_area("📝 Provide some context...", placeholder="Tell us more about your goal, your current level, and what you want to achieve...")
         custom_instructions = st.text_area("🔧 Custom Instructions / Project Details", placeholder="Any specific requirements? e.g., 'Focus on practical projects', 'Exclude testing tasks', 'I have 2 hours daily'...")
         target_date = st.date_input("📅 Target Date", value=date.today() + timedelta(days=30))
+        regenerate = st.checkbox("♻️ Generate a fresh plan (skip cached plans)", value=False)
         plan_it = st.form_submit_button("⚡ Break it Down")
         
         if plan_it and goal_title:
-            with st.spinner("🧠 AI is analyzing your goal..."):
-                tasks = st.session_state.goal_agent.decompose_goal(goal_title, goal_desc, custom_instructions)
-                if tasks:
-                    db = SessionLocal()
-                    new_goal = Goal(title=goal_title, description=goal_desc, target_date=target_date, user_id=current_user_id)
-                    db.add(new_goal)
-                    db.flush()
-                    
-                    for sub in tasks:
-                        new_t = Task(
-                            goal_id=new_goal.id,
-                            title=sub['title'],
-                            description=sub['description'],
-                            difficulty=sub.get('difficulty', 2),
-                            priority=sub.get('priority', 2),
-                            category=sub.get('category', 'General'),
-                            due_date=date.today(),
-                            user_id=current_user_id
-                        )
-                        db.add(new_t)
-                    db.commit()
-                    db.close()
-                    
-                    st.balloons()
-                    st.success(f"🎉 Generated {len(tasks)} actionable tasks for your goal!")
-                    
-                    # Display generated tasks
-                    st.markdown("<h3 style='margin-top: 20px;'>📋 Generated Tasks:</h3>", unsafe_allow_html=True)
-                    for i, task in enumerate(tasks, 1):
-                        difficulty_stars = "⭐" * task.get('difficulty', 2)
-                        st.markdown(f"""
-                            <div class="task-card" style="animation: fadeIn 0.5s ease {i * 0.1}s both;">
-                                <div style="background: linear-gradient(135deg, #a855f7, #00d4ff); width: 40px; height: 40px; border-radius: 10px; display: flex; align-items: center; justify-content: center; font-weight: bold;">{i}</div>
-                                <div style="flex: 1;">
-                                    <div class="task-title">{task['title']}</div>
-                                    <div class="task-desc">{task['description']}</div>
-                                    <div style="display: flex; gap: 10px; margin-top: 8px; align-items: center;">
-                                        <span style="font-size: 0.8rem; color: rgba(255,255,255,0.5);">Difficulty: {difficulty_stars}</span>
-                                        <span style="background: rgba(0, 212, 255, 0.1); color: #00d4ff; padding: 2px 8px; border-radius: 4px; font-size: 0.75rem;">{task.get('category', 'General')}</span>
-                                    </div>
-                                </div>
-                            </div>
-                        """, unsafe_allow_html=True)
+            job_id, created = submit_planning_job(current_user_id, goal_title, goal_desc, custom_instructions, target_date, refresh=regenerate)
+            if created:
+                st.toast("🧠 AI is planning your goal in the background", icon="⚡")
+            else:
+                st.toast("⏳ This goal is already being planned", icon="ℹ️")
+
+    # Planning jobs run on a background worker; this section polls until they finish
+    active_jobs = get_queue_depth(current_user_id) > 0
+
+    @st.fragment(run_every=2 if active_jobs else None)
+    def planning_jobs_panel():
+        jobs = get_recent_jobs(current_user_id)
+        if not jobs:
+            return
+        st.markdown("<h3 style='margin-top: 20px;'>⚡ Planning Jobs</h3>", unsafe_allow_html=True)
+        for job in jobs:
+            if job.status == "queued":
+                st.info(f"⏳ **{job.title}** — queued ({get_queue_depth()} job(s) in queue)")
+            elif job.status == "running":
+                st.info(f"🧠 **{job.title}** — planning... {job.tasks_created} task{'s' if job.tasks_created != 1 else ''} so far")
+            elif job.status == "done":
+                st.success(f"🎉 **{job.title}** — generated {job.tasks_created} actionable tasks")
+            else:
+                st.error(f"❌ **{job.title}** — {job.error or 'planning failed'}")
+        # A job finished since the last poll: rerun the page so Current Goals picks it up
+        if active_jobs and not any(job.status in ("queued", "running") for job in jobs):
+            st.balloons()
+            st.rerun()
+
+    planning_jobs_panel()
 
     # View Goals
     st.markdown("<h3 style='margin-top: 40px;'>🎯 Current Goals</h3>", unsafe_allow_html=True)
-    db = SessionLocal()
-    goals = db.query(Goal).filter(Goal.user_id == current_user_id).order_by(Goal.id.desc()).all()
+    goals = get_goal_summaries(current_user_id)
     
     if goals:
         for g in goals:
-            # Calculate progress
-            total_tasks = db.query(Task).filter(Task.goal_id == g.id).count()
-            completed_tasks = db.query(Task).filter(Task.goal_id == g.id, Task.status == "Completed").count()
-            progress = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+            # Progress counters are maintained on the goal row by logic_tasks
+            total_tasks = g["total_tasks"] or 0
+            completed_tasks = g["completed_tasks"] or 0
+            progress = g["progress"] or 0
             
             st.markdown(f"""
                 <div class="glass-card">
                     <div style="display: flex; justify-content: space-between; align-items: center;">
                         <div>
-                            <h4 style="margin: 0; color: #fff;">{g.title}</h4>
-                            <p style="margin: 5px 0 0 0; color: rgba(255,255,255,0.5); font-size: 0.9rem;">Target: {g.target_date}</p>
+                            <h4 style="margin: 0; color: #fff;">{g["title"]}</h4>
+                            <p style="margin: 5px 0 0 0; color: rgba(255,255,255,0.5); font-size: 0.9rem;">Target: {g["target_date"]}</p>
                         </div>
                         <div style="text-align: right;">
                             <div style="font-size: 1.5rem; font-weight: bold; color: #00d4ff;">{progress:.0f}%</div>
@@ -1487,20 +1244,19 @@ elif menu == "AI Goal Planner":
                 <p style="font-size: 1.2rem; color: rgba(255,255,255,0.5);">No goals yet. Create your first goal above! 🚀</p>
             </div>
         """, unsafe_allow_html=True)
-    db.close()
 
 # --- Achievements ---
 elif menu == "Achievements":
     st.title("🏆 Achievements & Badges")
     st.markdown("<p style='color: rgba(255,255,255,0.6); margin-top: -10px;'>Unlock badges by completing tasks and maintaining streaks</p>", unsafe_allow_html=True)
     
-    db = SessionLocal()
-    badges = db.query(Badge).all()
+    unlocked = get_unlocked_badges(current_user_id)
+    badges = [(rule, unlocked.get(rule.key)) for rule in BADGE_RULES]
     
     cols = st.columns(3)
-    for i, b in enumerate(badges):
+    for i, (b, unlocked_at) in enumerate(badges):
         with cols[i % 3]:
-            is_unlocked = b.unlocked_at is not None
+            is_unlocked = unlocked_at is not None
             card_class = "badge-card unlocked" if is_unlocked else "badge-card"
             icon_class = "" if is_unlocked else "badge-locked"
             
@@ -1510,22 +1266,17 @@ elif menu == "Achievements":
                     <h4 style="margin: 10px 0 5px 0; color: {'#fff' if is_unlocked else 'rgba(255,255,255,0.4)'};">{b.name}</h4>
                     <p style="font-size: 0.85rem; color: rgba(255,255,255,0.5); margin: 0;">{b.description}</p>
                     <p style="font-size: 0.75rem; margin-top: 10px; color: {'#10b981' if is_unlocked else 'rgba(255,255,255,0.3)'};">
-                        {"🔓 Unlocked: " + str(b.unlocked_at) if is_unlocked else "🔒 Locked"}
+                        {"🔓 Unlocked: " + str(unlocked_at) if is_unlocked else "🔒 Locked"}
                     </p>
                 </div>
             """, unsafe_allow_html=True)
             st.markdown("<br>", unsafe_allow_html=True)
     
-    db.close()
-    
     # Achievement stats
     st.markdown("<h3 style='margin-top: 20px;'>📊 Your Stats</h3>", unsafe_allow_html=True)
-    db = SessionLocal()
-    total_completed = db.query(Task).filter(Task.status == "Completed", Task.user_id == current_user_id).count()
-    total_goals = db.query(Goal).filter(Goal.user_id == current_user_id).count()
-    unlocked_badges = db.query(Badge).filter(Badge.unlocked_at != None).count()
-    total_badges = db.query(Badge).count()
-    db.close()
+    total_completed, total_goals = get_achievement_counts(current_user_id)
+    unlocked_badges = sum(1 for _, unlocked_at in badges if unlocked_at is not None)
+    total_badges = len(badges)
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -1549,3 +1300,20 @@ elif menu == "Achievements":
                 <div class="kpi-label">Badges Unlocked</div>
             </div>
         """, unsafe_allow_html=True)
+
+# --- Cache Debug Panel (?debug=1) ---
+# Rendered last so the numbers include this run's lookups.
+if st.query_params.get("debug") == "1":
+    with st.sidebar.expander("🛠️ Cache", expanded=True):
+        cache_stats = get_cache().stats()
+        d1, d2 = st.columns(2)
+        d1.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+        d2.metric("Entries", cache_stats["entries"])
+        st.caption(f"{cache_stats['backend']} backend · {cache_stats['users']} users · "
+                   f"{cache_stats['bytes'] / 1024:.1f} KB of {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB · "
+                   f"{cache_stats['evictions']} evicted · {cache_stats['stale_puts']} stale loads discarded · "
+                   f"data version {get_data_version(current_user_id)}")
+        st.dataframe([{"read path": name, **counts} for name, counts in cache_stats["by_name"].items()],
+                     hide_index=True, use_container_width=True,
+                     column_config={"hit_rate": st.column_config.NumberColumn(format="percent")})
+        st.button("Clear cache", key="cache_clear", on_click=get_cache().invalidate, use_container_width=True)
@@ -0,0 +1,57 @@
+"""
+Versioned static assets.
+
+The app's CSS and JavaScript live in ./static and are served by Streamlit's
+static file serving (server.enableStaticServing in .streamlit/config.toml) under
+app/static/. Pages inject a one-line reference instead of the file itself. The
+URL carries a hash of the file's contents, so browsers keep a copy across reruns
+and sessions and fetch it again only after the file changes.
+
+Without static serving the files are inlined as before.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+import streamlit as st
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+
+
+@lru_cache(maxsize=64)
+def _read(path, mtime):
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    return content, hashlib.sha256(content.encode()).hexdigest()[:12]
+
+
+def _asset(name):
+    """(contents, version) of a static file; re-read only when its mtime changes."""
+    path = os.path.join(STATIC_DIR, name)
+    return _read(path, os.stat(path).st_mtime_ns)
+
+
+def asset_url(name):
+    """URL of a static file, versioned by its contents."""
+    return f"{STATIC_URL}/{name}?v={_asset(name)[1]}"
+
+
+def static_serving():
+    return bool(st.get_option("server.enableStaticServing"))
+
+
+def use_stylesheet(name):
+    """Applies a stylesheet from ./static. Style-only HTML takes no space in the page."""
+    if static_serving():
+        st.html(f'<style>@import url("{asset_url(name)}");</style>')
+    else:
+        st.html(f"<style>{_asset(name)[0]}</style>")
+
+
+def use_script(name):
+    """Runs a script from ./static in the page."""
+    if static_serving():
+        st.html(f'<script src="{asset_url(name)}"></script>', unsafe_allow_javascript=True)
+    else:
+        st.html(f"<script>{_asset(name)[0]}</script>", unsafe_allow_javascript=True)
@@ -0,0 +1,338 @@
+"""
+Per-user read cache.
+
+Read paths (productivity trends, Dashboard KPIs, goals, badges, calendar grids)
+are cached under (user, data version, name, args). A user's data version is
+bumped after every commit that changes their tasks, goals, stats, timers or
+badges (database.on_data_change), so an entry is never served after its data
+changed: lookups move on to the new version and the user's old entries are
+dropped.
+
+Entries and versions live in a pluggable backend (USER_CACHE_BACKEND):
+- "memory" (default): an in-process LRU bounded by the pickled size of entries.
+- "sqlite": a SQLite file (USER_CACHE_PATH) shared by every worker process on
+  the host. A version bump in one process is seen by the others on their next
+  lookup, so replicas share results and never serve each other's stale ones.
+"""
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from database import on_data_change
+
+USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "memory")
+USER_CACHE_PATH = os.getenv("USER_CACHE_PATH", "./user_cache.db")
+USER_CACHE_MAX_BYTES = int(os.getenv("USER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+MISSING = object()
+
+
+def sizeof(value):
+    """Approximate size of a cached value in bytes (its pickled length)."""
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class CacheBackend:
+    """
+    Storage behind UserCache: entries keyed by (user_id, version, name, args),
+    with `args` a string, plus each user's current data version.
+    """
+    name = "base"
+    max_bytes = USER_CACHE_MAX_BYTES
+
+    def get_version(self, user_id):
+        raise NotImplementedError
+
+    def bump_versions(self, user_ids):
+        """Moves each user to a new data version and drops their entries."""
+        raise NotImplementedError
+
+    def get(self, key):
+        """The cached value, or MISSING."""
+        raise NotImplementedError
+
+    def put(self, key, value, size):
+        raise NotImplementedError
+
+    def invalidate(self, user_id=None):
+        """Drops one user's entries, or everything (versions are kept)."""
+        raise NotImplementedError
+
+    def usage(self):
+        """{"entries", "users", "bytes", "evictions"}"""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU bounded by total entry size."""
+    name = "memory"
+
+    def __init__(self, max_bytes=USER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._user_keys = {}  # user_id -> keys currently cached for that user
+        self._versions = {}
+        self.bytes = 0
+        self.evictions = 0
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self.bytes -= size
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def get_version(self, user_id):
+        return self._versions.get(user_id, 0)
+
+    def bump_versions(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                for key in list(self._user_keys.get(user_id, ())):
+                    self._drop(key)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size)
+            self._user_keys.setdefault(key[0], set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            keys = list(self._entries) if user_id is None else list(self._user_keys.get(user_id, ()))
+            for key in keys:
+                self._drop(key)
+
+    def usage(self):
+        with self._lock:
+            return {"entries": len(self._entries), "users": len(self._user_keys), "bytes": self.bytes, "evictions": self.evictions}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Entries and versions in a SQLite file shared by the processes on one host.
+    Versions read by this process are memoized until `PRAGMA data_version` shows
+    that another connection committed, so a hit costs one pragma and one
+    primary-key read. Recency is refreshed at most every TOUCH_INTERVAL seconds
+    per entry: LRU order is approximate, but hits rarely write.
+    """
+    name = "sqlite"
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path=USER_CACHE_PATH, max_bytes=USER_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS versions (user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)")
+        # One row per (user, read path, args): a newer version replaces the older entry in place
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            user_id INTEGER NOT NULL, name TEXT NOT NULL, args TEXT NOT NULL, version INTEGER NOT NULL,
+            value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL,
+            PRIMARY KEY (user_id, name, args))""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)")
+        self._versions = {}
+        self._seen_data_version = None
+
+    def get_version(self, user_id):
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._seen_data_version:
+                self._versions.clear()  # another process committed: re-read versions
+                self._seen_data_version = data_version
+            if user_id not in self._versions:
+                row = self._conn.execute("SELECT version FROM versions WHERE user_id = ?", (user_id,)).fetchone()
+                self._versions[user_id] = row[0] if row else 0
+            return self._versions[user_id]
+
+    def bump_versions(self, user_ids):
+        rows = [(user_id,) for user_id in user_ids]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT(user_id) DO UPDATE SET version = version + 1", rows)
+            self._conn.executemany("DELETE FROM entries WHERE user_id = ?", rows)
+            self._conn.execute("COMMIT")
+            for (user_id,) in rows:
+                self._versions.pop(user_id, None)
+
+    def get(self, key):
+        user_id, version, name, args = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, last_access FROM entries WHERE user_id = ? AND name = ? AND args = ? AND version = ?",
+                (user_id, name, args, version)).fetchone()
+            if row is None:
+                return MISSING
+            now = time.time()
+            if now - row[1] > self.TOUCH_INTERVAL:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE user_id = ? AND name = ? AND args = ?",
+                                   (now, user_id, name, args))
+        return pickle.loads(row[0])
+
+    def put(self, key, value, size):
+        user_id, version, name, args = key
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (user_id, name, args, version, blob, len(blob), time.time()))
+            total = self._conn.execute("SELECT total(size) FROM entries").fetchone()[0]
+            while total > self.max_bytes:
+                self.evictions += self._conn.execute(
+                    "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY last_access LIMIT 32)").rowcount
+                total = self._conn.execute("SELECT total(size) FROM entries").fetchone()[0]
+            self._conn.execute("COMMIT")
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE user_id = ?", (user_id,))
+
+    def usage(self):
+        with self._lock:
+            entries, users, size = self._conn.execute(
+                "SELECT count(*), count(DISTINCT user_id), total(size) FROM entries").fetchone()
+        return {"entries": entries, "users": users, "bytes": int(size), "evictions": self.evictions}
+
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+
+
+class UserCache:
+    """Read-through cache over a backend, with this process's hit and miss counts."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale_puts": 0, "oversized": 0}
+        self._by_name = {}  # name -> [hits, misses]
+
+    def make_key(self, user_id, name, args=(), kwargs=None):
+        # The version is read before the loader runs, so a write that lands mid-load
+        # leaves the result under the older version rather than hiding the change.
+        return user_id, self.backend.get_version(user_id), name, repr((args, sorted((kwargs or {}).items())))
+
+    def _count(self, name, hit):
+        with self._lock:
+            self.counters["hits" if hit else "misses"] += 1
+            self._by_name.setdefault(name, [0, 0])[0 if hit else 1] += 1
+
+    def contains(self, key):
+        return self.backend.get(key) is not MISSING
+
+    def get_or_load(self, user_id, name, loader, *args, **kwargs):
+        """Returns loader(user_id, *args, **kwargs), from the cache while the user's data is unchanged."""
+        key = self.make_key(user_id, name, args, kwargs)
+        value = self.backend.get(key)
+        if value is not MISSING:
+            self._count(name, True)
+            return value
+        self._count(name, False)
+        value = loader(user_id, *args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        size = sizeof(value)
+        if size > self.backend.max_bytes:
+            self.counters["oversized"] += 1
+        elif key[1] < self.backend.get_version(key[0]):
+            self.counters["stale_puts"] += 1  # loaded from data that has changed since
+        else:
+            self.backend.put(key, value, size)
+
+    def bump(self, user_ids):
+        self.backend.bump_versions(user_ids)
+
+    def invalidate(self, user_id=None):
+        self.backend.invalidate(user_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            counters = dict(self.counters)
+            by_name = {name: {"hits": h, "misses": m, "hit_rate": h / (h + m)} for name, (h, m) in sorted(self._by_name.items())}
+        return {
+            "backend": self.backend.name,
+            "max_bytes": self.backend.max_bytes,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            **self.backend.usage(),
+            **counters,
+            "by_name": by_name,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> UserCache:
+    """Process-wide user cache on the configured backend, created on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UserCache(BACKENDS[USER_CACHE_BACKEND]())
+    return _cache
+
+
+def get_data_version(user_id):
+    return get_cache().backend.get_version(user_id)
+
+
+@on_data_change
+def _bump_data_versions(user_ids):
+    get_cache().bump(user_ids)
+
+
+CACHED_READS = {}  # name -> undecorated read path (see perf.bench_cache)
+
+
+def cached(name=None):
+    """
+    Decorator for a read path whose first argument is a user id: results are
+    cached until that user's data version changes. The undecorated function
+    stays available as `.uncached`.
+    """
+    def decorate(func):
+        key_name = name or func.__name__
+        CACHED_READS[key_name] = func
+
+        @wraps(func)
+        def wrapper(user_id, *args, **kwargs):
+            return get_cache().get_or_load(user_id, key_name, func, *args, **kwargs)
+        wrapper.uncached = func
+        return wrapper
+    return decorate
@@ -1,10 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Date, ForeignKey, Float
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Float, Index, UniqueConstraint, event, inspect, text, select, func, case, bindparam, desc, and_, or_, exc
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import date
+from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.schema import CreateIndex
+from datetime import date, datetime, timedelta
 import os
 import hashlib
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+import perf
 
 # Load environment variables
 load_dotenv()
@@ -31,6 +35,12 @@ class User(Base):
     email = Column(String, nullable=True)
     created_at = Column(Date, default=date.today)
 
+    # Counters maintained by logic_tasks for badge rules (see logic_badges)
+    tasks_completed_total = Column(Integer, default=0)
+    early_completions = Column(Integer, default=0)
+    best_streak = Column(Integer, default=0)
+    goals_completed_total = Column(Integer, default=0)
+
     tasks = relationship("Task", back_populates="user", cascade="all, delete-orphan")
     goals = relationship("Goal", back_populates="user", cascade="all, delete-orphan")
 
@@ -44,19 +54,52 @@ def verify_password(password: str, password_hash: str) -> bool:
 
 class Goal(Base):
     __tablename__ = 'goals'
+    __table_args__ = (
+        Index('ix_goals_user_id', 'user_id', 'id'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     title = Column(String, nullable=False)
     description = Column(String)
     target_date = Column(Date)
-    progress = Column(Float, default=0.0)
+    progress = Column(Float, default=0.0) # Percent of tasks completed, maintained with the counters below
     is_completed = Column(Boolean, default=False)
+    total_tasks = Column(Integer, default=0)
+    completed_tasks = Column(Integer, default=0)
     
     user = relationship("User", back_populates="goals")
     tasks = relationship("Task", back_populates="goal", cascade="all, delete-orphan")
 
+# Predicate shared by the reminder query and its partial index; kept as literal
+# SQL so the planner can match the index's WHERE clause against the query's.
+PENDING_REMINDER_CLAUSE = "reminder_at IS NOT NULL AND status != 'Completed'"
+PENDING_TASK_CLAUSE = "status != 'Completed'"
+# Task list sort keys, shared the same way with the keyset indexes. NULLs sort as
+# these sentinels (no due date last, no priority lowest), so a page cursor never
+# holds a NULL for the next page to compare against.
+NO_DUE_DATE = date(9999, 12, 31)
+NO_PRIORITY = 0
+DUE_SORT_KEY = f"coalesce(due_date, '{NO_DUE_DATE.isoformat()}')"
+PRIORITY_SORT_KEY = f"coalesce(priority, {NO_PRIORITY})"
+
 class Task(Base):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        Index('ix_tasks_user_status_due', 'user_id', 'status', 'due_date'),  # pending/completed lists, today's focus
+        Index('ix_tasks_user_due', 'user_id', 'due_date'),                   # calendar month range, day planner
+        Index('ix_tasks_goal_status', 'goal_id', 'status'),                  # goal progress counts
+        Index('ix_tasks_user_status_id', 'user_id', 'status', 'id'),         # completed list, newest first
+        # Keyset pages of pending tasks, one index per sort order (see logic_tasks.TASK_SORTS)
+        Index('ix_tasks_pending_by_due', 'user_id', text(DUE_SORT_KEY), desc(text(PRIORITY_SORT_KEY)), 'id',
+              sqlite_where=text(PENDING_TASK_CLAUSE),
+              postgresql_where=text(PENDING_TASK_CLAUSE)),
+        Index('ix_tasks_pending_by_priority', 'user_id', desc(text(PRIORITY_SORT_KEY)), text(DUE_SORT_KEY), 'id',
+              sqlite_where=text(PENDING_TASK_CLAUSE),
+              postgresql_where=text(PENDING_TASK_CLAUSE)),
+        Index('ix_tasks_user_pending_reminders', 'user_id', 'reminder_at',  # reminder scheduler window
+              sqlite_where=text(PENDING_REMINDER_CLAUSE),
+              postgresql_where=text(PENDING_REMINDER_CLAUSE)),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     goal_id = Column(Integer, ForeignKey('goals.id'), nullable=True)
@@ -70,18 +113,43 @@ class Task(Base):
     user = relationship("User", back_populates="tasks")
     goal = relationship("Goal", back_populates="tasks")
     category = Column(String, default="General") # General, Learning, Coding, Health, etc.
-    time_spent = Column(Integer, default=0) # Saved in seconds
-    reminder_time = Column(String, nullable=True) # ISO format datetime string
+    time_spent = Column(Integer, default=0) # Seconds; SUM(timer_sessions.duration), maintained by logic_timers
+    reminder_time = Column(String, nullable=True) # Legacy ISO string; superseded by reminder_at
+    reminder_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
 
 class UserStats(Base):
     __tablename__ = 'user_stats'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', name='uq_user_stats_user_date'),
+        Index('ix_user_stats_date', 'date', 'user_id', 'productivity_score'),  # all users' recent scores, covering
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
-    date = Column(Date, unique=True)
+    date = Column(Date)
     tasks_completed = Column(Integer, default=0)
+    difficulty_points = Column(Integer, default=0) # Sum of completed task difficulty; score = min(points * 10, 100)
     productivity_score = Column(Float, default=0.0)
     streak_count = Column(Integer, default=0)
 
+class DailyRollup(Base):
+    """
+    Per-user, per-day, per-category totals, maintained by the task and timer write
+    paths (logic_rollups). The primary key is the only index: on SQLite the table
+    is stored in key order (WITHOUT ROWID), so a user's date range is one
+    contiguous scan.
+    """
+    __tablename__ = 'daily_rollups'
+    __table_args__ = {'sqlite_with_rowid': False}
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    tasks_completed = Column(Integer, nullable=False, default=0)
+    difficulty_points = Column(Integer, nullable=False, default=0)
+    seconds_tracked = Column(Integer, nullable=False, default=0) # Closed timer sessions, credited to the day they ended
+
+# Legacy global badge rows; badges are now defined by logic_badges.BADGE_RULES
+# and unlocked per user in user_badges.
 class Badge(Base):
     __tablename__ = 'badges'
     id = Column(Integer, primary_key=True)
@@ -91,6 +159,87 @@ class Badge(Base):
     icon = Column(String)
     unlocked_at = Column(Date, nullable=True)
 
+class UserBadge(Base):
+    __tablename__ = 'user_badges'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'badge_key', name='uq_user_badges_user_key'),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    badge_key = Column(String, nullable=False)
+    unlocked_at = Column(Date, default=date.today)
+
+class DeliveredReminder(Base):
+    __tablename__ = 'delivered_reminders'
+    __table_args__ = (
+        # Keyed on the scheduled time too, so moving a reminder re-arms it
+        UniqueConstraint('task_id', 'reminder_at', name='uq_delivered_reminders_task_time'),
+    )
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    reminder_at = Column(DateTime, nullable=False)
+    delivered_at = Column(DateTime, default=datetime.now)
+
+# Predicate of the one-open-session-per-user index; literal SQL for the same reason as above.
+OPEN_TIMER_CLAUSE = "ended_at IS NULL"
+
+class TimerSession(Base):
+    __tablename__ = 'timer_sessions'
+    __table_args__ = (
+        Index('uq_timer_sessions_open_per_user', 'user_id', unique=True,
+              sqlite_where=text(OPEN_TIMER_CLAUSE),
+              postgresql_where=text(OPEN_TIMER_CLAUSE)),
+        Index('ix_timer_sessions_task', 'task_id', 'duration'),  # time_spent aggregate, covering
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    task_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=True) # NULL while the timer is running
+    duration = Column(Integer, nullable=True) # Seconds, set when the session is closed
+
+class PlanningJob(Base):
+    __tablename__ = 'planning_jobs'
+    __table_args__ = (
+        Index('ix_planning_jobs_user_status', 'user_id', 'status'),
+        Index('ix_planning_jobs_fingerprint_status', 'fingerprint', 'status'),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    fingerprint = Column(String, nullable=False) # GoalAgent.cache_key of the request, for dedupe
+    title = Column(String, nullable=False)
+    description = Column(String)
+    custom_instructions = Column(String)
+    target_date = Column(Date)
+    refresh = Column(Boolean, default=False)
+    status = Column(String, default="queued") # queued, running, done, failed
+    goal_id = Column(Integer, ForeignKey('goals.id'), nullable=True)
+    tasks_created = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True) # Refreshed by the running process; see logic_jobs.STALE_AFTER
+    finished_at = Column(DateTime, nullable=True)
+
+class ProductivityForecast(Base):
+    """Batch forecasts (logic_analytics.forecast_all_users), one row per user, day and model."""
+    __tablename__ = 'forecasts'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day', 'model', name='uq_forecasts_user_day_model'),
+        Index('ix_forecasts_day_model', 'day', 'model'),
+    )
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    day = Column(Date, nullable=False) # The day forecast
+    model = Column(String, nullable=False) # Model requested; see fitted_model for fallbacks
+    fitted_model = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    lower = Column(Float, nullable=False)
+    upper = Column(Float, nullable=False)
+    level = Column(Float, nullable=False) # Prediction interval coverage, e.g. 0.8
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
 # Database Setup - Use Supabase PostgreSQL or fallback to SQLite
 SUPABASE_DB_URL = get_secret("SUPABASE_DB_URL")
 
@@ -104,95 +253,402 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
-    
-    # Migration: Check if new columns exist in tables
-    from sqlalchemy import inspect, text
-    inspector = inspect(engine)
-    
-    try:
-        # --- Tasks table migration ---
-        columns = [c['name'] for c in inspector.get_columns('tasks')]
-        
-        with engine.connect() as conn:
-            if 'category' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE tasks ADD COLUMN category VARCHAR DEFAULT 'General'"))
-                except Exception:
-                    pass
-            
-            if 'time_spent' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE tasks ADD COLUMN time_spent INTEGER DEFAULT 0"))
-                except Exception:
-                    pass
-                
-            if 'reminder_time' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE tasks ADD COLUMN reminder_time VARCHAR NULL"))
-                except Exception:
-                    pass
-
-            if 'user_id' not in columns:
-                try:
-                    conn.execute(text("ALTER TABLE tasks ADD COLUMN user_id INTEGER NULL"))
-                except Exception:
-                    pass
-                
-            conn.commit()
-    except Exception:
-        pass  # Table might not exist yet on first run
+# --- Data Changes ---
+# After each commit that changed a user's tasks, goals, stats, timers or badges,
+# the registered listeners get the ids of those users. cache.py listens to bump
+# the users' data versions, so cached views are never served after their data changed.
+VERSIONED_MODELS = (Task, Goal, UserStats, TimerSession, UserBadge)
+_data_change_listeners = []
 
-    try:
-        # --- Goals table migration ---
-        goal_columns = [c['name'] for c in inspector.get_columns('goals')]
-        with engine.connect() as conn:
-            if 'user_id' not in goal_columns:
-                try:
-                    conn.execute(text("ALTER TABLE goals ADD COLUMN user_id INTEGER NULL"))
-                except Exception:
-                    pass
-            conn.commit()
-    except Exception:
-        pass
+def on_data_change(listener):
+    """Registers listener(user_ids), called after each commit that changed those users' data."""
+    _data_change_listeners.append(listener)
+    return listener
+
+def touch_user(session, user_id):
+    """Marks the user's data as changed by this transaction; needed for bulk statements the ORM does not track."""
+    if user_id is not None:
+        session.info.setdefault("touched_users", set()).add(user_id)
+
+@event.listens_for(SessionLocal, "before_flush")
+def _touch_flushed_users(session, flush_context, instances):
+    for obj in (*session.new, *session.deleted, *(o for o in session.dirty if session.is_modified(o))):
+        if isinstance(obj, VERSIONED_MODELS):
+            touch_user(session, obj.user_id)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _notify_data_change(session):
+    touched = session.info.pop("touched_users", None)
+    if touched:
+        for listener in _data_change_listeners:
+            listener(touched)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_touched_users(session):
+    session.info.pop("touched_users", None)
+
+# --- Schema Migrations ---
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+# Ordered list of (version, description, fn). Each fn receives an open
+# connection inside a transaction and must be safe to run against both a
+# fresh schema (already built by create_all) and a legacy one.
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a schema migration step."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def _add_column_if_missing(conn, inspector, table, column, ddl):
+    columns = [c['name'] for c in inspector.get_columns(table)]
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+def _create_index(conn, index):
+    # IF NOT EXISTS rather than checkfirst: reflection skips expression indexes.
+    conn.execute(CreateIndex(index, if_not_exists=True))
+
+@migration(1, "Add category, time_spent, reminder_time and user_id columns to legacy tables")
+def _migrate_legacy_columns(conn):
+    inspector = inspect(conn)
+    _add_column_if_missing(conn, inspector, 'tasks', 'category', "category VARCHAR DEFAULT 'General'")
+    _add_column_if_missing(conn, inspector, 'tasks', 'time_spent', "time_spent INTEGER DEFAULT 0")
+    _add_column_if_missing(conn, inspector, 'tasks', 'reminder_time', "reminder_time VARCHAR NULL")
+    for table in ('tasks', 'goals', 'user_stats', 'badges'):
+        _add_column_if_missing(conn, inspector, table, 'user_id', "user_id INTEGER NULL")
 
+@migration(2, "Seed default badges")
+def _seed_default_badges(conn):
+    if conn.execute(select(func.count()).select_from(Badge.__table__)).scalar():
+        return
+    conn.execute(Badge.__table__.insert(), [
+        {"name": "First Step", "description": "Complete your first task", "icon": "🌟"},
+        {"name": "Early Bird", "description": "Complete a task before 8 AM", "icon": "🌅"},
+        {"name": "Consistency King", "description": "Maintain a 7-day streak", "icon": "🔥"},
+        {"name": "Task Master", "description": "Complete 50 tasks", "icon": "🏆"},
+        {"name": "Goal Getter", "description": "Complete your first long-term goal", "icon": "🎯"},
+    ])
+
+@migration(3, "Add composite and partial indexes for task and goal queries")
+def _create_query_indexes(conn):
+    for table in (Task.__table__, Goal.__table__):
+        for index in table.indexes:
+            if index.name in ('ix_tasks_user_pending_reminders', 'ix_tasks_user_status_id',
+                              'ix_tasks_pending_by_due', 'ix_tasks_pending_by_priority'):
+                continue  # added by later migrations
+            _create_index(conn, index)
+
+@migration(4, "Key user_stats by (user_id, date), add task completion timestamps, backfill per-user stats")
+def _per_user_stats(conn):
+    inspector = inspect(conn)
+    _add_column_if_missing(conn, inspector, 'tasks', 'completed_at', "completed_at TIMESTAMP NULL")
+
+    date_unique = any(uc['column_names'] == ['date'] for uc in inspector.get_unique_constraints('user_stats')) or any(
+        ix['unique'] and ix['column_names'] == ['date'] for ix in inspector.get_indexes('user_stats'))
+    if conn.dialect.name == 'sqlite' and date_unique:
+        # SQLite cannot drop a column constraint in place: rebuild the table.
+        conn.execute(text("ALTER TABLE user_stats RENAME TO user_stats_old"))
+        UserStats.__table__.create(conn)
+        conn.execute(text("DROP TABLE user_stats_old"))
+    else:
+        if date_unique:
+            for uc in inspector.get_unique_constraints('user_stats'):
+                if uc['column_names'] == ['date']:
+                    conn.execute(text(f'ALTER TABLE user_stats DROP CONSTRAINT "{uc["name"]}"'))
+        _add_column_if_missing(conn, inspector, 'user_stats', 'difficulty_points', "difficulty_points INTEGER DEFAULT 0")
+        # Legacy rows were shared by all users and carry no user_id.
+        conn.execute(text("DELETE FROM user_stats WHERE user_id IS NULL"))
+        if not any(uc['name'] == 'uq_user_stats_user_date' for uc in inspector.get_unique_constraints('user_stats')):
+            conn.execute(text("ALTER TABLE user_stats ADD CONSTRAINT uq_user_stats_user_date UNIQUE (user_id, date)"))
+
+    from logic_analytics import rebuild_user_stats
+    session = Session(bind=conn)
+    for (user_id,) in conn.execute(select(User.id)).fetchall():
+        rebuild_user_stats(session, user_id)
+    session.flush()
+    session.close()
+
+def backfill_goal_counters(conn):
+    """Recompute every goal's task counters and progress with one grouped query."""
+    counts = conn.execute(
+        select(Task.goal_id, func.count(Task.id), func.sum(case((Task.status == "Completed", 1), else_=0)))
+        .where(Task.goal_id.isnot(None))
+        .group_by(Task.goal_id)
+    ).fetchall()
+    conn.execute(Goal.__table__.update().values(total_tasks=0, completed_tasks=0, progress=0.0, is_completed=False))
+    if counts:
+        goals = Goal.__table__
+        conn.execute(
+            goals.update().where(goals.c.id == bindparam('gid')).values(
+                total_tasks=bindparam('total'), completed_tasks=bindparam('completed'),
+                progress=bindparam('progress'), is_completed=bindparam('done')),
+            [{"gid": gid, "total": total, "completed": done, "progress": done * 100.0 / total, "done": done == total}
+             for gid, total, done in counts]
+        )
+
+@migration(5, "Add maintained task counters to goals and backfill them")
+def _goal_counters(conn):
+    inspector = inspect(conn)
+    _add_column_if_missing(conn, inspector, 'goals', 'total_tasks', "total_tasks INTEGER DEFAULT 0")
+    _add_column_if_missing(conn, inspector, 'goals', 'completed_tasks', "completed_tasks INTEGER DEFAULT 0")
+    backfill_goal_counters(conn)
+
+@migration(6, "Add per-user badge counters and user_badges; re-evaluate badges from history")
+def _per_user_badges(conn):
+    inspector = inspect(conn)
+    for column in ('tasks_completed_total', 'early_completions', 'best_streak', 'goals_completed_total'):
+        _add_column_if_missing(conn, inspector, 'users', column, f"{column} INTEGER DEFAULT 0")
+    UserBadge.__table__.create(conn, checkfirst=True)
+
+    from logic_badges import reevaluate_badges
+    session = Session(bind=conn)
+    reevaluate_badges(session)
+    session.flush()
+    session.close()
+
+@migration(7, "Add planning_jobs table")
+def _planning_jobs(conn):
+    PlanningJob.__table__.create(conn, checkfirst=True)
+
+@migration(8, "Add typed reminder_at with a per-user partial index, backfill it, add delivered_reminders")
+def _reminder_schedule(conn):
+    inspector = inspect(conn)
+    _add_column_if_missing(conn, inspector, 'tasks', 'reminder_at', "reminder_at TIMESTAMP NULL")
+    conn.execute(text("DROP INDEX IF EXISTS ix_tasks_pending_reminders"))
+    for index in Task.__table__.indexes:
+        _create_index(conn, index)
+    DeliveredReminder.__table__.create(conn, checkfirst=True)
+
+    # Parse the legacy ISO strings once here instead of on every rerun.
+    rows = conn.execute(text(
+        "SELECT id, reminder_time FROM tasks WHERE reminder_time IS NOT NULL AND reminder_at IS NULL")).fetchall()
+    parsed = []
+    for task_id, value in rows:
+        try:
+            parsed.append({"tid": task_id, "at": datetime.fromisoformat(value)})
+        except ValueError:
+            pass
+    if parsed:
+        tasks = Task.__table__
+        conn.execute(tasks.update().where(tasks.c.id == bindparam('tid')).values(reminder_at=bindparam('at')), parsed)
+
+def _legacy_session_end(completed_at, due_date, now):
+    """When legacy tracked time is assumed to have ended: the task's completion, else its due date, never later than now."""
+    if completed_at is not None:
+        return min(completed_at, now)
+    if due_date is not None:
+        return min(datetime.combine(due_date, datetime.min.time()), now)
+    return now
+
+@migration(9, "Add timer_sessions; carry existing time_spent over as closed sessions")
+def _timer_sessions(conn):
+    TimerSession.__table__.create(conn, checkfirst=True)
+    # Legacy totals have no start/stop history: each becomes one closed session,
+    # dated by the task so the daily rollups spread it over the right days.
+    now = datetime.now()
+    tasks = Task.__table__
+    rows = conn.execute(select(tasks.c.id, tasks.c.user_id, tasks.c.time_spent, tasks.c.completed_at, tasks.c.due_date)
+                        .where(tasks.c.time_spent > 0)).all()
+    sessions = []
+    for task_id, user_id, seconds, completed_at, due_date in rows:
+        ended_at = _legacy_session_end(completed_at, due_date, now)
+        sessions.append({"user_id": user_id, "task_id": task_id, "started_at": ended_at - timedelta(seconds=seconds),
+                         "ended_at": ended_at, "duration": seconds})
+    if sessions:
+        conn.execute(TimerSession.__table__.insert(), sessions)
+
+@migration(10, "Add keyset pagination indexes for task lists")
+def _task_list_indexes(conn):
+    for index in Task.__table__.indexes:
+        if index.name in ('ix_tasks_user_status_id', 'ix_tasks_pending_by_due', 'ix_tasks_pending_by_priority'):
+            _create_index(conn, index)
+
+@migration(11, "Add forecasts table and a user_stats date index for batch forecasting")
+def _forecasts(conn):
+    ProductivityForecast.__table__.create(conn, checkfirst=True)
+    for index in UserStats.__table__.indexes:
+        _create_index(conn, index)
+
+@migration(12, "Add daily_rollups and backfill them from tasks and timer sessions")
+def _daily_rollups(conn):
+    DailyRollup.__table__.create(conn, checkfirst=True)
+    from logic_rollups import rebuild_rollups
+    session = Session(bind=conn)
+    rebuild_rollups(session)
+    session.flush()
+    session.close()
+
+@migration(13, "Add planning_jobs.heartbeat_at so jobs orphaned by a dead process are re-queued")
+def _planning_job_heartbeat(conn):
+    _add_column_if_missing(conn, inspect(conn), 'planning_jobs', 'heartbeat_at', "heartbeat_at TIMESTAMP NULL")
+
+@migration(14, "Date legacy timer sessions by their task and rebuild daily_rollups")
+def _date_legacy_sessions(conn):
+    # Migration 9 used to stamp legacy sessions with the migration time; they are
+    # the closed sessions with started_at == ended_at but a positive duration.
+    sessions, tasks = TimerSession.__table__, Task.__table__
+    rows = conn.execute(select(sessions.c.id, sessions.c.duration, tasks.c.completed_at, tasks.c.due_date)
+                        .join(tasks, tasks.c.id == sessions.c.task_id)
+                        .where(sessions.c.started_at == sessions.c.ended_at, sessions.c.duration > 0)).all()
+    if not rows:
+        return
+    now = datetime.now()
+    updates = []
+    for session_id, seconds, completed_at, due_date in rows:
+        ended_at = _legacy_session_end(completed_at, due_date, now)
+        updates.append({"sid": session_id, "start": ended_at - timedelta(seconds=seconds), "end": ended_at})
+    conn.execute(sessions.update().where(sessions.c.id == bindparam('sid'))
+                 .values(started_at=bindparam('start'), ended_at=bindparam('end')), updates)
+    from logic_rollups import rebuild_rollups
+    session = Session(bind=conn)
+    rebuild_rollups(session)
+    session.flush()
+    session.close()
+
+@migration(15, "Key the task list indexes on coalesced due_date and priority")
+def _null_safe_task_list_indexes(conn):
+    for name in ('ix_tasks_pending_by_due', 'ix_tasks_pending_by_priority'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for index in Task.__table__.indexes:
+        if index.name in ('ix_tasks_pending_by_due', 'ix_tasks_pending_by_priority'):
+            _create_index(conn, index)
+
+def get_schema_version():
+    """Return the highest applied migration version, or 0 for an unversioned database."""
     try:
-        # --- user_stats table migration ---
-        stats_columns = [c['name'] for c in inspector.get_columns('user_stats')]
         with engine.connect() as conn:
-            if 'user_id' not in stats_columns:
-                try:
-                    conn.execute(text("ALTER TABLE user_stats ADD COLUMN user_id INTEGER NULL"))
-                except Exception:
-                    pass
-            conn.commit()
-    except Exception:
-        pass
+            return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+    except exc.DBAPIError:
+        return 0
+
+def migrate():
+    """Apply every pending migration, each in its own transaction."""
+    current = get_schema_version()
+    for version, description, fn in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            with perf.timed(f"migration.{version:03d}"):
+                with engine.begin() as conn:
+                    fn(conn)
+                    conn.execute(SchemaVersion.__table__.insert().values(
+                        version=version, description=description, applied_at=datetime.utcnow()))
+        except exc.IntegrityError:
+            # Another process applied this version concurrently.
+            if get_schema_version() < version:
+                raise
+    return get_schema_version()
+
+_init_lock = threading.Lock()
+_db_initialized = False
+
+def init_db():
+    """
+    Creates tables and applies pending migrations once per process.
+    Warm calls return immediately without touching the database.
+    """
+    global _db_initialized
+    if _db_initialized:
+        return
+    with _init_lock:
+        if _db_initialized:
+            return
+        with perf.timed("init_db.cold"):
+            if get_schema_version() < MIGRATIONS[-1][0]:
+                with perf.timed("init_db.create_all"):
+                    Base.metadata.create_all(bind=engine)
+                migrate()
+        _db_initialized = True
 
+# --- Query diagnostics ---
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed on the engine inside the block."""
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
     try:
-        # --- badges table migration ---
-        badge_columns = [c['name'] for c in inspector.get_columns('badges')]
-        with engine.connect() as conn:
-            if 'user_id' not in badge_columns:
-                try:
-                    conn.execute(text("ALTER TABLE badges ADD COLUMN user_id INTEGER NULL"))
-                except Exception:
-                    pass
-            conn.commit()
-    except Exception:
-        pass
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
 
-    # Initialize some default badges if they don't exist
+def explain(query):
+    """Return the database's query plan for a SQLAlchemy query as a list of strings."""
+    compiled = query.statement.compile(engine, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # Small tables make a sequential scan the cheapest plan; we only care
+            # whether an index *can* serve the query.
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = conn.execute(text(f"{prefix} {compiled}")).fetchall()
+    return [" ".join(str(col) for col in row) for row in rows]
+
+def hot_queries(session, user_id=1):
+    """The per-page task/goal queries that must be served by an index."""
+    today = date.today()
+    return {
+        "pending tasks": session.query(Task).filter(Task.status != "Completed", Task.user_id == user_id),
+        "pending page by due": session.query(Task).filter(
+            Task.user_id == user_id, text(PENDING_TASK_CLAUSE), Task.due_date >= today,
+            or_(Task.due_date > today, and_(Task.due_date == today, or_(Task.priority < 2, and_(Task.priority == 2, Task.id > 1))))
+        ).order_by(Task.due_date, desc(Task.priority), Task.id).limit(26),
+        "pending page by priority": session.query(Task).filter(
+            Task.user_id == user_id, text(PENDING_TASK_CLAUSE), Task.priority <= 2,
+            or_(Task.priority < 2, and_(Task.priority == 2, or_(Task.due_date > today, and_(Task.due_date == today, Task.id > 1))))
+        ).order_by(desc(Task.priority), Task.due_date, Task.id).limit(26),
+        "recently completed": session.query(Task).filter(Task.status == "Completed", Task.user_id == user_id).order_by(Task.id.desc()).limit(5),
+        "today's tasks": session.query(Task).filter(Task.due_date == today, Task.status != "Completed", Task.user_id == user_id),
+        "month tasks": session.query(Task).filter(Task.user_id == user_id, Task.due_date >= today.replace(day=1), Task.due_date <= today),
+        "goals": session.query(Goal).filter(Goal.user_id == user_id).order_by(Goal.id.desc()),
+        "goal task count": session.query(Task).filter(Task.goal_id == 1, Task.status == "Completed"),
+        "running timer": session.query(TimerSession).filter(TimerSession.user_id == user_id, text(OPEN_TIMER_CLAUSE)),
+        "reminder window": session.query(Task).filter(
+            Task.user_id == user_id, text(PENDING_REMINDER_CLAUSE),
+            Task.reminder_at >= datetime.combine(today, datetime.min.time()), Task.reminder_at < datetime.combine(today, datetime.max.time())),
+    }
+
+def check_query_plans():
+    """Explain every hot query; returns {name: (uses_index, plan_lines)}."""
+    markers = ("USING INDEX", "USING COVERING INDEX", "Index Scan", "Index Only Scan", "Bitmap Index Scan")
     session = SessionLocal()
-    if session.query(Badge).count() == 0:
-        badges = [
-            Badge(name="First Step", description="Complete your first task", icon="🌟"),
-            Badge(name="Early Bird", description="Complete a task before 8 AM", icon="🌅"),
-            Badge(name="Consistency King", description="Maintain a 7-day streak", icon="🔥"),
-            Badge(name="Task Master", description="Complete 50 tasks", icon="🏆"),
-            Badge(name="Goal Getter", description="Complete your first long-term goal", icon="🎯")
-        ]
-        session.add_all(badges)
-        session.commit()
+    results = {}
+    for name, query in hot_queries(session).items():
+        plan = explain(query)
+        results[name] = (any(m in line for line in plan for m in markers), plan)
     session.close()
+    return results
+
+if __name__ == "__main__":
+    import sys
+    init_db()
+    if sys.argv[1:] == ["explain"]:
+        results = check_query_plans()
+        for name, (uses_index, plan) in results.items():
+            print(f"{'OK  ' if uses_index else 'SCAN'} {name}")
+            for line in plan:
+                print(f"       {line}")
+        sys.exit(0 if all(ok for ok, _ in results.values()) else 1)
+
+    # Startup timing report: one cold init followed by warm (rerun) calls.
+    for _ in range(100):
+        with perf.timed("init_db.rerun"):
+            init_db()
+    print(f"Schema version: {get_schema_version()}")
+    print(perf.format_report())
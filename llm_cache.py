@@ -0,0 +1,138 @@
+"""
+Two-tier response cache for LLM goal decompositions.
+
+Tier 1 is an in-process LRU; tier 2 is a SQLite file shared by every process
+on the host, with TTL and size-based eviction. Keys are derived from the
+normalized request plus the model and prompt version, so prompt changes never
+serve stale plans.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import perf
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))   # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 256))
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def make_key(title, description, custom_instructions, model, prompt_version) -> str:
+    payload = json.dumps([_normalize(title), _normalize(description), _normalize(custom_instructions),
+                          model, prompt_version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DecompositionCache:
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 memory_entries=LLM_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS decompositions (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_decompositions_last_access ON decompositions (last_access)")
+        self._conn.commit()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        """Return the cached task list for `key`, or None."""
+        with perf.timed("llm_cache.lookup"), self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+            row = self._conn.execute("SELECT value, created_at FROM decompositions WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] < self.ttl:
+                self._conn.execute("UPDATE decompositions SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self.counters["disk_hits"] += 1
+                return value
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            now = time.time()
+            self._remember(key, now, value)
+            self._conn.execute("INSERT OR REPLACE INTO decompositions (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value), now, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._conn.execute("DELETE FROM decompositions WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM decompositions")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus lookup and LLM latency (ms)."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._conn.execute("SELECT COUNT(*) FROM decompositions").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        timings = perf.get_timings()
+        for name in ("llm_cache.lookup", "llm.decompose"):
+            t = timings.get(name)
+            stats[f"{name}.avg_ms"] = (t["total"] / t["count"] * 1000) if t else 0.0
+        return stats
+
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        cur = self._conn.execute("DELETE FROM decompositions WHERE created_at < ?", (now - self.ttl,))
+        evicted = cur.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM decompositions").fetchone()[0]
+        if count > self.max_entries:
+            cur = self._conn.execute(
+                "DELETE FROM decompositions WHERE key IN (SELECT key FROM decompositions ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,))
+            evicted += cur.rowcount
+        self.counters["evictions"] += max(evicted, 0)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_decomposition_cache() -> DecompositionCache:
+    """Process-wide cache instance, created on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DecompositionCache()
+    return _cache
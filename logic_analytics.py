@@ -1,124 +1,540 @@
+import json
+import os
 from datetime import date, timedelta
-from database import SessionLocal, Task, UserStats, Badge, Goal
-from sqlalchemy import func
+import perf
+from database import SessionLocal, Task, UserStats, Goal, User, ProductivityForecast, touch_user
+from logic_badges import reevaluate_badges
+from cache import cached
+from sqlalchemy import func, Date, Integer, String, select, case, cast, delete, insert, and_, type_coerce
+from sqlalchemy.orm import aliased
 
-def calculate_productivity_score(completed_tasks):
-    """
-    Calculates a score based on task count and difficulty.
-    Formula: Sum(difficulty * weight)
-    """
-    if not completed_tasks:
-        return 0.0
-    
-    score = 0
-    for task in completed_tasks:
-        score += task.difficulty * 10
-    
-    return min(score, 100.0) # Cap at 100
+# Round trips allowed for one Dashboard snapshot (see get_dashboard_snapshot).
+DASHBOARD_QUERY_BUDGET = 2
+# Dashboard forecast model: "linear", "holt" or "seasonal" (see logic_forecast.MODELS)
+FORECAST_MODEL = os.getenv("FORECAST_MODEL", "linear")
 
-def update_daily_stats():
-    session = SessionLocal()
-    today = date.today()
-    
-    # Get completed tasks for today
-    completed_tasks = session.query(Task).filter(
-        Task.status == "Completed",
-        Task.due_date == today
-    ).all()
-    
-    count = len(completed_tasks)
-    score = calculate_productivity_score(completed_tasks)
-    
-    # Update or create UserStats for today
-    stats = session.query(UserStats).filter(UserStats.date == today).first()
+def stats_day(task):
+    """The day a completed task is credited to (legacy rows fall back to due date)."""
+    return task.completed_at.date() if task.completed_at else task.due_date
+
+def _get_or_create_stats(session, user_id, day):
+    stats = session.query(UserStats).filter(UserStats.user_id == user_id, UserStats.date == day).first()
     if not stats:
-        # Check yesterday for streak
-        yesterday = today - timedelta(days=1)
-        yesterday_stats = session.query(UserStats).filter(UserStats.date == yesterday).first()
-        streak = (yesterday_stats.streak_count + 1) if (yesterday_stats and yesterday_stats.tasks_completed > 0) else (1 if count > 0 else 0)
-        
-        stats = UserStats(date=today, tasks_completed=count, productivity_score=score, streak_count=streak)
+        stats = UserStats(user_id=user_id, date=day, tasks_completed=0, difficulty_points=0, productivity_score=0.0, streak_count=0)
         session.add(stats)
-    else:
-        stats.tasks_completed = count
-        stats.productivity_score = score
-        # Streak logic might need a bit more care on updates, but for now:
-        if stats.tasks_completed > 0 and stats.streak_count == 0:
-             yesterday = today - timedelta(days=1)
-             yesterday_stats = session.query(UserStats).filter(UserStats.date == yesterday).first()
-             stats.streak_count = (yesterday_stats.streak_count + 1) if yesterday_stats else 1
+        session.flush()
+    return stats
+
+def _reset_best_streak(session, user_id):
+    """Sets User.best_streak back to the longest stored streak after streaks shrank."""
+    session.flush()
+    best = select(func.coalesce(func.max(UserStats.streak_count), 0)).where(UserStats.user_id == user_id).scalar_subquery()
+    session.query(User).filter(User.id == user_id).update({User.best_streak: best}, synchronize_session=False)
+
+def apply_completion_delta(session, user_id, day, difficulty, delta):
+    """
+    Adjusts one user's stats row for `day` by a completed-task delta (+1/-1).
+    Runs inside the caller's transaction; the caller commits.
+    """
+    return apply_completion_counts(session, user_id, day, delta, delta * (difficulty or 1))
+
+def apply_completion_counts(session, user_id, day, tasks_delta, points_delta):
+    """
+    Adjusts one user's stats row for `day` by a batch of completions: `tasks_delta`
+    tasks worth `points_delta` difficulty points (negative to reverse them). Call
+    it once the task change is in the session. A day before the user's latest
+    stats row shifts the streaks after it, so those days are recomputed instead.
+    Returns the day's row, or None when it no longer has completions.
+    """
+    latest = session.query(func.max(UserStats.date)).filter(UserStats.user_id == user_id).scalar()
+    if latest is not None and day < latest:
+        session.flush()  # the recompute reads the task change from the database
+        recompute_stats(session, [user_id], since=day)
+        _reset_best_streak(session, user_id)
+        return session.query(UserStats).populate_existing().filter(UserStats.user_id == user_id, UserStats.date == day).first()
+
+    stats = _get_or_create_stats(session, user_id, day)
+    was_active = stats.tasks_completed > 0
+
+    stats.tasks_completed = max(0, stats.tasks_completed + tasks_delta)
+    stats.difficulty_points = max(0, (stats.difficulty_points or 0) + points_delta)
+    stats.productivity_score = min(stats.difficulty_points * 10, 100.0)
+
+    is_active = stats.tasks_completed > 0
+    if is_active and not was_active:
+        yesterday = session.query(UserStats).filter(UserStats.user_id == user_id, UserStats.date == day - timedelta(days=1)).first()
+        stats.streak_count = (yesterday.streak_count + 1) if (yesterday and yesterday.tasks_completed > 0) else 1
+    elif not is_active:
+        session.delete(stats)
+        if was_active:
+            _reset_best_streak(session, user_id)
+        return None
+    return stats
+
+def _day_number(day, dialect):
+    """Days since an epoch as a SQL number, so consecutive days differ by exactly 1."""
+    if dialect == "postgresql":
+        return type_coerce(day - date(1970, 1, 1), Integer)
+    return func.julianday(day)
+
+def recompute_stats(session, user_ids=None, since=None):
+    """
+    Rebuilds the users' stats rows (all users when `user_ids` is None) from
+    `since` on, or their whole history, from one aggregate query over tasks.
+    Streaks are a gaps-and-islands pass: consecutive active days share
+    day number - row number, and a day's streak is its position in that run,
+    continued from the stored streak of the day before `since`.
+    Runs inside the caller's transaction; returns the number of stats rows.
+
+    The rows are read before anything is written, so on SQLite parallel
+    recomputes (recompute_all) only hold the write lock for the short
+    delete-and-insert at the end.
+    """
+    dialect = session.get_bind().dialect.name
+    day_col = func.coalesce(func.date(Task.completed_at), Task.due_date, type_=Date)
+    days = select(
+        Task.user_id.label("user_id"), day_col.label("day"),
+        func.count(Task.id).label("tasks"), func.sum(func.coalesce(Task.difficulty, 1)).label("points"),
+    ).where(Task.status == "Completed", Task.user_id.isnot(None), day_col.isnot(None)).group_by(Task.user_id, day_col)
+    stale = delete(UserStats)
+    if user_ids is not None:
+        days = days.where(Task.user_id.in_(user_ids))
+        stale = stale.where(UserStats.user_id.in_(user_ids))
+        for user_id in user_ids:
+            touch_user(session, user_id)
+    if since is not None:
+        days = days.where(day_col >= since)
+        stale = stale.where(UserStats.date >= since)
+    days = days.subquery()
+
+    island = _day_number(days.c.day, dialect) - func.row_number().over(partition_by=days.c.user_id, order_by=days.c.day)
+    runs = select(days, island.label("island")).subquery()
+    run = (runs.c.user_id, runs.c.island)
+    active = select(
+        runs.c.user_id, runs.c.day, runs.c.tasks, runs.c.points,
+        func.row_number().over(partition_by=run, order_by=runs.c.day).label("streak"),
+        func.min(runs.c.day).over(partition_by=run).label("run_start"),
+    ).subquery()
+
+    streak = active.c.streak
+    source = active
+    if since is not None:
+        before = aliased(UserStats)
+        source = active.outerjoin(before, and_(
+            before.user_id == active.c.user_id, before.date == since - timedelta(days=1), before.tasks_completed > 0))
+        streak = streak + case((active.c.run_start == since, func.coalesce(before.streak_count, 0)), else_=0)
+    rows = select(
+        active.c.user_id, active.c.day, active.c.tasks, active.c.points,
+        case((active.c.points * 10 > 100, 100.0), else_=active.c.points * 10.0), streak,
+    ).select_from(source)
+
+    columns = ("user_id", "date", "tasks_completed", "difficulty_points", "productivity_score", "streak_count")
+    rows = [dict(zip(columns, row)) for row in session.execute(rows)]
+    session.execute(stale, execution_options={"synchronize_session": False})
+    if rows:
+        session.execute(insert(UserStats.__table__), rows)
+    return len(rows)
 
+def rebuild_user_stats(session, user_id):
+    """
+    Rebuilds one user's entire stats history from the tasks table.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    recompute_stats(session, [user_id])
+
+# --- Bulk recompute ---
+# Users are split into contiguous id ranges of RECOMPUTE_BATCH users. Each range
+# is rebuilt and committed by a worker process, and finished ranges go to a JSON
+# checkpoint so an interrupted run picks up where it stopped.
+RECOMPUTE_BATCH = 500
+# SQLite lets one worker write at a time; the others queue for up to this long
+RECOMPUTE_SQLITE_BUSY_MS = 120_000
+
+def _recompute_range(job):
+    """Pool worker: recompute_stats and badges for one id range, in one transaction."""
+    user_ids, since = job
+    session = SessionLocal()
+    if session.get_bind().dialect.name == "sqlite":
+        session.connection().exec_driver_sql(f"PRAGMA busy_timeout = {RECOMPUTE_SQLITE_BUSY_MS}")
+    rows = recompute_stats(session, user_ids, since)
+    reevaluate_badges(session, user_ids)
     session.commit()
-    check_badges(session, stats)
     session.close()
+    return user_ids[0], user_ids[-1], len(user_ids), rows
 
-def check_badges(session, stats):
+def _load_checkpoint(path, run):
+    """Finished [first id, last id] ranges from a checkpoint of the same run, else []."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        saved = json.load(f)
+    return saved["done"] if saved.get("run") == run else []
+
+def _save_checkpoint(path, run, done):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"run": run, "done": done}, f)
+    os.replace(tmp, path)  # atomic: an interrupted write leaves the previous checkpoint
+
+def recompute_all(user_ids=None, since=None, workers=None, batch=RECOMPUTE_BATCH, checkpoint=None, report=print):
     """
-    Unlocks badges based on performance.
+    recompute_stats and reevaluate_badges for `user_ids` (all users when None),
+    sharded by id range over a pool of `workers` processes. Ranges finished by an
+    earlier run with the same arguments are skipped when `checkpoint` names its
+    file; the file is removed once every range is done. Returns (users, stats rows).
     """
-    # First Step
-    if stats.tasks_completed >= 1:
-        badge = session.query(Badge).filter(Badge.name == "First Step").first()
-        if badge and not badge.unlocked_at:
-            badge.unlocked_at = date.today()
+    import bisect
+    import multiprocessing
+    import time
 
-    # Consistency King (7 day streak)
-    if stats.streak_count >= 7:
-        badge = session.query(Badge).filter(Badge.name == "Consistency King").first()
-        if badge and not badge.unlocked_at:
-            badge.unlocked_at = date.today()
+    session = SessionLocal()
+    query = session.query(User.id).order_by(User.id)
+    if user_ids is not None:
+        query = query.filter(User.id.in_(user_ids))
+    ids = [uid for (uid,) in query]
+    session.close()
 
-    # Task Master (50 total)
-    total_completed = session.query(func.sum(UserStats.tasks_completed)).scalar() or 0
-    if total_completed >= 50:
-        badge = session.query(Badge).filter(Badge.name == "Task Master").first()
-        if badge and not badge.unlocked_at:
-            badge.unlocked_at = date.today()
+    run = {"users": "all" if user_ids is None else sorted(user_ids), "since": since.isoformat() if since else None}
+    done = _load_checkpoint(checkpoint, run)
+    starts = sorted(first for first, _ in done)
+    last_of = dict(done)
+    def finished(uid):
+        i = bisect.bisect_right(starts, uid) - 1
+        return i >= 0 and uid <= last_of[starts[i]]
+    todo = [uid for uid in ids if not finished(uid)]
+    jobs = [(todo[i:i + batch], since) for i in range(0, len(todo), batch)]
+    if len(todo) < len(ids):
+        report(f"Resuming from {checkpoint}: {len(ids) - len(todo)} of {len(ids)} user(s) already done")
 
-    session.commit()
+    users = rows = 0
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(workers) if workers != 1 and len(jobs) > 1 else None
+    try:
+        results = pool.imap_unordered(_recompute_range, jobs) if pool else map(_recompute_range, jobs)
+        for first, last, count, stats_rows in results:
+            users += count
+            rows += stats_rows
+            if checkpoint:
+                done.append([first, last])
+                _save_checkpoint(checkpoint, run, done)
+            elapsed = time.perf_counter() - started
+            eta = elapsed / users * (len(todo) - users)
+            report(f"[{users}/{len(todo)} users] {rows} stats row(s), {users / elapsed:.0f} users/s, ETA {eta:.0f}s")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return users, rows
 
-def forecast_productivity():
+def get_score_series(user_id, today, days):
     """
-    Uses Linear Regression to predict productivity score for tomorrow 
-    based on the last 7 days of data.
+    (first day, daily productivity scores, days with a stats row) for up to `days`
+    days ending `today`. Days without a stats row score 0; the series starts at the
+    user's first stats day in that window.
     """
-    from sklearn.linear_model import LinearRegression
-    import numpy as np
-    
     session = SessionLocal()
-    # Get last 14 days of data
-    stats = session.query(UserStats).order_by(UserStats.date.desc()).limit(14).all()
+    rows = session.query(UserStats.date, UserStats.productivity_score).filter(
+        UserStats.user_id == user_id, UserStats.date > today - timedelta(days=days), UserStats.date <= today
+    ).order_by(UserStats.date).all()
     session.close()
-    
-    if len(stats) < 3:
+    if not rows:
+        return today, [], 0
+    start = rows[0][0]
+    scores = [0.0] * ((today - start).days + 1)
+    for day, score in rows:
+        scores[(day - start).days] = score or 0.0
+    return start, scores, len(rows)
+
+def forecast_productivity(user_id, today=None, model=None, horizon=1, level=0.8):
+    """
+    Forecast of the user's productivity score for the `horizon` days after today,
+    with `level` prediction intervals (see logic_forecast), or None with fewer
+    than 3 stats days. Cached per user and day until the user's stats change.
+    """
+    return _load_forecast(user_id, today or date.today(), model or FORECAST_MODEL, horizon, level)
+
+@cached("forecast")
+def _load_forecast(user_id, today, model, horizon, level):
+    from logic_forecast import MODELS, MIN_POINTS, forecast
+    start, scores, observed = get_score_series(user_id, today, MODELS[model][1])
+    if observed < MIN_POINTS:
         return None # Not enough data for a trend
-    
-    # Reverse to get chronological order
-    stats = stats[::-1]
-    
-    # X = days (0, 1, 2...), y = productivity_score
-    X = np.array(range(len(stats))).reshape(-1, 1)
-    y = np.array([s.productivity_score for s in stats])
-    
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    # Predict for tomorrow
-    next_day = np.array([[len(stats)]])
-    prediction = model.predict(next_day)[0]
-    
-    return max(0.0, min(100.0, float(prediction)))
+    return forecast(scores, start, model, horizon, level)
+
+def load_score_matrix(session, today, days):
+    """
+    Every user's productivity scores for the `days` days ending `today` as a dense
+    matrix: (user ids, users x days scores, users x days mask of days with a stats row).
+    Dates come back as ISO strings and are parsed in one NumPy call.
+    """
+    import gc
+    import numpy as np
+    start = today - timedelta(days=days - 1)
+    # Millions of short-lived row tuples would trigger repeated full collections
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        rows = session.execute(
+            select(UserStats.user_id, cast(UserStats.date, String), UserStats.productivity_score)
+            .where(UserStats.date >= start, UserStats.date <= today)
+        ).all()
+        if not rows:
+            return np.empty(0, dtype=int), np.zeros((0, days)), np.zeros((0, days), dtype=bool)
+        user_col, day_col, score_col = zip(*rows)
+        del rows
+    finally:
+        if gc_enabled:
+            gc.enable()
+    user_ids, row = np.unique(np.array(user_col), return_inverse=True)
+    column = (np.array(day_col, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(int)
+    scores = np.zeros((len(user_ids), days))
+    observed = np.zeros((len(user_ids), days), dtype=bool)
+    scores[row, column] = np.array(score_col, dtype=float)
+    observed[row, column] = True
+    return user_ids, np.nan_to_num(scores), observed
 
-def get_productivity_trends():
+def forecast_all_users(today=None, model=None, horizon=1, level=0.8):
     """
-    Returns data for Plotly charts.
+    Forecasts the `horizon` days after `today` for every user with at least 3 recent
+    stats days, in one vectorized pass (logic_forecast.forecast_batch), and replaces
+    that day's rows in the forecasts table. Returns the number of users forecast.
+    """
+    import numpy as np
+    from logic_forecast import MODELS, forecast_batch
+    today, model = today or date.today(), model or FORECAST_MODEL
+    session = SessionLocal()
+    with perf.timed("forecast_all.load"):
+        user_ids, scores, observed = load_score_matrix(session, today, MODELS[model][1])
+    with perf.timed("forecast_all.fit"):
+        result = forecast_batch(scores, observed, today - timedelta(days=scores.shape[1] - 1), model, horizon, level)
+    with perf.timed("forecast_all.store"):
+        forecast_rows = [
+            {"user_id": int(user_id), "day": day, "model": model, "fitted_model": str(fitted),
+             "value": float(values[h]), "lower": float(lower[h]), "upper": float(upper[h]), "level": level}
+            for user_id, fitted, values, lower, upper in zip(
+                user_ids, result["fitted"], result["values"], result["lower"], result["upper"])
+            if not np.isnan(values[0])
+            for h, day in enumerate(result["dates"])
+        ]
+        session.execute(delete(ProductivityForecast).where(
+            ProductivityForecast.day.in_(result["dates"]), ProductivityForecast.model == model))
+        if forecast_rows:
+            session.execute(insert(ProductivityForecast), forecast_rows)
+        session.commit()
+    session.close()
+    return len(forecast_rows) // horizon
+
+TREND_GRANULARITIES = ("day", "week", "month")
+# Most points a trend line sends to the browser (see downsample_lttb)
+TREND_POINT_BUDGET = int(os.getenv("TREND_POINT_BUDGET", 500))
+# Above this many points a trace is drawn with WebGL (Scattergl) instead of SVG
+TREND_WEBGL_POINTS = 1000
+
+def _trend_bucket(column, granularity, dialect):
+    """First day of the day/week (Monday)/month bucket holding `column`, as a SQL date expression."""
+    if granularity == "day":
+        return column
+    if dialect == "postgresql":
+        return cast(func.date_trunc(granularity, column), Date)
+    if granularity == "week":
+        return func.date(column, "weekday 0", "-6 days", type_=Date)
+    return func.date(column, "start of month", type_=Date)
+
+@cached()
+def get_productivity_trends(user_id, start=None, end=None, granularity="day"):
+    """
+    (bucket start dates, mean productivity score, tasks completed) per day, week or
+    month of the user's stats between `start` and `end` inclusive (open-ended when
+    None). Buckets are grouped in SQL on the (user_id, date) index, so a long
+    history returns one row per bucket rather than per day.
     """
     session = SessionLocal()
-    stats = session.query(UserStats).order_by(UserStats.date.asc()).all()
+    bucket = _trend_bucket(UserStats.date, granularity, session.get_bind().dialect.name).label("bucket")
+    query = session.query(bucket, func.avg(UserStats.productivity_score), func.sum(UserStats.tasks_completed)).filter(
+        UserStats.user_id == user_id)
+    if start is not None:
+        query = query.filter(UserStats.date >= start)
+    if end is not None:
+        query = query.filter(UserStats.date <= end)
+    rows = query.group_by(bucket).order_by(bucket).all()
     session.close()
     
-    dates = [s.date for s in stats]
-    scores = [s.productivity_score for s in stats]
-    counts = [s.tasks_completed for s in stats]
+    dates = [row[0] for row in rows]
+    scores = [row[1] or 0.0 for row in rows]
+    counts = [row[2] or 0 for row in rows]
     
     return dates, scores, counts
+
+def downsample_lttb(x, y, budget=TREND_POINT_BUDGET):
+    """
+    Indices of at most `budget` points of the series (x, y) chosen by
+    Largest-Triangle-Three-Buckets: the first and last points, plus from each of
+    budget - 2 equal buckets the point forming the largest triangle with the
+    previous pick and the next bucket's mean. Peaks and troughs survive, unlike
+    striding or averaging. `x` must be increasing numbers (e.g. date ordinals).
+    """
+    import numpy as np
+    n = len(y)
+    if budget >= n or budget < 3:
+        return list(range(n))
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (budget - 2)
+    picked, a = [0], 0
+    for i in range(budget - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_hi = min(int((i + 2) * every) + 1, n)
+        mean_x, mean_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - mean_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picked.append(a)
+    picked.append(n - 1)
+    return picked
+
+def get_dashboard_snapshot(user_id, today=None, top_n=5):
+    """
+    Dashboard read model: KPIs and today's top-N pending tasks, fetched in two
+    aggregate statements and cached per day until the user's data changes.
+    The month calendar is cached separately (logic_calendar).
+    """
+    return _load_dashboard_snapshot(user_id, today or date.today(), top_n)
+
+@cached("dashboard_snapshot")
+def _load_dashboard_snapshot(user_id, today, top_n):
+
+    def stats_value(column, *conditions):
+        return select(column).where(UserStats.user_id == user_id, *conditions).order_by(
+            UserStats.date.desc()).limit(1).scalar_subquery()
+
+    is_completed = case((Task.status == "Completed", 1), else_=0)
+    kpis = (
+        select(
+            func.count(Task.id).label("total"),
+            func.coalesce(func.sum(is_completed), 0).label("completed"),
+            stats_value(UserStats.streak_count, UserStats.date >= today - timedelta(days=1), UserStats.tasks_completed > 0).label("streak"),
+            stats_value(UserStats.productivity_score, UserStats.date == today).label("score"),
+            stats_value(UserStats.tasks_completed, UserStats.date == today).label("done_today"),
+        )
+        # Outer join from the user row guarantees one row even with no tasks.
+        .select_from(User).outerjoin(Task, Task.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    focus = (
+        select(Task.id, Task.title, Task.priority, Task.category, func.count().over().label("remaining"))
+        .where(Task.user_id == user_id, Task.due_date == today, Task.status != "Completed")
+        .order_by(Task.priority.desc(), Task.id)
+        .limit(top_n)
+    )
+
+    session = SessionLocal()
+    kpi_rows = session.execute(kpis).all()
+    focus_rows = session.execute(focus).all()
+    session.close()
+
+    snapshot = {
+        "streak": 0, "score": 0.0, "done_today": 0,
+        "completed_total": 0, "pending_total": 0,
+        "today_tasks": [], "today_pending_total": 0,
+    }
+    for row in kpi_rows:
+        snapshot["streak"] = row.streak or 0
+        snapshot["score"] = row.score or 0.0
+        snapshot["done_today"] = row.done_today or 0
+        snapshot["completed_total"] += row.completed
+        snapshot["pending_total"] += row.total - row.completed
+    snapshot["today_tasks"] = [
+        {"id": r.id, "title": r.title, "priority": r.priority, "category": r.category} for r in focus_rows
+    ]
+    snapshot["today_pending_total"] = focus_rows[0].remaining if focus_rows else 0
+    return snapshot
+
+@cached()
+def get_goal_summaries(user_id):
+    """The user's goals, newest first, with their maintained progress counters."""
+    session = SessionLocal()
+    rows = session.query(Goal.id, Goal.title, Goal.target_date, Goal.total_tasks, Goal.completed_tasks, Goal.progress).filter(
+        Goal.user_id == user_id).order_by(Goal.id.desc()).all()
+    session.close()
+    return [row._asdict() for row in rows]
+
+@cached()
+def get_achievement_counts(user_id):
+    """(completed tasks, goals) for the Achievements page, in one statement."""
+    session = SessionLocal()
+    completed = select(func.count(Task.id)).where(Task.user_id == user_id, Task.status == "Completed").scalar_subquery()
+    goals = select(func.count(Goal.id)).where(Goal.user_id == user_id).scalar_subquery()
+    counts = tuple(session.execute(select(completed, goals)).one())
+    session.close()
+    return counts
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Productivity stats maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    repair = sub.add_parser("repair", help="Rebuild one user's stats history, rollups and badges from tasks")
+    repair.add_argument("--user", type=int, required=True, help="User ID to rebuild")
+    dashboard = sub.add_parser("dashboard", help="Print a Dashboard snapshot and check its query budget")
+    dashboard.add_argument("--user", type=int, required=True, help="User ID to load")
+    forecast_cmd = sub.add_parser("forecast", help="Compare forecast models for one user")
+    forecast_cmd.add_argument("--user", type=int, required=True, help="User ID to forecast")
+    forecast_cmd.add_argument("--horizon", type=int, default=7, help="Days to forecast")
+    forecast_all = sub.add_parser("forecast-all", help="Forecast every user in one batch into the forecasts table")
+    forecast_all.add_argument("--model", choices=["linear", "holt", "seasonal"], default=None)
+    forecast_all.add_argument("--horizon", type=int, default=1, help="Days to forecast")
+    recompute = sub.add_parser("recompute", help="Rebuild stats, streaks and badges from tasks for many users in parallel")
+    recompute.add_argument("--users", default="all", help='"all" or comma-separated user IDs')
+    recompute.add_argument("--since", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD); default: whole history")
+    recompute.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    recompute.add_argument("--batch", type=int, default=RECOMPUTE_BATCH, help="Users per id range (one transaction each)")
+    recompute.add_argument("--checkpoint", default="./recompute.checkpoint.json", help="Progress file for resuming an interrupted run")
+    recompute.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "recompute":
+        user_ids = None if args.users == "all" else [int(uid) for uid in args.users.split(",")]
+        if args.restart and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+        with perf.timed("recompute"):
+            users, rows = recompute_all(user_ids, args.since, args.workers, args.batch, args.checkpoint)
+        print(f"Recomputed {rows} stats row(s) for {users} user(s)")
+        print(perf.format_report())
+    elif args.command == "forecast-all":
+        users = forecast_all_users(model=args.model, horizon=args.horizon)
+        print(f"Forecast {users} user(s)")
+        print(perf.format_report())
+    elif args.command == "forecast":
+        from logic_forecast import MODELS, backtest
+        for model, (_, window, _) in MODELS.items():
+            result = _load_forecast.uncached(args.user, date.today(), model, args.horizon, 0.8)
+            if result is None:
+                print(f"{model}: not enough data")
+                continue
+            start, scores, _ = get_score_series(args.user, date.today(), window)
+            mae = backtest(scores, start, model)
+            print(f"{model} (fitted as {result['model']}): one-day MAE over the last 14 days " + (f"{mae:.1f}" if mae is not None else "n/a"))
+            for day, value, low, high in zip(result["dates"], result["values"], result["lower"], result["upper"]):
+                print(f"  {day}  {value:5.1f}  [{low:5.1f}, {high:5.1f}]")
+    elif args.command == "repair":
+        from logic_rollups import rebuild_rollups
+        session = SessionLocal()
+        rebuild_user_stats(session, args.user)
+        rollups = rebuild_rollups(session, [args.user])
+        reevaluate_badges(session, [args.user])
+        session.commit()
+        days = session.query(UserStats).filter(UserStats.user_id == args.user).count()
+        session.close()
+        print(f"Rebuilt {days} stats day(s) and {rollups} rollup row(s) for user {args.user}")
+    elif args.command == "dashboard":
+        from database import count_queries
+        with count_queries() as queries:
+            snapshot = get_dashboard_snapshot(args.user)
+        for key, value in snapshot.items():
+            print(f"{key}: {value}")
+        print(f"queries: {queries.count} (budget {DASHBOARD_QUERY_BUDGET})")
+        raise SystemExit(0 if queries.count <= DASHBOARD_QUERY_BUDGET else 1)
@@ -0,0 +1,171 @@
+"""
+Rule-based, per-user badge engine.
+
+Badges are defined by a static in-process catalog. Each rule subscribes to the
+events that can change its outcome and checks the user's maintained counters
+(columns on `users`), so evaluating an event never scans tasks or stats.
+"""
+from datetime import date
+from sqlalchemy import select, func, case
+from database import SessionLocal, User, Task, Goal, UserStats, UserBadge
+from cache import cached
+
+EVENT_TASK_COMPLETED = "task_completed"
+EVENT_STREAK_CHANGED = "streak_changed"
+EVENT_GOAL_COMPLETED = "goal_completed"
+
+# Completions strictly before this hour count towards "Early Bird".
+EARLY_BIRD_HOUR = 8
+
+
+class BadgeRule:
+    def __init__(self, key, name, description, icon, events, check):
+        self.key = key
+        self.name = name
+        self.description = description
+        self.icon = icon
+        self.events = events
+        self.check = check  # callable(counters) -> bool
+
+
+BADGE_RULES = [
+    BadgeRule("first_step", "First Step", "Complete your first task", "🌟",
+              (EVENT_TASK_COMPLETED,), lambda c: c.tasks_completed_total >= 1),
+    BadgeRule("early_bird", "Early Bird", "Complete a task before 8 AM", "🌅",
+              (EVENT_TASK_COMPLETED,), lambda c: c.early_completions >= 1),
+    BadgeRule("consistency_king", "Consistency King", "Maintain a 7-day streak", "🔥",
+              (EVENT_STREAK_CHANGED,), lambda c: c.best_streak >= 7),
+    BadgeRule("task_master", "Task Master", "Complete 50 tasks", "🏆",
+              (EVENT_TASK_COMPLETED,), lambda c: c.tasks_completed_total >= 50),
+    BadgeRule("goal_getter", "Goal Getter", "Complete your first long-term goal", "🎯",
+              (EVENT_GOAL_COMPLETED,), lambda c: c.goals_completed_total >= 1),
+]
+
+RULES_BY_KEY = {rule.key: rule for rule in BADGE_RULES}
+RULES_BY_EVENT = {}
+for _rule in BADGE_RULES:
+    for _event in _rule.events:
+        RULES_BY_EVENT.setdefault(_event, []).append(_rule)
+
+_COUNTER_COLUMNS = (User.tasks_completed_total, User.early_completions, User.best_streak, User.goals_completed_total)
+
+
+def _load_counters(session, user_id):
+    return session.execute(select(*_COUNTER_COLUMNS).where(User.id == user_id)).one_or_none()
+
+
+def _unlock(session, user_id, rules, counters, unlocked_keys):
+    newly_unlocked = []
+    for rule in rules:
+        if rule.key not in unlocked_keys and rule.check(counters):
+            session.add(UserBadge(user_id=user_id, badge_key=rule.key, unlocked_at=date.today()))
+            unlocked_keys.add(rule.key)
+            newly_unlocked.append(rule)
+    return newly_unlocked
+
+
+def dispatch(session, user_id, events):
+    """
+    Evaluates the rules subscribed to `events` for one user.
+    Runs inside the caller's transaction; returns the newly unlocked rules.
+    """
+    rules = {rule.key: rule for event in events for rule in RULES_BY_EVENT.get(event, [])}
+    if not rules or user_id is None:
+        return []
+    session.flush()
+    counters = _load_counters(session, user_id)
+    if counters is None:
+        return []
+    unlocked_keys = {key for (key,) in session.query(UserBadge.badge_key).filter(UserBadge.user_id == user_id)}
+    return _unlock(session, user_id, rules.values(), counters, unlocked_keys)
+
+
+def recompute_counters(session, user_ids=None):
+    """
+    Rebuilds the badge counters on `users` from tasks, stats and goals with
+    grouped queries (all users when `user_ids` is None).
+    """
+    def scoped(query, column):
+        return query.where(column.in_(user_ids)) if user_ids is not None else query
+
+    completed = scoped(select(
+        Task.user_id, func.count(Task.id),
+        func.sum(case((func.extract('hour', Task.completed_at) < EARLY_BIRD_HOUR, 1), else_=0))
+    ).where(Task.status == "Completed"), Task.user_id).group_by(Task.user_id)
+    streaks = scoped(select(UserStats.user_id, func.max(UserStats.streak_count)), UserStats.user_id).group_by(UserStats.user_id)
+    goals = scoped(select(Goal.user_id, func.count(Goal.id)).where(Goal.is_completed == True), Goal.user_id).group_by(Goal.user_id)
+
+    counters = {}
+    for uid, total, early in session.execute(completed):
+        counters.setdefault(uid, {})
+        counters[uid].update(tasks_completed_total=total, early_completions=early or 0)
+    for uid, best in session.execute(streaks):
+        counters.setdefault(uid, {})["best_streak"] = best or 0
+    for uid, count in session.execute(goals):
+        counters.setdefault(uid, {})["goals_completed_total"] = count
+
+    reset = dict(tasks_completed_total=0, early_completions=0, best_streak=0, goals_completed_total=0)
+    scoped_users = session.query(User).filter(User.id.in_(user_ids)) if user_ids is not None else session.query(User)
+    scoped_users.update(reset, synchronize_session=False)
+    for uid, values in counters.items():
+        if uid is not None:
+            session.query(User).filter(User.id == uid).update(values, synchronize_session=False)
+    session.flush()
+
+
+def reevaluate_badges(session, user_ids=None):
+    """
+    Bulk re-evaluation over historical data for the given users (or all users):
+    rebuilds their counters, then checks every rule. Returns {user_id: [rules]}.
+    """
+    recompute_counters(session, user_ids)
+    query = select(User.id, *_COUNTER_COLUMNS)
+    badges = session.query(UserBadge.user_id, UserBadge.badge_key)
+    if user_ids is not None:
+        query = query.where(User.id.in_(user_ids))
+        badges = badges.filter(UserBadge.user_id.in_(user_ids))
+
+    unlocked_by_user = {}
+    for uid, key in badges:
+        unlocked_by_user.setdefault(uid, set()).add(key)
+
+    results = {}
+    for row in session.execute(query):
+        newly = _unlock(session, row.id, BADGE_RULES, row, unlocked_by_user.get(row.id, set()))
+        if newly:
+            results[row.id] = newly
+    session.flush()
+    return results
+
+
+def get_user_badges(session, user_id):
+    """Returns [(rule, unlocked_at or None)] for the whole catalog."""
+    unlocked = dict(session.query(UserBadge.badge_key, UserBadge.unlocked_at).filter(UserBadge.user_id == user_id))
+    return [(rule, unlocked.get(rule.key)) for rule in BADGE_RULES]
+
+
+@cached()
+def get_unlocked_badges(user_id):
+    """{badge key: unlocked_at} for one user, cached until their data changes."""
+    session = SessionLocal()
+    unlocked = dict(session.query(UserBadge.badge_key, UserBadge.unlocked_at).filter(UserBadge.user_id == user_id))
+    session.close()
+    return unlocked
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Re-evaluate badges over historical data")
+    parser.add_argument("--user", type=int, action="append", help="User ID (repeatable); default: all users")
+    args = parser.parse_args()
+
+    init_db()
+    session = SessionLocal()
+    results = reevaluate_badges(session, args.user)
+    session.commit()
+    session.close()
+    for user_id, rules in sorted(results.items()):
+        print(f"user {user_id}: unlocked {', '.join(rule.name for rule in rules)}")
+    print(f"Re-evaluated badges for {'users ' + ', '.join(map(str, args.user)) if args.user else 'all users'}")
@@ -0,0 +1,169 @@
+"""
+Dashboard month calendar.
+
+Per-day task counts come from one GROUP BY on the (user_id, due_date) index.
+The rendered grid is kept in the user cache (cache.py) per (month, today), so a
+rerun that changed nothing serves the HTML straight from memory. After a month
+is shown, its neighbours are rendered on a background thread so paging to them
+is instant.
+"""
+import calendar
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from sqlalchemy import func
+from cache import get_cache
+from database import SessionLocal, Task
+
+DAY_HEADERS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+EMPTY_CELL = '<div style="min-height:70px; border: 1px solid rgba(255,255,255,0.05); padding: 6px;"></div>'
+
+
+def shift_month(year, month, delta):
+    """(year, month) moved by `delta` months."""
+    index = year * 12 + month - 1 + delta
+    return index // 12, index % 12 + 1
+
+
+def month_counts_query(session, user_id, year, month):
+    start = date(year, month, 1)
+    end = date(year, month, calendar.monthrange(year, month)[1])
+    return session.query(Task.due_date, func.count(Task.id)).filter(
+        Task.user_id == user_id, Task.due_date >= start, Task.due_date <= end).group_by(Task.due_date)
+
+
+def get_month_counts(user_id, year, month):
+    """{day of month: number of tasks due} for one user and month."""
+    session = SessionLocal()
+    rows = month_counts_query(session, user_id, year, month).all()
+    session.close()
+    return {due.day: count for due, count in rows}
+
+
+def render_month_grid(year, month, counts, today):
+    """The calendar card's HTML: one cell per day with its task count, weekends and today highlighted."""
+    first_weekday, days_in_month = calendar.monthrange(year, month)  # 0=Mon
+    # Convert Monday=0 start to Sunday=0 start
+    start_offset = (first_weekday + 1) % 7
+    in_month = (today.year, today.month) == (year, month)
+
+    header_html = "".join(
+        f'<div style="text-align:center; font-weight:700; color:{("#ef4444" if i in (0,6) else "rgba(255,255,255,0.7)")}; font-size:0.85rem; padding: 10px 0;">{d}</div>'
+        for i, d in enumerate(DAY_HEADERS)
+    )
+
+    cells = [EMPTY_CELL] * start_offset
+    for day in range(1, days_in_month + 1):
+        is_today = in_month and day == today.day
+        is_weekend = (start_offset + day - 1) % 7 in (0, 6)
+        tc = counts.get(day, 0)
+
+        bg = "rgba(0,212,255,0.2)" if is_today else ("rgba(239,68,68,0.06)" if is_weekend else "rgba(255,255,255,0.02)")
+        border = "2px solid #00d4ff" if is_today else "1px solid rgba(255,255,255,0.06)"
+        num_color = "#00d4ff" if is_today else ("#ef4444" if is_weekend else "rgba(255,255,255,0.8)")
+        dot_html = f'<div style="margin-top:4px;"><span style="background:#a855f7; color:#fff; font-size:0.65rem; padding:1px 6px; border-radius:8px;">{tc} task{"s" if tc != 1 else ""}</span></div>' if tc > 0 else ""
+
+        cells.append(f'''<div style="min-height:70px; border:{border}; padding:6px; background:{bg}; border-radius:4px; transition: all 0.2s ease;">
+            <div style="font-weight:{'700' if is_today else '500'}; font-size:0.95rem; color:{num_color};">{day}</div>
+            {dot_html}
+        </div>''')
+    # Fill remaining cells to complete the grid
+    cells += [EMPTY_CELL] * ((7 - len(cells) % 7) % 7)
+
+    return f"""
+        <div class="glass-card" style="padding: 24px; margin-bottom: 24px;">
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 16px;">
+                <h3 style="margin: 0; background: linear-gradient(90deg, #fff, #00d4ff); -webkit-background-clip: text; -webkit-text-fill-color: transparent;">📅 {date(year, month, 1).strftime("%B %Y")}</h3>
+                <div style="color: rgba(255,255,255,0.5); font-size: 0.85rem;">Today: {today.strftime('%A, %b %d')}</div>
+            </div>
+            <div style="display: grid; grid-template-columns: repeat(7, 1fr); gap: 2px;">
+                {header_html}
+                {"".join(cells)}
+            </div>
+        </div>
+    """
+
+
+def _load_month_grid(user_id, year, month, today):
+    return render_month_grid(year, month, get_month_counts(user_id, year, month), today)
+
+
+class MonthCalendar:
+    """Month grids served from the user cache, with background rendering of neighbouring months."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calendar")
+        self.prefetched = 0
+
+    def get(self, user_id, year, month, today=None):
+        """The month's grid HTML, rendered on a miss."""
+        return get_cache().get_or_load(user_id, "month_grid", _load_month_grid, year, month, today or date.today())
+
+    def prefetch(self, user_id, year, month, today=None, span=1):
+        """Renders the `span` months either side of (year, month) in the background."""
+        today = today or date.today()
+        cache = get_cache()
+        for delta in range(-span, span + 1):
+            if delta == 0:
+                continue
+            args = (*shift_month(year, month, delta), today)
+            key = cache.make_key(user_id, "month_grid", args)
+            with self._lock:
+                if key in self._pending or cache.contains(key):
+                    continue
+                self._pending.add(key)
+            self._executor.submit(self._prefetch, key, user_id, args)
+
+    def _prefetch(self, key, user_id, args):
+        try:
+            # Stored under the key taken at submit time; the cache discards it if the data changed since
+            get_cache().put(key, _load_month_grid(user_id, *args))
+            with self._lock:
+                self.prefetched += 1
+        except Exception as e:
+            print(f"Calendar prefetch failed for {args[0]}-{args[1]:02d}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_month_calendar() -> MonthCalendar:
+    """Process-wide calendar, created on first use."""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = MonthCalendar()
+    return _calendar
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from database import init_db, explain
+
+    parser = argparse.ArgumentParser(description="Time the Dashboard month calendar for one user")
+    parser.add_argument("--user", type=int, required=True)
+    parser.add_argument("--months", type=int, default=12, help="How many months to page through")
+    args = parser.parse_args()
+    init_db()
+
+    today = date.today()
+    session = SessionLocal()
+    print("\n".join(explain(month_counts_query(session, args.user, today.year, today.month))))
+    session.close()
+
+    calendar_view = get_month_calendar()
+    year, month = today.year, today.month
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        for i in range(args.months):
+            calendar_view.get(args.user, *shift_month(year, month, -i), today)
+        print(f"{label}: {(time.perf_counter() - start) / args.months * 1000:.2f} ms/month")
+    print(get_cache().stats()["by_name"])
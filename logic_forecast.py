@@ -0,0 +1,228 @@
+"""
+Productivity forecasting on a daily score series (one value per calendar day).
+
+Every model is closed-form NumPy and returns point forecasts with prediction
+intervals for the next `horizon` days:
+- "linear": least-squares trend line over the last 14 days.
+- "holt": Holt's linear exponential smoothing (level + trend) over the last 28
+  days, with the smoothing weights picked by one-step-ahead error on a grid.
+- "seasonal": trend line plus a day-of-week effect over the last 8 weeks.
+  Needs two full weeks of history; shorter series fall back to "linear".
+
+Intervals assume normal errors: OLS prediction variance for the regression
+models, the ETS(A,A,N) h-step variance for Holt.
+"""
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+MIN_POINTS = 3
+SCORE_RANGE = (0.0, 100.0)
+
+
+def _ols(X, y, X_new):
+    """Least-squares fit of y on X. Returns (predictions at X_new, their prediction standard errors)."""
+    coef, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+    resid = y - X @ coef
+    dof = max(len(y) - rank, 1)
+    sigma2 = resid @ resid / dof
+    # Var(y_new - ŷ) = σ² (1 + x₀ (XᵀX)⁻¹ x₀ᵀ)
+    leverage = np.einsum("ij,jk,ik->i", X_new, np.linalg.pinv(X.T @ X), X_new)
+    return X_new @ coef, np.sqrt(sigma2 * (1 + leverage))
+
+
+def fit_linear(y, start, horizon):
+    t = np.arange(len(y) + horizon, dtype=float)
+    X = np.column_stack([np.ones_like(t), t])
+    return _ols(X[:len(y)], y, X[len(y):])
+
+
+def _weekday_dummies(start, days):
+    """One column per weekday except `start`'s, so the intercept absorbs that weekday."""
+    weekdays = (start.weekday() + np.arange(days)) % 7
+    return (weekdays[:, None] == (start.weekday() + np.arange(1, 7)) % 7).astype(float)
+
+
+def fit_seasonal(y, start, horizon):
+    t = np.arange(len(y) + horizon, dtype=float)
+    X = np.column_stack([np.ones_like(t), t, _weekday_dummies(start, len(t))])
+    return _ols(X[:len(y)], y, X[len(y):])
+
+
+HOLT_ALPHAS = np.linspace(0.1, 0.9, 9)
+HOLT_BETAS = np.linspace(0.05, 0.5, 10)
+
+
+def fit_holt(y, start, horizon):
+    # Every (alpha, beta) on the grid is run at once, one time step per iteration
+    alpha, beta = (a.ravel() for a in np.meshgrid(HOLT_ALPHAS, HOLT_BETAS))
+    level = np.full(alpha.shape, y[0])
+    trend = np.full(alpha.shape, y[1] - y[0])
+    sse = np.zeros(alpha.shape)
+    for value in y[1:]:
+        # Error-correction form of level = αy + (1-α)(level + trend), trend = β(Δlevel) + (1-β)trend
+        error = value - (level + trend)
+        sse += error * error
+        level_step = trend + alpha * error
+        level += level_step
+        trend += beta * (level_step - trend)
+    best = np.argmin(sse)
+    a, b = alpha[best], beta[best]
+    sigma2 = sse[best] / max(len(y) - 3, 1)
+    h = np.arange(1, horizon + 1)
+    # h-step variance: σ² (1 + Σ_{j<h} (α(1 + jβ))²)
+    spread = np.cumsum(np.concatenate([[0.0], (a * (1 + h[:-1] * b)) ** 2]))
+    return level[best] + h * trend[best], np.sqrt(sigma2 * (1 + spread))
+
+
+# name -> (fit(y, start, horizon) -> (mean, standard error), days of history used, minimum days)
+MODELS = {
+    "linear": (fit_linear, 14, MIN_POINTS),
+    "holt": (fit_holt, 28, MIN_POINTS),
+    "seasonal": (fit_seasonal, 56, 14),
+}
+
+
+def forecast(y, start, model="linear", horizon=1, level=0.8):
+    """
+    Forecasts the `horizon` days after a daily series `y` whose first value is on
+    date `start`. Returns {"model", "level", "dates", "values", "lower", "upper"},
+    clipped to the score range, or None with fewer than MIN_POINTS days.
+    """
+    fit, window, min_points = MODELS[model]
+    if len(y) < min_points:
+        if model == "linear":
+            return None
+        return forecast(y, start, "linear", horizon, level)
+    start += timedelta(days=max(len(y) - window, 0))
+    y = np.asarray(y[-window:], dtype=float)
+    mean, se = fit(y, start, horizon)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    lo, hi = SCORE_RANGE
+    first = start + timedelta(days=len(y))
+    return {
+        "model": model,
+        "level": level,
+        "dates": [first + timedelta(days=i) for i in range(horizon)],
+        "values": np.clip(mean, lo, hi).tolist(),
+        "lower": np.clip(mean - z * se, lo, hi).tolist(),
+        "upper": np.clip(mean + z * se, lo, hi).tolist(),
+    }
+
+
+def backtest(y, start, model="linear", holdout=14):
+    """Mean absolute error of one-day-ahead forecasts over the last `holdout` days of `y`."""
+    errors = []
+    for end in range(max(len(y) - holdout, MIN_POINTS), len(y)):
+        result = forecast(y[:end], start, model)
+        errors.append(abs(result["values"][0] - y[end]))
+    return float(np.mean(errors)) if errors else None
+
+
+# --- Batch forecasting ---
+# The same models over a users x days matrix at once. Row u holds user u's daily
+# scores; columns before the user's first stats day in the model's window are
+# masked out, so each row is fitted exactly like forecast() on that user's series.
+BATCH_CHUNK = 10_000  # rows fitted per pass, bounding the temporary arrays
+
+
+def _batch_ols(X, Y, mask, X_new):
+    """Per-row weighted least squares of Y on a shared design X (days x p). Returns (mean, se), rows x horizon."""
+    p = X.shape[1]
+    XtX = (mask @ (X[:, :, None] * X[:, None, :]).reshape(len(X), p * p)).reshape(-1, p, p)
+    Xty = (mask * Y) @ X
+    coef = np.linalg.solve(XtX, Xty[:, :, None])[:, :, 0]
+    resid = mask * (Y - coef @ X.T)
+    dof = np.maximum(mask.sum(axis=1) - p, 1)
+    sigma2 = (resid ** 2).sum(axis=1) / dof
+    leverage = np.einsum("hp,uph->uh", X_new, np.linalg.solve(XtX, np.broadcast_to(X_new.T, (len(Y), p, len(X_new)))))
+    return coef @ X_new.T, np.sqrt(sigma2[:, None] * (1 + leverage))
+
+
+def batch_linear(Y, mask, start, horizon):
+    t = np.arange(Y.shape[1] + horizon, dtype=float)
+    X = np.column_stack([np.ones_like(t), t])
+    return _batch_ols(X[:Y.shape[1]], Y, mask, X[Y.shape[1]:])
+
+
+def batch_seasonal(Y, mask, start, horizon):
+    t = np.arange(Y.shape[1] + horizon, dtype=float)
+    X = np.column_stack([np.ones_like(t), t, _weekday_dummies(start, len(t))])
+    return _batch_ols(X[:Y.shape[1]], Y, mask, X[Y.shape[1]:])
+
+
+def batch_holt(Y, mask, start, horizon):
+    users, days = Y.shape
+    grid_alpha, grid_beta = (a.ravel() for a in np.meshgrid(HOLT_ALPHAS, HOLT_BETAS))
+    # Rows sorted by first day: on each day the users already started are a prefix
+    first = days - mask.sum(axis=1).astype(int)
+    order = np.argsort(first, kind="stable")
+    Y, first = Y[order], first[order]
+    rows = np.arange(users)
+    # users x grid state, started at each user's first two days
+    level = np.repeat(Y[rows, first][:, None], len(grid_alpha), axis=1)
+    trend = np.repeat((Y[rows, first + 1] - Y[rows, first])[:, None], len(grid_alpha), axis=1)
+    sse = np.zeros_like(level)
+    for day in range(1, days):
+        k = np.searchsorted(first, day)  # users with first < day
+        level_k, trend_k = level[:k], trend[:k]
+        error = Y[:k, day][:, None] - level_k - trend_k
+        sse[:k] += error * error
+        error *= grid_alpha
+        error += trend_k  # now the level step
+        level_k += error
+        error -= trend_k
+        error *= grid_beta
+        trend_k += error
+    best = np.argmin(sse, axis=1)
+    a, b = grid_alpha[best][:, None], grid_beta[best][:, None]
+    sigma2 = sse[rows, best] / np.maximum(days - first - 3, 1)
+    h = np.arange(1, horizon + 1)
+    spread = np.cumsum(np.concatenate([np.zeros((users, 1)), (a * (1 + h[:-1] * b)) ** 2], axis=1), axis=1)
+    mean = level[rows, best][:, None] + h * trend[rows, best][:, None]
+    se = np.sqrt(sigma2[:, None] * (1 + spread))
+    unsort = np.argsort(order)
+    return mean[unsort], se[unsort]
+
+
+BATCH_MODELS = {"linear": batch_linear, "holt": batch_holt, "seasonal": batch_seasonal}
+
+
+def forecast_batch(Y, observed, start, model="linear", horizon=1, level=0.8):
+    """
+    forecast() for every row of a users x days score matrix whose column 0 is
+    date `start`; `observed` marks the days that have a stats row. Returns
+    {"model", "level", "dates"} plus rows x horizon arrays "values", "lower" and
+    "upper" (NaN for users with fewer than MIN_POINTS stats days in the window)
+    and a per-row "fitted" model name ("linear" where "seasonal" lacks history).
+    """
+    _, window, min_points = MODELS[model]
+    offset = max(np.shape(Y)[1] - window, 0)
+    Y = np.asarray(Y, dtype=float)[:, offset:]
+    observed = np.asarray(observed, dtype=bool)[:, offset:]
+    start += timedelta(days=offset)
+    days = Y.shape[1]
+    first = np.argmax(observed, axis=1)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    lo, hi = SCORE_RANGE
+
+    mean = np.full((len(Y), horizon), np.nan)
+    se = np.full((len(Y), horizon), np.nan)
+    fitted = np.where(days - first < min_points, "linear", model)
+    valid = observed.sum(axis=1) >= MIN_POINTS
+    for name in np.unique(fitted[valid]):
+        rows = np.flatnonzero(valid & (fitted == name))
+        for chunk in np.array_split(rows, -(-len(rows) // BATCH_CHUNK)):
+            mask = (np.arange(days) >= first[chunk][:, None]).astype(float)
+            mean[chunk], se[chunk] = BATCH_MODELS[name](Y[chunk] * mask, mask, start, horizon)
+    first_day = start + timedelta(days=days)
+    return {
+        "model": model,
+        "level": level,
+        "dates": [first_day + timedelta(days=i) for i in range(horizon)],
+        "values": np.clip(mean, lo, hi),
+        "lower": np.clip(mean - z * se, lo, hi),
+        "upper": np.clip(mean + z * se, lo, hi),
+        "fitted": fitted,
+    }
@@ -0,0 +1,223 @@
+"""
+Background planning jobs.
+
+Goal decomposition runs on a bounded thread pool instead of inside the
+Streamlit script, so a slow LLM never blocks a rerun. Job state lives in the
+planning_jobs table: it survives reruns and page refreshes, and identical
+in-flight submissions are deduplicated. Each process refreshes heartbeat_at on
+the jobs it is running; a running job whose heartbeat stops (its process died)
+is re-queued by the stale-job sweep that queue polls and submissions run.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, update
+from database import SessionLocal, PlanningJob, Goal, Task
+
+PLANNING_WORKERS = int(os.getenv("PLANNING_WORKERS", 2))
+ACTIVE_STATUSES = ("queued", "running")
+HEARTBEAT_INTERVAL = 30  # seconds between heartbeats for this process's running jobs
+# A running job without a heartbeat for this long is assumed to belong to a dead process.
+STALE_AFTER = timedelta(minutes=2)
+SWEEP_INTERVAL = 30  # seconds between stale-job sweeps per process
+
+_executor = ThreadPoolExecutor(max_workers=PLANNING_WORKERS, thread_name_prefix="planning")
+_recover_lock = threading.Lock()
+_recovered = False
+_running = set()  # ids of jobs running in this process
+_running_lock = threading.Lock()
+_heartbeat_thread = None
+_last_sweep = 0.0
+
+
+def _get_agent():
+    from logic_llm import get_goal_agent
+    return get_goal_agent()
+
+
+def submit_planning_job(user_id, title, description="", custom_instructions="", target_date=None, refresh=False):
+    """
+    Queues a decomposition job. Returns (job_id, created); when an identical
+    job for this user is already queued or running, its id is returned instead.
+    """
+    fingerprint = _get_agent().cache_key(title, description, custom_instructions)
+    sweep_stale_jobs()  # an orphaned duplicate must not block this submission
+    session = SessionLocal()
+    existing = session.query(PlanningJob.id).filter(
+        PlanningJob.user_id == user_id,
+        PlanningJob.fingerprint == fingerprint,
+        PlanningJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    if existing:
+        session.close()
+        return existing[0], False
+
+    job = PlanningJob(user_id=user_id, fingerprint=fingerprint, title=title, description=description,
+                      custom_instructions=custom_instructions, target_date=target_date, refresh=refresh)
+    session.add(job)
+    session.commit()
+    job_id = job.id
+    session.close()
+    _executor.submit(_run_job, job_id)
+    return job_id, True
+
+
+def _run_job(job_id):
+    session = SessionLocal()
+    # Claim atomically so a job is never run twice, even across processes.
+    now = datetime.utcnow()
+    claimed = session.query(PlanningJob).filter(PlanningJob.id == job_id, PlanningJob.status == "queued").update(
+        {PlanningJob.status: "running", PlanningJob.started_at: now, PlanningJob.heartbeat_at: now}, synchronize_session=False)
+    session.commit()
+    if not claimed:
+        session.close()
+        return
+    with _running_lock:
+        _running.add(job_id)
+    _start_heartbeat()
+    job = session.get(PlanningJob, job_id)
+
+    try:
+        tasks = []
+        for sub in _get_agent().stream_decompose_goal(job.title, job.description or "", job.custom_instructions or "",
+                                                      refresh=job.refresh):
+            tasks.append(sub)
+            job.tasks_created = len(tasks)
+            session.commit()
+
+        if not tasks:
+            raise ValueError("The AI returned no tasks for this goal")
+
+        # One transaction for the goal and all of its tasks; counters are set directly
+        # since the goal is new.
+        goal = Goal(title=job.title, description=job.description, target_date=job.target_date, user_id=job.user_id,
+                    total_tasks=len(tasks), completed_tasks=0, progress=0.0)
+        session.add(goal)
+        session.flush()
+        session.add_all([
+            Task(
+                goal_id=goal.id,
+                title=sub.get('title', f"Step {i}"),
+                description=sub.get('description', ''),
+                difficulty=sub.get('difficulty', 2),
+                priority=sub.get('priority', 2),
+                category=sub.get('category', 'General'),
+                due_date=date.today(),
+                user_id=job.user_id
+            )
+            for i, sub in enumerate(tasks, 1)
+        ])
+        job.goal_id = goal.id
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        job = session.get(PlanningJob, job_id)
+        job.status = "failed"
+        job.error = str(e)[:500]
+        job.finished_at = datetime.utcnow()
+        session.commit()
+        print(f"Planning job {job_id} failed: {e}")
+    finally:
+        with _running_lock:
+            _running.discard(job_id)
+        session.close()
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _running_lock:
+            job_ids = list(_running)
+        if not job_ids:
+            continue
+        session = SessionLocal()
+        try:
+            session.execute(update(PlanningJob).where(PlanningJob.id.in_(job_ids), PlanningJob.status == "running")
+                            .values(heartbeat_at=datetime.utcnow()))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Planning job heartbeat failed: {e}")
+        finally:
+            session.close()
+
+
+def _start_heartbeat():
+    """Starts this process's heartbeat thread on its first job."""
+    global _heartbeat_thread
+    with _running_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="planning-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def _requeue(session, condition):
+    """Atomically moves the jobs matching `condition` back to queued and runs them here. Returns their ids."""
+    job_ids = [job_id for (job_id,) in session.execute(
+        update(PlanningJob).where(condition).values(status="queued").returning(PlanningJob.id),
+        execution_options={"synchronize_session": False})]
+    session.commit()
+    for job_id in job_ids:
+        _executor.submit(_run_job, job_id)
+    return job_ids
+
+
+def _stale_running():
+    last_seen = func.coalesce(PlanningJob.heartbeat_at, PlanningJob.started_at)
+    return (PlanningJob.status == "running") & (last_seen < datetime.utcnow() - STALE_AFTER)
+
+
+def sweep_stale_jobs(force=False):
+    """
+    Re-queues running jobs whose process stopped sending heartbeats. Runs at most
+    once per SWEEP_INTERVAL per process unless `force`. Returns the re-queued ids.
+    """
+    global _last_sweep
+    if not force and time.monotonic() - _last_sweep < SWEEP_INTERVAL:
+        return []
+    _last_sweep = time.monotonic()
+    session = SessionLocal()
+    try:
+        return _requeue(session, _stale_running())
+    finally:
+        session.close()
+
+
+def recover_jobs():
+    """Re-queue jobs left queued, or orphaned while running, by a previous process (once per process)."""
+    global _recovered
+    if _recovered:
+        return
+    with _recover_lock:
+        if _recovered:
+            return
+        session = SessionLocal()
+        queued = [job_id for (job_id,) in session.query(PlanningJob.id).filter(PlanningJob.status == "queued")]
+        session.close()
+        for job_id in queued:
+            _executor.submit(_run_job, job_id)
+        sweep_stale_jobs(force=True)
+        _recovered = True
+
+
+def get_queue_depth(user_id=None):
+    """Number of jobs queued or running (for one user, or overall). Polling it also sweeps orphaned jobs."""
+    sweep_stale_jobs()
+    session = SessionLocal()
+    query = session.query(func.count(PlanningJob.id)).filter(PlanningJob.status.in_(ACTIVE_STATUSES))
+    if user_id is not None:
+        query = query.filter(PlanningJob.user_id == user_id)
+    depth = query.scalar()
+    session.close()
+    return depth
+
+
+def get_recent_jobs(user_id, limit=5):
+    session = SessionLocal()
+    jobs = session.query(PlanningJob).filter(PlanningJob.user_id == user_id).order_by(PlanningJob.id.desc()).limit(limit).all()
+    session.close()
+    return jobs
@@ -1,45 +1,295 @@
 import os
 import json
 import re
-from typing import List, Dict
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Iterator, Optional
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
+import perf
+from llm_cache import get_decomposition_cache, make_key
 
 load_dotenv()
 
-class GoalAgent:
+# Bump whenever the decomposition prompt changes so cached plans are not reused.
+PROMPT_VERSION = 1
+
+DEFAULT_MODEL = "openrouter/free"
+OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))   # in-flight LLM calls per process
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", 10))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+
+def _api_key() -> Optional[str]:
+    """The configured OpenRouter/OpenAI key, or None for placeholders (demo mode)."""
+    api_key = os.getenv("OPENROUTER_API_KEY") or os.getenv("OPENAI_API_KEY")
+    # Check if it's a real key (starts with 'sk-') or just a placeholder
+    if api_key and (api_key.startswith("sk-") or len(api_key) > 20):
+        return api_key
+    return None
+
+class LLMRegistry:
+    """
+    Process-wide LLM clients. Clients are built lazily, one per model, and all
+    share a single keep-alive HTTP connection pool; a semaphore caps the
+    number of concurrent calls across every session in the process.
+    """
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, pool_connections=LLM_POOL_CONNECTIONS, timeout=LLM_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.pool_connections = pool_connections
+        self.timeout = timeout
+        self._clients = {}
+        self._http_client = None
+        self._lock = threading.RLock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+
+    def http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(max_connections=self.pool_connections,
+                                            max_keepalive_connections=self.pool_connections),
+                    )
+        return self._http_client
+
+    def get(self, model: str = DEFAULT_MODEL):
+        """The shared client for `model`, or None when no API key is configured."""
+        api_key = _api_key()
+        if not api_key:
+            return None
+        client = self._clients.get(model)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(model)
+                if client is None:
+                    client = ChatOpenAI(
+                        model=model,
+                        openai_api_key=api_key,
+                        openai_api_base=OPENROUTER_API_BASE,
+                        default_headers={"HTTP-Referer": "http://localhost:8501", "X-Title": "AI Productivity App"},
+                        http_client=self.http_client(),
+                        request_timeout=self.timeout,
+                    )
+                    self._clients[model] = client
+        return client
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the process's concurrent LLM call slots."""
+        with perf.timed("llm.slot_wait"):
+            self._slots.acquire()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def health(self, ping: bool = False) -> Dict:
+        """
+        Cheap health check from local state. With `ping=True` it also lists
+        models over the shared pool (one small request).
+        """
+        status = {
+            "configured": _api_key() is not None,
+            "clients": sorted(self._clients),
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "pool_connections": self.pool_connections,
+            "pool_open": self._http_client is not None and not self._http_client.is_closed,
+        }
+        if ping and status["configured"]:
+            try:
+                response = self.http_client().get(f"{OPENROUTER_API_BASE}/models", timeout=5,
+                                                  headers={"Authorization": f"Bearer {_api_key()}"})
+                status["reachable"] = response.status_code < 500
+            except httpx.HTTPError as e:
+                status["reachable"] = False
+                status["error"] = str(e)
+        return status
+
+_registry = LLMRegistry()
+
+def get_llm(model: str = DEFAULT_MODEL):
+    return _registry.get(model)
+
+def llm_slot():
+    return _registry.slot()
+
+def llm_health(ping: bool = False) -> Dict:
+    return _registry.health(ping)
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON array of objects.
+
+    Feed it text chunks as they arrive; every top-level object inside the
+    first array is returned as soon as its closing brace is seen. Text before
+    the array (e.g. a markdown fence) is ignored.
+    """
     def __init__(self):
-        # Use OpenRouter API Key
-        api_key = os.getenv("OPENROUTER_API_KEY") or os.getenv("OPENAI_API_KEY")
-        
-        # Check if it's a real key (starts with 'sk-') or just a placeholder
-        if api_key and (api_key.startswith("sk-") or len(api_key) > 20):
-            self.llm = ChatOpenAI(
-                model="openrouter/free",
-                openai_api_key=api_key,
-                openai_api_base="https://openrouter.ai/api/v1",
-                default_headers={"HTTP-Referer": "http://localhost:8501", "X-Title": "AI Productivity App"}
-            )
-        else:
-            self.llm = None  # Demo mode
-
-    def decompose_goal(self, goal_title: str, goal_description: str, custom_instructions: str = "") -> List[Dict]:
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.buffer = []
+        self.text = []  # full response, for the non-streaming fallback
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self.text.append(chunk)
+        completed = []
+        for ch in chunk:
+            if self.done:
+                break
+            if not self.in_array:
+                if ch == "[":
+                    self.in_array = True
+                continue
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                    self.buffer = [ch]
+                elif ch == "]":
+                    self.done = True
+                continue
+
+            self.buffer.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        completed.append(json.loads("".join(self.buffer)))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed task in stream: {e}")
+                    self.buffer = []
+        return completed
+
+    def full_text(self) -> str:
+        return "".join(self.text)
+
+class GoalAgent:
+    def __init__(self, llm=None, model: str = DEFAULT_MODEL):
+        self.model = model
+        # Injected model (e.g. a local fake streaming LLM), else the shared client;
+        # None means demo mode.
+        self.llm = llm if llm is not None else get_llm(model)
+
+    def cache_key(self, goal_title: str, goal_description: str, custom_instructions: str = "") -> str:
+        return make_key(goal_title, goal_description, custom_instructions, self.model, PROMPT_VERSION)
+
+    def invalidate_cached_plan(self, goal_title: str, goal_description: str, custom_instructions: str = ""):
+        """Drop a cached decomposition from both cache tiers."""
+        get_decomposition_cache().invalidate(self.cache_key(goal_title, goal_description, custom_instructions))
+
+    def decompose_goal(self, goal_title: str, goal_description: str, custom_instructions: str = "",
+                       use_cache: bool = True, refresh: bool = False) -> List[Dict]:
         """
         Breaks down a long-term goal into daily actionable tasks.
+        Responses are cached; `use_cache=False` bypasses the cache entirely and
+        `refresh=True` skips the lookup but stores the new response.
+        """
+        if not self.llm:
+            return self._demo_tasks(goal_title)
+
+        cache = get_decomposition_cache() if use_cache else None
+        key = self.cache_key(goal_title, goal_description, custom_instructions)
+        if cache and not refresh:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        with perf.timed("llm.decompose"):
+            tasks = self._request_decomposition(goal_title, goal_description, custom_instructions)
+        if cache and tasks:
+            cache.set(key, tasks)
+        return tasks
+
+    def stream_decompose_goal(self, goal_title: str, goal_description: str, custom_instructions: str = "",
+                              use_cache: bool = True, refresh: bool = False) -> Iterator[Dict]:
+        """
+        Streaming variant of decompose_goal: yields each task dict as soon as
+        its JSON object is complete in the LLM's token stream, and raises if the
+        stream or parsing fails, even after some tasks were yielded. Records
+        "llm.first_task" (time to first task) and "llm.decompose_stream"
+        (total latency) in perf.
         """
         if not self.llm:
-            # Demo mode: Generate relevant sample tasks based on goal
-            return [
-                {"title": f"Research fundamentals of {goal_title}", "description": "Gather resources, tutorials, and create a learning roadmap", "difficulty": 2, "priority": 3, "category": "Learning"},
-                {"title": f"Set up environment for {goal_title}", "description": "Install necessary tools, create workspace, bookmark resources", "difficulty": 2, "priority": 3, "category": "Setup"},
-                {"title": f"Complete beginner exercises for {goal_title}", "description": "Start with basic concepts and hands-on practice", "difficulty": 3, "priority": 2, "category": "Practice"},
-                {"title": f"Build a small project for {goal_title}", "description": "Apply learned concepts in a practical mini-project", "difficulty": 4, "priority": 2, "category": "Project"},
-                {"title": f"Review and practice {goal_title} concepts", "description": "Revisit difficult topics and strengthen understanding", "difficulty": 3, "priority": 2, "category": "Review"},
-                {"title": f"Advanced topics in {goal_title}", "description": "Explore complex concepts and edge cases", "difficulty": 5, "priority": 1, "category": "Learning"}
-            ]
+            yield from self._demo_tasks(goal_title)
+            return
+
+        cache = get_decomposition_cache() if use_cache else None
+        key = self.cache_key(goal_title, goal_description, custom_instructions)
+        if cache and not refresh:
+            cached = cache.get(key)
+            if cached is not None:
+                yield from cached
+                return
 
+        start = time.perf_counter()
+        parser = JSONArrayStreamParser()
+        tasks = []
+        try:
+            with llm_slot():
+                stream = self._build_chain(custom_instructions).stream({
+                    "title": goal_title,
+                    "description": goal_description
+                })
+                for chunk in stream:
+                    for task in parser.feed(chunk):
+                        if not tasks:
+                            perf.record("llm.first_task", time.perf_counter() - start)
+                        tasks.append(task)
+                        yield task
+            if not tasks:
+                # Provider did not stream parseable objects; fall back to the whole response.
+                for task in self._parse_tasks(parser.full_text()):
+                    if not tasks:
+                        perf.record("llm.first_task", time.perf_counter() - start)
+                    tasks.append(task)
+                    yield task
+        except Exception as e:
+            # A plan cut off mid-stream must not be saved as if complete: fail the
+            # caller (the planning job records the error) rather than stop early.
+            raise RuntimeError(f"LLM stream failed after {len(tasks)} task(s): {e}") from e
+        finally:
+            perf.record("llm.decompose_stream", time.perf_counter() - start)
+
+        if cache and tasks:
+            cache.set(key, tasks)
+
+    def _demo_tasks(self, goal_title: str) -> List[Dict]:
+        # Demo mode: Generate relevant sample tasks based on goal
+        return [
+            {"title": f"Research fundamentals of {goal_title}", "description": "Gather resources, tutorials, and create a learning roadmap", "difficulty": 2, "priority": 3, "category": "Learning"},
+            {"title": f"Set up environment for {goal_title}", "description": "Install necessary tools, create workspace, bookmark resources", "difficulty": 2, "priority": 3, "category": "Setup"},
+            {"title": f"Complete beginner exercises for {goal_title}", "description": "Start with basic concepts and hands-on practice", "difficulty": 3, "priority": 2, "category": "Practice"},
+            {"title": f"Build a small project for {goal_title}", "description": "Apply learned concepts in a practical mini-project", "difficulty": 4, "priority": 2, "category": "Project"},
+            {"title": f"Review and practice {goal_title} concepts", "description": "Revisit difficult topics and strengthen understanding", "difficulty": 3, "priority": 2, "category": "Review"},
+            {"title": f"Advanced topics in {goal_title}", "description": "Explore complex concepts and edge cases", "difficulty": 5, "priority": 1, "category": "Learning"}
+        ]
+
+    def _build_chain(self, custom_instructions: str):
         prompt_text = """The user has a long-term goal: {title}
 Description: {description}
 
@@ -67,23 +317,24 @@ Return ONLY the JSON array, no other text. Example format:
         ])
 
         # Use chain syntax with StrOutputParser for clean output
-        chain = prompt | self.llm | StrOutputParser()
-        
+        return prompt | self.llm | StrOutputParser()
+
+    def _parse_tasks(self, response: str) -> List[Dict]:
+        # Extract JSON from the response (handle markdown code blocks if present)
+        json_match = re.search(r'\[[\s\S]*\]', response)
+        if json_match:
+            return json.loads(json_match.group())
+        print(f"Could not find JSON array in response: {response}")
+        return []
+
+    def _request_decomposition(self, goal_title: str, goal_description: str, custom_instructions: str) -> List[Dict]:
         try:
-            response = chain.invoke({
-                "title": goal_title,
-                "description": goal_description
-            })
-            
-            # Extract JSON from the response (handle markdown code blocks if present)
-            json_match = re.search(r'\[[\s\S]*\]', response)
-            if json_match:
-                tasks = json.loads(json_match.group())
-                return tasks
-            else:
-                print(f"Could not find JSON array in response: {response}")
-                return []
-                
+            with llm_slot():
+                response = self._build_chain(custom_instructions).invoke({
+                    "title": goal_title,
+                    "description": goal_description
+                })
+            return self._parse_tasks(response)
         except Exception as e:
             print(f"Error in LLM call or parsing: {e}")
             return []
@@ -92,19 +343,31 @@ class PrioritizerAgent:
     """
     An agent that can suggest which tasks to focus on based on difficulty and priority.
     """
-    def __init__(self):
-        api_key = os.getenv("OPENROUTER_API_KEY") or os.getenv("OPENAI_API_KEY")
-        if api_key:
-            self.llm = ChatOpenAI(
-                model="openrouter/free",
-                openai_api_key=api_key,
-                openai_api_base="https://openrouter.ai/api/v1",
-                default_headers={"HTTP-Referer": "http://localhost:8501", "X-Title": "AI Productivity App"}
-            )
-        else:
-            self.llm = None
+    def __init__(self, use_llm: bool = False):
+        # suggest_priority is rule-based today, so no client is built unless asked for.
+        self.llm = get_llm() if use_llm else None
 
     def suggest_priority(self, tasks: List[Dict]) -> List[Dict]:
         # Implementation for adaptive scheduling
         # For now, it just sorts by priority (desc) and difficulty (asc)
         return sorted(tasks, key=lambda x: (-x.get('priority', 1), x.get('difficulty', 1)))
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+def _cached_agent(key, factory):
+    agent = _agents.get(key)
+    if agent is None:
+        with _agents_lock:
+            agent = _agents.get(key)
+            if agent is None:
+                agent = _agents[key] = factory()
+    return agent
+
+def get_goal_agent() -> GoalAgent:
+    """Process-wide GoalAgent backed by the shared client."""
+    return _cached_agent("goal", GoalAgent)
+
+def get_prioritizer_agent() -> PrioritizerAgent:
+    """Process-wide rule-based PrioritizerAgent (no LLM client)."""
+    return _cached_agent("prioritizer", PrioritizerAgent)
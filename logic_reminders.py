@@ -0,0 +1,176 @@
+"""
+Task reminder scheduler.
+
+Each process keeps a min-heap of upcoming reminders per user, loaded by a
+windowed query on the (user_id, reminder_at) partial index. The per-rerun check
+is a heap peek; the database is only touched to reload an expired window or to
+record a delivery. Delivered reminders are stored in delivered_reminders, so
+each reminder fires once across sessions and processes. Write paths that change
+a reminder call reload_after_commit, so the heap is dropped only once the change
+is visible to the reload.
+"""
+import heapq
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, text, event, exc
+from database import SessionLocal, Task, DeliveredReminder, PENDING_REMINDER_CLAUSE
+
+# Reminders found later than this after their time are skipped as missed.
+REMINDER_GRACE = timedelta(minutes=15)
+# How far ahead one load reaches. The window is reloaded when it runs out, so a
+# reminder added by another process is picked up at most this late.
+REMINDER_WINDOW = timedelta(minutes=5)
+
+
+def upcoming_reminders_query(session, user_id, start, end):
+    """Pending, undelivered reminders of one user with start <= reminder_at < end."""
+    delivered = select(DeliveredReminder.id).where(
+        DeliveredReminder.task_id == Task.id, DeliveredReminder.reminder_at == Task.reminder_at)
+    return session.query(Task.reminder_at, Task.id, Task.title).filter(
+        Task.user_id == user_id, text(PENDING_REMINDER_CLAUSE),
+        Task.reminder_at >= start, Task.reminder_at < end,
+        ~delivered.exists(),
+    )
+
+
+def record_delivery(user_id, due, now=None):
+    """
+    Records (task_id, reminder_at, title) reminders as delivered and returns the
+    (task_id, title) pairs this call delivered. Skips tasks completed, deleted or
+    rescheduled since they were loaded, and reminders another session got to first.
+    """
+    now = now or datetime.now()
+    session = SessionLocal()
+    current = dict(session.query(Task.id, Task.reminder_at).filter(
+        Task.id.in_([task_id for task_id, _, _ in due]), Task.status != "Completed").all())
+    delivered = []
+    for task_id, reminder_at, title in due:
+        if current.get(task_id) != reminder_at:
+            continue
+        session.add(DeliveredReminder(task_id=task_id, user_id=user_id, reminder_at=reminder_at, delivered_at=now))
+        try:
+            session.commit()
+        except exc.IntegrityError:
+            session.rollback()
+            continue
+        delivered.append((task_id, title))
+    session.close()
+    return delivered
+
+
+class ReminderScheduler:
+    """Per-process min-heaps of upcoming (reminder_at, task_id, title), one per user."""
+
+    def __init__(self, window: timedelta = REMINDER_WINDOW, grace: timedelta = REMINDER_GRACE):
+        self.window = window
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._heaps = {}
+        self._horizons = {}  # user_id -> end of the loaded window
+        self._generations = {}  # user_id -> invalidation count, so a load that raced one is discarded
+
+    def invalidate(self, user_id):
+        """
+        Drops a user's heap so the next check reloads it. Write paths use
+        reload_after_commit rather than calling this before their commit.
+        """
+        with self._lock:
+            self._heaps.pop(user_id, None)
+            self._horizons.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def _load(self, user_id, now):
+        with self._lock:
+            generation = self._generations.get(user_id, 0)
+        session = SessionLocal()
+        rows = upcoming_reminders_query(session, user_id, now - self.grace, now + self.window).all()
+        session.close()
+        heap = [tuple(row) for row in rows]
+        heapq.heapify(heap)
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return  # invalidated mid-load: these rows may predate the change; reload next check
+            self._heaps[user_id] = heap
+            self._horizons[user_id] = now + self.window
+
+    def pop_due(self, user_id, now=None):
+        """
+        Returns (task_id, title) for each of the user's reminders that has come due,
+        recording it as delivered. Most calls only peek at the heap.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            horizon = self._horizons.get(user_id)
+        if horizon is None or horizon <= now:
+            self._load(user_id, now)
+
+        due = []
+        with self._lock:
+            heap = self._heaps.get(user_id, [])
+            while heap and heap[0][0] <= now:
+                reminder_at, task_id, title = heapq.heappop(heap)
+                if now - reminder_at < self.grace:
+                    due.append((task_id, reminder_at, title))
+        return record_delivery(user_id, due, now) if due else []
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._heaps), "queued": sum(len(heap) for heap in self._heaps.values())}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_reminder_scheduler() -> ReminderScheduler:
+    """Process-wide scheduler, created on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ReminderScheduler()
+    return _scheduler
+
+
+def reload_after_commit(session, user_id):
+    """Reloads the user's reminder heap once `session` commits (nothing happens on rollback)."""
+    if user_id is not None:
+        session.info.setdefault("reminder_users", set()).add(user_id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed_reminders(session):
+    for user_id in session.info.pop("reminder_users", ()):
+        get_reminder_scheduler().invalidate(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_reminder_users(session):
+    session.info.pop("reminder_users", None)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from database import init_db, explain
+
+    parser = argparse.ArgumentParser(description="Inspect a user's upcoming reminders")
+    parser.add_argument("--user", type=int, required=True)
+    parser.add_argument("--hours", type=float, default=24, help="How far ahead to list")
+    args = parser.parse_args()
+    init_db()
+
+    now = datetime.now()
+    session = SessionLocal()
+    query = upcoming_reminders_query(session, args.user, now - REMINDER_GRACE, now + timedelta(hours=args.hours))
+    for reminder_at, task_id, title in query.order_by(Task.reminder_at).all():
+        print(f"{reminder_at:%Y-%m-%d %H:%M}  #{task_id}  {title}")
+    print("\n".join(explain(query)))
+    session.close()
+
+    scheduler = get_reminder_scheduler()
+    scheduler.pop_due(args.user, now - timedelta(days=365))  # load a window that is not yet due
+    start = time.perf_counter()
+    for _ in range(10000):
+        scheduler.pop_due(args.user, now - timedelta(days=365))
+    print(f"Warm check: {(time.perf_counter() - start) / 10000 * 1e6:.1f} µs")
@@ -0,0 +1,163 @@
+"""
+Daily rollups: completed tasks, difficulty points and seconds tracked per user,
+day and category. The task and timer write paths add their deltas in the
+caller's transaction with one upsert, so charts read a few pre-aggregated rows
+with one primary-key range scan instead of scanning tasks and timer sessions.
+rebuild_rollups() recomputes them from source; `python logic_rollups.py check`
+reports drift.
+"""
+from collections import defaultdict
+from sqlalchemy import Date, Integer, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from cache import cached
+from database import DailyRollup, SessionLocal, Task, TimerSession, touch_user
+from logic_analytics import stats_day
+
+DEFAULT_CATEGORY = "General"
+ROLLUP_KEY = ("user_id", "day", "category")
+ROLLUP_COUNTS = ("tasks_completed", "difficulty_points", "seconds_tracked")
+
+
+def completion_deltas(tasks, sign=+1):
+    """
+    Rollup deltas {(day, category): (tasks, points, seconds)} for completing
+    (sign=+1) or reversing (sign=-1) `tasks`: ORM tasks or rows with category,
+    difficulty, completed_at and due_date.
+    """
+    deltas = defaultdict(lambda: (0, 0, 0))
+    for task in tasks:
+        key = (stats_day(task), task.category or DEFAULT_CATEGORY)
+        count, points, seconds = deltas[key]
+        deltas[key] = (count + sign, points + sign * (task.difficulty or 1), seconds)
+    return deltas
+
+
+def tracked_deltas(sessions, sign=+1):
+    """Rollup deltas for closed timer sessions given as (ended_at, seconds, category) tuples."""
+    deltas = defaultdict(lambda: (0, 0, 0))
+    for ended_at, seconds, category in sessions:
+        if ended_at is None or not seconds:
+            continue
+        key = (ended_at.date(), category or DEFAULT_CATEGORY)
+        count, points, total = deltas[key]
+        deltas[key] = (count, points, total + sign * seconds)
+    return deltas
+
+
+def merge_deltas(*deltas):
+    merged = defaultdict(lambda: (0, 0, 0))
+    for delta in deltas:
+        for key, values in delta.items():
+            merged[key] = tuple(a + b for a, b in zip(merged[key], values))
+    return merged
+
+
+def apply_rollup_deltas(session, user_id, deltas):
+    """
+    Adds rollup deltas to one user's rows with a single upsert; rows that drop to
+    zero are removed. Runs inside the caller's transaction; the caller commits.
+    """
+    rows = [dict(zip(ROLLUP_KEY + ROLLUP_COUNTS, (user_id, day, category, *values)))
+            for (day, category), values in deltas.items() if any(values)]
+    if user_id is None or not rows:
+        return
+    dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(DailyRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={name: getattr(DailyRollup, name) + getattr(stmt.excluded, name) for name in ROLLUP_COUNTS})
+    session.execute(stmt, rows)
+    if any(value < 0 for row in rows for value in (row[name] for name in ROLLUP_COUNTS)):
+        session.execute(delete(DailyRollup).where(
+            DailyRollup.user_id == user_id, DailyRollup.tasks_completed == 0,
+            DailyRollup.difficulty_points == 0, DailyRollup.seconds_tracked == 0))
+    touch_user(session, user_id)
+
+
+def rollups_query(user_ids=None):
+    """(user_id, day, category, tasks, points, seconds) aggregated from tasks and timer sessions: the source of truth."""
+    category = func.coalesce(Task.category, DEFAULT_CATEGORY)
+    completions = select(
+        Task.user_id.label("user_id"),
+        func.coalesce(func.date(Task.completed_at), Task.due_date, type_=Date).label("day"),
+        category.label("category"),
+        literal(1, Integer).label("tasks"),
+        func.coalesce(Task.difficulty, 1).label("points"),
+        literal(0, Integer).label("seconds"),
+    ).where(Task.status == "Completed", Task.user_id.isnot(None))
+    tracked = select(
+        Task.user_id, func.date(TimerSession.ended_at, type_=Date), category,
+        literal(0, Integer), literal(0, Integer), TimerSession.duration,
+    ).join(Task, Task.id == TimerSession.task_id).where(TimerSession.duration > 0, Task.user_id.isnot(None))
+    if user_ids is not None:
+        completions = completions.where(Task.user_id.in_(user_ids))
+        tracked = tracked.where(Task.user_id.in_(user_ids))
+    both = union_all(completions, tracked).subquery()
+    return select(
+        both.c.user_id, both.c.day, both.c.category,
+        func.sum(both.c.tasks), func.sum(both.c.points), func.sum(both.c.seconds),
+    ).group_by(both.c.user_id, both.c.day, both.c.category)
+
+
+def rebuild_rollups(session, user_ids=None):
+    """Recomputes rollups from tasks and timer sessions with one INSERT ... SELECT. Returns the row count."""
+    query = delete(DailyRollup)
+    if user_ids is not None:
+        query = query.where(DailyRollup.user_id.in_(user_ids))
+        for user_id in user_ids:
+            touch_user(session, user_id)
+    session.execute(query)
+    return session.execute(insert(DailyRollup).from_select(ROLLUP_KEY + ROLLUP_COUNTS, rollups_query(user_ids))).rowcount
+
+
+@cached()
+def get_activity_heatmap(user_id, start, end):
+    """{day: (tasks completed, seconds tracked)} for days with activity between `start` and `end`, inclusive."""
+    session = SessionLocal()
+    rows = session.query(DailyRollup.day, func.sum(DailyRollup.tasks_completed), func.sum(DailyRollup.seconds_tracked)).filter(
+        DailyRollup.user_id == user_id, DailyRollup.day >= start, DailyRollup.day <= end
+    ).group_by(DailyRollup.day).all()
+    session.close()
+    return {day: (tasks, seconds) for day, tasks, seconds in rows}
+
+
+@cached()
+def get_category_breakdown(user_id, start, end):
+    """[(category, tasks completed, difficulty points, seconds tracked)] between `start` and `end`, most tasks first."""
+    session = SessionLocal()
+    tasks = func.sum(DailyRollup.tasks_completed)
+    rows = session.query(DailyRollup.category, tasks, func.sum(DailyRollup.difficulty_points), func.sum(DailyRollup.seconds_tracked)).filter(
+        DailyRollup.user_id == user_id, DailyRollup.day >= start, DailyRollup.day <= end
+    ).group_by(DailyRollup.category).order_by(tasks.desc(), DailyRollup.category).all()
+    session.close()
+    return [tuple(row) for row in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Check or rebuild daily_rollups from tasks and timer sessions")
+    parser.add_argument("command", choices=["check", "repair"])
+    parser.add_argument("--user", type=int, action="append", help="Limit to these user ids (repeatable)")
+    args = parser.parse_args()
+    init_db()
+    session = SessionLocal()
+
+    if args.command == "repair":
+        rows = rebuild_rollups(session, args.user)
+        session.commit()
+        print(f"Rebuilt {rows} rollup row(s)")
+    else:
+        expected = {tuple(row[:3]): tuple(row[3:]) for row in session.execute(rollups_query(args.user))}
+        stored = session.query(DailyRollup)
+        if args.user:
+            stored = stored.filter(DailyRollup.user_id.in_(args.user))
+        actual = {(r.user_id, r.day, r.category): (r.tasks_completed, r.difficulty_points, r.seconds_tracked) for r in stored}
+        drift = sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+        for key in drift:
+            print(f"user {key[0]} {key[1]} {key[2]}: stored={actual.get(key)} expected={expected.get(key)}")
+        print(f"{len(drift)} rollup row(s) out of sync")
+        session.close()
+        raise SystemExit(1 if drift else 0)
+    session.close()
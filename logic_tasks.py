@@ -0,0 +1,337 @@
+"""
+Task write paths and list queries. Each write path mutates the task and every
+derived counter in the caller's session, so one commit covers the change and
+its bookkeeping.
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import Date, Integer, case, and_, or_, update, delete, select, text, literal_column
+from database import (Goal, Task, User, DeliveredReminder, TimerSession, PENDING_TASK_CLAUSE, touch_user,
+                      DUE_SORT_KEY, PRIORITY_SORT_KEY, NO_DUE_DATE, NO_PRIORITY)
+from logic_analytics import apply_completion_delta, apply_completion_counts, stats_day
+from logic_badges import dispatch, EARLY_BIRD_HOUR, EVENT_TASK_COMPLETED, EVENT_STREAK_CHANGED, EVENT_GOAL_COMPLETED
+from logic_reminders import reload_after_commit
+from logic_rollups import apply_rollup_deltas, completion_deltas, tracked_deltas, merge_deltas
+from logic_timers import stop_task_timer, stop_timer_for_tasks
+
+
+def _adjust_goal_counters(session, goal_id, total_delta=0, completed_delta=0):
+    """
+    Atomically shifts a goal's counters and recomputes progress in one UPDATE.
+    Returns +1 if the goal just became completed, -1 if it just stopped being so.
+    """
+    if goal_id is None or (total_delta == 0 and completed_delta == 0):
+        return 0
+    total = Goal.total_tasks + total_delta
+    completed = Goal.completed_tasks + completed_delta
+    row = session.execute(
+        update(Goal).where(Goal.id == goal_id).values({
+            Goal.total_tasks: total,
+            Goal.completed_tasks: completed,
+            Goal.progress: case((total > 0, completed * 100.0 / total), else_=0.0),
+            Goal.is_completed: case((and_(total > 0, completed == total), True), else_=False),
+        }).returning(Goal.total_tasks, Goal.completed_tasks),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if row is None:
+        return 0
+    new_total, new_completed = row
+    old_total, old_completed = new_total - total_delta, new_completed - completed_delta
+    was_done = old_total > 0 and old_completed == old_total
+    is_done = new_total > 0 and new_completed == new_total
+    return int(is_done) - int(was_done)
+
+
+def _adjust_user_counters(session, user_id, completed_delta=0, early_delta=0, goals_delta=0, streak=None):
+    """Atomically shifts the per-user counters that badge rules check."""
+    if user_id is None:
+        return
+    values = {
+        User.tasks_completed_total: User.tasks_completed_total + completed_delta,
+        User.early_completions: User.early_completions + early_delta,
+        User.goals_completed_total: User.goals_completed_total + goals_delta,
+    }
+    if streak is not None:
+        values[User.best_streak] = case((User.best_streak < streak, streak), else_=User.best_streak)
+    session.query(User).filter(User.id == user_id).update(values, synchronize_session=False)
+
+
+def _is_early(task):
+    return task.completed_at is not None and task.completed_at.hour < EARLY_BIRD_HOUR
+
+
+def _reschedule_reminders(session, task):
+    """The task's reminder appeared, moved or stopped applying: reload its owner's reminder heap after the commit."""
+    if task.reminder_at is not None:
+        reload_after_commit(session, task.user_id)
+
+
+def add_task(session, task):
+    """Adds a new task and counts it towards its goal."""
+    session.add(task)
+    goals_delta = _adjust_goal_counters(session, task.goal_id, +1, +1 if task.status == "Completed" else 0)
+    if task.status == "Completed":
+        apply_rollup_deltas(session, task.user_id, completion_deltas([task]))
+    if goals_delta:
+        _adjust_user_counters(session, task.user_id, goals_delta=goals_delta)
+    _reschedule_reminders(session, task)
+    return task
+
+
+def set_reminder(session, task, reminder_at):
+    """Sets or clears (None) a task's reminder time."""
+    if task.reminder_at == reminder_at:
+        return
+    task.reminder_at = reminder_at
+    reload_after_commit(session, task.user_id)
+
+
+def complete_task(session, task, completed_at=None):
+    """
+    Marks a task completed, stops its running timer, credits the user's stats
+    for that day and evaluates the badge rules subscribed to the resulting events.
+    """
+    if task.status == "Completed":
+        return None
+    task.status = "Completed"
+    task.completed_at = completed_at or datetime.now()
+    stop_task_timer(session, task, task.completed_at)
+    _reschedule_reminders(session, task)
+    stats = apply_completion_delta(session, task.user_id, stats_day(task), task.difficulty, +1)
+    apply_rollup_deltas(session, task.user_id, completion_deltas([task]))
+    goals_delta = _adjust_goal_counters(session, task.goal_id, completed_delta=+1)
+    streak_changed = stats.tasks_completed == 1
+    _adjust_user_counters(session, task.user_id, +1, int(_is_early(task)), goals_delta,
+                          streak=stats.streak_count if streak_changed else None)
+
+    events = [EVENT_TASK_COMPLETED]
+    if streak_changed:
+        events.append(EVENT_STREAK_CHANGED)
+    if goals_delta > 0:
+        events.append(EVENT_GOAL_COMPLETED)
+    dispatch(session, task.user_id, events)
+    return stats
+
+
+def uncomplete_task(session, task):
+    """Moves a completed task back to Pending and reverses its stats credit."""
+    if task.status != "Completed":
+        return None
+    apply_rollup_deltas(session, task.user_id, completion_deltas([task], -1))
+    goals_delta = _adjust_goal_counters(session, task.goal_id, completed_delta=-1)
+    _adjust_user_counters(session, task.user_id, -1, -int(_is_early(task)), goals_delta)
+    day = stats_day(task)
+    task.status = "Pending"
+    task.completed_at = None
+    _reschedule_reminders(session, task)
+    return apply_completion_delta(session, task.user_id, day, task.difficulty, -1)
+
+
+def delete_task(session, task):
+    """Deletes a task, reversing its stats and rollup credit for completion and tracked time."""
+    completed = task.status == "Completed"
+    goals_delta = _adjust_goal_counters(session, task.goal_id, -1, -1 if completed else 0)
+    if completed or goals_delta:
+        _adjust_user_counters(session, task.user_id, -int(completed), -int(completed and _is_early(task)), goals_delta)
+    if goals_delta > 0:
+        dispatch(session, task.user_id, [EVENT_GOAL_COMPLETED])
+    timers = session.execute(
+        delete(TimerSession).where(TimerSession.task_id == task.id).returning(TimerSession.ended_at, TimerSession.duration),
+        execution_options={"synchronize_session": False},
+    ).all()
+    apply_rollup_deltas(session, task.user_id, merge_deltas(
+        completion_deltas([task] if completed else [], -1),
+        tracked_deltas([(ended_at, duration, task.category) for ended_at, duration in timers], -1)))
+    if task.reminder_at is not None:
+        session.query(DeliveredReminder).filter(DeliveredReminder.task_id == task.id).delete(synchronize_session=False)
+        _reschedule_reminders(session, task)
+    session.delete(task)
+    if completed:
+        apply_completion_delta(session, task.user_id, stats_day(task), task.difficulty, -1)
+
+
+def reassign_task(session, task, goal_id):
+    """Moves a task to another goal (or none), shifting both goals' counters."""
+    if task.goal_id == goal_id:
+        return
+    completed = 1 if task.status == "Completed" else 0
+    goals_delta = _adjust_goal_counters(session, task.goal_id, -1, -completed)
+    goals_delta += _adjust_goal_counters(session, goal_id, +1, +completed)
+    task.goal_id = goal_id
+    if goals_delta:
+        _adjust_user_counters(session, task.user_id, goals_delta=goals_delta)
+        if goals_delta > 0:
+            dispatch(session, task.user_id, [EVENT_GOAL_COMPLETED])
+
+
+# --- Bulk actions ---
+# Each applies one set-based statement to the user's selected tasks, then settles
+# stats, goal and badge counters once for the whole batch.
+def complete_tasks(session, user_id, task_ids, completed_at=None):
+    """Bulk complete_task over the user's pending `task_ids`. Returns how many were completed."""
+    completed_at = completed_at or datetime.now()
+    rows = session.execute(
+        update(Task).where(Task.user_id == user_id, Task.id.in_(task_ids), Task.status != "Completed")
+        .values(status="Completed", completed_at=completed_at)
+        .returning(Task.id, Task.goal_id, Task.difficulty, Task.category, Task.completed_at, Task.due_date, Task.reminder_at),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not rows:
+        return 0
+    touch_user(session, user_id)
+    stop_timer_for_tasks(session, user_id, {row.id for row in rows}, completed_at)
+    if any(row.reminder_at is not None for row in rows):
+        reload_after_commit(session, user_id)
+
+    count = len(rows)
+    stats = apply_completion_counts(session, user_id, completed_at.date(), count, sum(row.difficulty or 1 for row in rows))
+    apply_rollup_deltas(session, user_id, completion_deltas(rows))
+    goals_delta = sum(_adjust_goal_counters(session, goal_id, completed_delta=n)
+                      for goal_id, n in Counter(row.goal_id for row in rows).items())
+    streak_changed = stats.tasks_completed == count
+    _adjust_user_counters(session, user_id, count, count if completed_at.hour < EARLY_BIRD_HOUR else 0, goals_delta,
+                          streak=stats.streak_count if streak_changed else None)
+
+    events = [EVENT_TASK_COMPLETED]
+    if streak_changed:
+        events.append(EVENT_STREAK_CHANGED)
+    if goals_delta > 0:
+        events.append(EVENT_GOAL_COMPLETED)
+    dispatch(session, user_id, events)
+    return count
+
+
+def delete_tasks(session, user_id, task_ids):
+    """Bulk delete_task over the user's `task_ids`. Returns how many were deleted."""
+    owned = select(Task.id).where(Task.user_id == user_id, Task.id.in_(task_ids))
+    timers = session.execute(
+        delete(TimerSession).where(TimerSession.task_id.in_(owned))
+        .returning(TimerSession.task_id, TimerSession.ended_at, TimerSession.duration),
+        execution_options={"synchronize_session": False},
+    ).all()
+    session.execute(delete(DeliveredReminder).where(DeliveredReminder.task_id.in_(owned)), execution_options={"synchronize_session": False})
+    rows = session.execute(
+        delete(Task).where(Task.user_id == user_id, Task.id.in_(task_ids))
+        .returning(Task.id, Task.goal_id, Task.status, Task.category, Task.difficulty, Task.completed_at, Task.due_date,
+                   Task.reminder_at),
+        execution_options={"synchronize_session": False},
+    ).all()
+    if not rows:
+        return 0
+    touch_user(session, user_id)
+    if any(row.reminder_at is not None for row in rows):
+        reload_after_commit(session, user_id)
+
+    completed = [row for row in rows if row.status == "Completed"]
+    by_day = {}
+    for row in completed:
+        tasks, points = by_day.get(stats_day(row), (0, 0))
+        by_day[stats_day(row)] = (tasks + 1, points + (row.difficulty or 1))
+    # Latest day first: when an earlier day recomputes the streaks after it, the
+    # later days' deltas are already in and are not applied twice.
+    for day, (tasks, points) in sorted(by_day.items(), reverse=True):
+        apply_completion_counts(session, user_id, day, -tasks, -points)
+    categories = {row.id: row.category for row in rows}
+    apply_rollup_deltas(session, user_id, merge_deltas(
+        completion_deltas(completed, -1),
+        tracked_deltas([(ended_at, duration, categories[task_id]) for task_id, ended_at, duration in timers], -1)))
+
+    totals = Counter(row.goal_id for row in rows)
+    completions = Counter(row.goal_id for row in completed)
+    goals_delta = sum(_adjust_goal_counters(session, goal_id, -n, -completions[goal_id]) for goal_id, n in totals.items())
+    early = sum(1 for row in completed if _is_early(row))
+    if completed or goals_delta:
+        _adjust_user_counters(session, user_id, -len(completed), -early, goals_delta)
+    if goals_delta > 0:
+        dispatch(session, user_id, [EVENT_GOAL_COMPLETED])
+    return len(rows)
+
+
+def update_tasks(session, user_id, task_ids, due_date=None, priority=None, category=None):
+    """
+    Reschedules, re-prioritizes and/or re-categorizes the user's pending `task_ids`
+    in one UPDATE. Re-categorizing moves their tracked time to the new category's rollups.
+    """
+    values = {key: value for key, value in (("due_date", due_date), ("priority", priority), ("category", category))
+              if value is not None}
+    if not values:
+        return 0
+    touch_user(session, user_id)
+    if category is not None:
+        moved = session.execute(
+            select(TimerSession.ended_at, TimerSession.duration, Task.category)
+            .join(Task, Task.id == TimerSession.task_id)
+            .where(Task.user_id == user_id, Task.id.in_(task_ids), Task.status != "Completed",
+                   or_(Task.category.is_(None), Task.category != category), TimerSession.duration > 0)
+        ).all()
+        apply_rollup_deltas(session, user_id, merge_deltas(
+            tracked_deltas(moved, -1), tracked_deltas([(ended_at, seconds, category) for ended_at, seconds, _ in moved])))
+    return session.execute(
+        update(Task).where(Task.user_id == user_id, Task.id.in_(task_ids), Task.status != "Completed").values(values),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+
+# --- Task lists ---
+TASK_CATEGORIES = ["General", "Learning", "Coding", "Health", "Work", "Personal"]
+PAGE_SIZES = (10, 25, 50, 100, 500)
+# Sort key per Task attribute: (SQL expression, value standing in for NULL). The
+# nullable columns sort by the same coalesce() the keyset indexes are built on.
+SORT_KEYS = {
+    "due_date": (literal_column(DUE_SORT_KEY, Date), NO_DUE_DATE),
+    "priority": (literal_column(PRIORITY_SORT_KEY, Integer), NO_PRIORITY),
+    "id": (Task.id, None),
+}
+# Keyset sort orders as (attribute, descending) pairs. id comes last so the order
+# is total; each pending order is served by its own partial index in database.py.
+TASK_SORTS = {
+    "due": (("due_date", False), ("priority", True), ("id", False)),
+    "priority": (("priority", True), ("due_date", False), ("id", False)),
+    "newest": (("id", True),),
+}
+
+
+def _after(order, cursor):
+    """
+    Rows strictly after `cursor` in `order`. The leading range term on the first
+    column lets the index seek straight to the page instead of scanning up to it.
+    """
+    clause = None
+    for (name, descending), value in reversed(list(zip(order, cursor))):
+        column = SORT_KEYS[name][0]
+        beyond = column < value if descending else column > value
+        clause = beyond if clause is None else or_(beyond, and_(column == value, clause))
+    first, descending = SORT_KEYS[order[0][0]][0], order[0][1]
+    return and_(first <= cursor[0] if descending else first >= cursor[0], clause)
+
+
+def _cursor(task, order):
+    """The sort key values of `task`, NULLs replaced by their sentinels."""
+    values = (getattr(task, name) for name, _ in order)
+    return tuple(SORT_KEYS[name][1] if value is None else value for (name, _), value in zip(order, values))
+
+
+def list_tasks(session, user_id, completed=False, sort="due", after=None, limit=25,
+               category=None, priority=None, search=None):
+    """
+    One page of a user's pending (or completed) tasks in `sort` order, with the
+    filters applied in SQL. Returns (tasks, cursor): pass `cursor` back as `after`
+    for the next page; it is None on the last page.
+    """
+    order = TASK_SORTS[sort]
+    query = session.query(Task).filter(
+        Task.user_id == user_id, Task.status == "Completed" if completed else text(PENDING_TASK_CLAUSE))
+    if category:
+        query = query.filter(Task.category == category)
+    if priority:
+        query = query.filter(Task.priority == priority)
+    if search:
+        query = query.filter(Task.title.icontains(search, autoescape=True))
+    if after is not None:
+        query = query.filter(_after(order, after))
+    columns = ((SORT_KEYS[name][0], descending) for name, descending in order)
+    tasks = query.order_by(*(column.desc() if descending else column for column, descending in columns)).limit(limit + 1).all()
+    if len(tasks) <= limit:
+        return tasks, None
+    tasks = tasks[:limit]
+    return tasks, _cursor(tasks[-1], order)
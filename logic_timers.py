@@ -0,0 +1,118 @@
+"""
+Task timers. Each start/stop is a row in timer_sessions, so a running timer
+survives browser reloads and server restarts. A partial unique index allows at
+most one open session per user. Task.time_spent is kept equal to the SUM of its
+sessions' durations and can be rebuilt from them with one aggregate. Closed
+sessions are also credited to the daily rollups (logic_rollups).
+"""
+from datetime import datetime
+from sqlalchemy import func, select, update, text
+from database import Task, TimerSession, OPEN_TIMER_CLAUSE
+from logic_rollups import apply_rollup_deltas, tracked_deltas
+
+
+def get_open_session(session, user_id):
+    """The user's running timer session, or None."""
+    return session.query(TimerSession).filter(
+        TimerSession.user_id == user_id, text(OPEN_TIMER_CLAUSE)).first()
+
+
+def _close(session, timer, now):
+    timer.ended_at = now
+    timer.duration = max(int((now - timer.started_at).total_seconds()), 0)
+    task = session.execute(
+        update(Task).where(Task.id == timer.task_id).values(time_spent=func.coalesce(Task.time_spent, 0) + timer.duration)
+        .returning(Task.user_id, Task.category),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if task is not None:
+        apply_rollup_deltas(session, task.user_id, tracked_deltas([(now, timer.duration, task.category)]))
+    return timer
+
+
+def start_timer(session, user_id, task_id, now=None):
+    """
+    Starts timing a task, stopping the user's other running timer first.
+    Returns (new session, closed session or None).
+    """
+    now = now or datetime.now()
+    running = get_open_session(session, user_id)
+    if running and running.task_id == task_id:
+        return running, None
+    closed = _close(session, running, now) if running else None
+    timer = TimerSession(user_id=user_id, task_id=task_id, started_at=now)
+    session.add(timer)
+    session.flush()  # the open-session index rejects a concurrent start here
+    return timer, closed
+
+
+def stop_timer(session, user_id, now=None):
+    """Stops the user's running timer and credits its duration to the task. Returns the closed session or None."""
+    running = get_open_session(session, user_id)
+    return _close(session, running, now or datetime.now()) if running else None
+
+
+def stop_task_timer(session, task, now=None):
+    """Stops the task's running timer, if any (used when the task is completed)."""
+    if task.user_id is None:
+        return None
+    running = get_open_session(session, task.user_id)
+    if running is None or running.task_id != task.id:
+        return None
+    closed = _close(session, running, now or datetime.now())
+    session.expire(task, ['time_spent'])
+    return closed
+
+
+def stop_timer_for_tasks(session, user_id, task_ids, now=None):
+    """Stops the user's running timer if it is on one of `task_ids` (used by bulk complete)."""
+    running = get_open_session(session, user_id)
+    if running is None or running.task_id not in task_ids:
+        return None
+    return _close(session, running, now or datetime.now())
+
+
+def time_spent_query(task_ids=None):
+    """SUM of closed session durations per task: the source of truth for Task.time_spent."""
+    query = select(TimerSession.task_id, func.sum(TimerSession.duration)).where(
+        TimerSession.duration.isnot(None)).group_by(TimerSession.task_id)
+    return query.where(TimerSession.task_id.in_(task_ids)) if task_ids is not None else query
+
+
+def recompute_time_spent(session, user_ids=None):
+    """Rebuilds Task.time_spent from timer_sessions with one correlated aggregate UPDATE."""
+    total = select(func.coalesce(func.sum(TimerSession.duration), 0)).where(
+        TimerSession.task_id == Task.id).scalar_subquery()
+    query = update(Task).values(time_spent=total)
+    if user_ids is not None:
+        query = query.where(Task.user_id.in_(user_ids))
+    return session.execute(query, execution_options={"synchronize_session": False}).rowcount
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db, SessionLocal
+
+    parser = argparse.ArgumentParser(description="Check or rebuild Task.time_spent from timer_sessions")
+    parser.add_argument("command", choices=["check", "repair"])
+    parser.add_argument("--user", type=int, action="append", help="Limit to these user ids (repeatable)")
+    args = parser.parse_args()
+    init_db()
+    session = SessionLocal()
+
+    if args.command == "repair":
+        updated = recompute_time_spent(session, args.user)
+        session.commit()
+        print(f"Rebuilt time_spent for {updated} tasks")
+    else:
+        sums = dict(session.execute(time_spent_query()).all())
+        tasks = session.query(Task.id, Task.time_spent)
+        if args.user:
+            tasks = tasks.filter(Task.user_id.in_(args.user))
+        drift = [(tid, spent or 0, sums.get(tid, 0)) for tid, spent in tasks if (spent or 0) != sums.get(tid, 0)]
+        for tid, spent, total in drift:
+            print(f"task #{tid}: time_spent={spent} sessions={total}")
+        print(f"{len(drift)} task(s) out of sync")
+        session.close()
+        raise SystemExit(1 if drift else 0)
+    session.close()
@@ -0,0 +1,529 @@
+"""
+Lightweight timing helpers used for startup and rerun reports.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_timings = {}
+
+
+def record(name: str, seconds: float):
+    """Record one timing sample (in seconds) under `name`."""
+    with _lock:
+        entry = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["last"] = seconds
+        entry["max"] = max(entry["max"], seconds)
+
+
+@contextmanager
+def timed(name: str):
+    """Context manager that records the wall time of its body under `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def get_timings() -> dict:
+    """Return a snapshot of all recorded timings."""
+    with _lock:
+        return {name: dict(entry) for name, entry in _timings.items()}
+
+
+def reset_timings():
+    with _lock:
+        _timings.clear()
+
+
+def format_report(timings: dict = None) -> str:
+    """Render timings as a fixed-width table (milliseconds)."""
+    timings = get_timings() if timings is None else timings
+    lines = [f"{'name':<32} {'count':>6} {'last ms':>10} {'avg ms':>10} {'max ms':>10}"]
+    for name in sorted(timings):
+        t = timings[name]
+        avg = t["total"] / t["count"] if t["count"] else 0.0
+        lines.append(f"{name:<32} {t['count']:>6} {t['last'] * 1000:>10.2f} {avg * 1000:>10.2f} {t['max'] * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+# --- Startup and rerun benchmarks ---
+# Modules loaded at app start, plus the heavy ones that are now imported per page.
+PROFILED_MODULES = [
+    "streamlit", "sqlalchemy", "database", "logic_analytics", "logic_tasks", "logic_jobs",
+    "pandas", "plotly.graph_objects", "logic_llm", "logic_forecast", "numpy",
+]
+PAGES = ["Dashboard", "My Tasks", "📅 Day Planner", "AI Goal Planner", "Achievements"]
+SIGN_IN = "Sign in"  # the auth page, benchmarked logged out
+
+
+def profile_imports(modules=PROFILED_MODULES) -> dict:
+    """
+    Cold import cost per module (ms), each measured in a fresh interpreter
+    with `python -X importtime`.
+    """
+    import subprocess
+    import sys
+
+    results = {}
+    for module in modules:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              capture_output=True, text=True)
+        cumulative = None
+        for line in proc.stderr.splitlines():
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative = int(parts[1].split(":")[-1]) / 1000.0
+        results[module] = cumulative
+    return results
+
+
+def _bench_app(page: str):
+    """An AppTest for app.py, logged in as the benchmark user and opened on `page`."""
+    import os
+    from streamlit.testing.v1 import AppTest
+    from database import init_db, SessionLocal, User
+
+    init_db()
+    session = SessionLocal()
+    user = session.query(User).filter(User.username == "bench").first()
+    if not user:
+        user = User(username="bench", password_hash="-")
+        session.add(user)
+        session.commit()
+    user_id = user.id
+    session.close()
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    at = AppTest.from_file(app_path, default_timeout=60)
+    if page == SIGN_IN:
+        return at
+    at.session_state["user_id"] = user_id
+    at.session_state["username"] = "bench"
+    at.session_state["navigation"] = page
+    return at
+
+
+def bench_page(page: str, runs: int = 5) -> dict:
+    """
+    First-run and warm rerun time (ms) of one page in this interpreter, via Streamlit's
+    AppTest, and the bytes a warm rerun sends to the browser.
+    """
+    at = _bench_app(page)
+
+    start = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - start
+    warm, sent_bytes = [], []
+    for _ in range(runs):
+        with _capture_messages() as sent:
+            start = time.perf_counter()
+            at.run()
+            warm.append(time.perf_counter() - start)
+        sent_bytes.append(sum(msg.ByteSize() for msg in sent))
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].value}")
+    return {"first_ms": first * 1000, "warm_ms": sorted(warm)[len(warm) // 2] * 1000,
+            "bytes": sorted(sent_bytes)[len(sent_bytes) // 2]}
+
+
+def bench_pages(pages=(SIGN_IN, *PAGES), runs: int = 5) -> dict:
+    """bench_page for every page, each in a fresh interpreter so first runs are cold."""
+    import json
+    import subprocess
+    import sys
+
+    results = {}
+    for page in pages:
+        proc = subprocess.run([sys.executable, __file__, "_page", page, str(runs)], capture_output=True, text=True)
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            raise RuntimeError(f"Benchmark failed for {page}:\n{proc.stderr[-2000:]}")
+        results[page] = json.loads(lines[-1])
+    return results
+
+
+def _running_timer(session, user_id, task_id):
+    from logic_timers import start_timer
+    start_timer(session, user_id, task_id)
+
+
+def _no_timer(session, user_id, task_id):
+    from logic_timers import stop_timer
+    stop_timer(session, user_id)
+
+
+# (page, widget key, setup(session, user_id, task_id)) for each click measured by
+# bench_clicks. `{id}` is the first pending task of the benchmark user.
+CLICKS = [
+    ("My Tasks", "start_timer_{id}", _no_timer),
+    ("My Tasks", "stop_timer_{id}", _running_timer),
+    ("My Tasks", "edit_btn_{id}", None),
+    ("My Tasks", "done_{id}", None),
+    ("📅 Day Planner", "plan_done_{id}", None),
+    ("Dashboard", "calendar_next", None),
+]
+
+
+@contextmanager
+def _capture_messages():
+    """Collect every ForwardMsg the script runner sends to the browser."""
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+
+    sent = []
+    original = ForwardMsgQueue.enqueue
+
+    def enqueue(queue, msg):
+        sent.append(msg)
+        return original(queue, msg)
+
+    ForwardMsgQueue.enqueue = enqueue
+    try:
+        yield sent
+    finally:
+        ForwardMsgQueue.enqueue = original
+
+
+@contextmanager
+def _script_cpu():
+    """
+    CPU seconds spent on script threads (callbacks plus script or fragment runs), as `cpu[0]`.
+    AppTest recompiles the script on every run, whereas a server compiles it once, so the
+    bytecode is reused here to keep compilation out of the measurement.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.scriptrunner.script_runner import ScriptRunner
+
+    cpu = [0.0]
+    original = ScriptRunner._run_script
+    get_bytecode = ScriptCache.get_bytecode
+    compiled = {}
+
+    def cached_bytecode(cache, script_path):
+        if script_path not in compiled:
+            compiled[script_path] = get_bytecode(cache, script_path)
+        return compiled[script_path]
+
+    def run_script(runner, rerun_data):
+        start = time.thread_time()
+        try:
+            return original(runner, rerun_data)
+        finally:
+            cpu[0] += time.thread_time() - start
+
+    ScriptRunner._run_script = run_script
+    ScriptCache.get_bytecode = cached_bytecode
+    try:
+        yield cpu
+    finally:
+        ScriptRunner._run_script = original
+        ScriptCache.get_bytecode = get_bytecode
+
+
+def _fragment_of(messages, key: str):
+    """Fragment id of the widget with user key `key`, or None if it lives in the main script."""
+    for msg in messages:
+        if msg.WhichOneof("type") != "delta" or msg.delta.WhichOneof("type") != "new_element":
+            continue
+        element = msg.delta.new_element
+        widget = getattr(element, element.WhichOneof("type"))
+        if getattr(widget, "id", "").endswith(f"-{key}"):
+            return msg.delta.fragment_id or None
+    return None
+
+
+def _click(at, key: str, fragment_id=None):
+    """
+    Click a button and run the rerun the browser would request: fragment-scoped when
+    the button lives in a fragment (AppTest itself always reruns the whole script).
+    """
+    from functools import partial
+    from streamlit.testing.v1 import local_script_runner
+
+    at.button(key=key).click()
+    widget_states = at._tree.get_widget_states()
+    if not fragment_id:
+        return at._run(widget_states)
+    rerun_data = local_script_runner.RerunData
+    local_script_runner.RerunData = partial(rerun_data, fragment_id_queue=[fragment_id], is_fragment_scoped_rerun=True)
+    try:
+        return at._run(widget_states)
+    finally:
+        local_script_runner.RerunData = rerun_data
+
+
+def bench_clicks(clicks=CLICKS, tasks: int = 30) -> dict:
+    """
+    Script CPU time, wall time (including AppTest's own setup) and bytes sent for one
+    click on each task action, with `tasks` pending tasks due today. Each click starts
+    from a fresh page load.
+    """
+    from datetime import date
+    from sqlalchemy import func
+    from database import SessionLocal, Task
+
+    results = {}
+    for page, key_template, setup in clicks:
+        at = _bench_app(page)
+        user_id = at.session_state["user_id"]
+        session = SessionLocal()
+        pending = session.query(Task).filter(Task.user_id == user_id, Task.status != "Completed").count()
+        for i in range(max(tasks - pending, 0)):
+            session.add(Task(title=f"Benchmark task {i}", user_id=user_id, due_date=date.today(), priority=2, difficulty=3))
+        session.commit()
+        task_id = session.query(func.min(Task.id)).filter(Task.user_id == user_id, Task.status != "Completed").scalar()
+        if setup:
+            setup(session, user_id, task_id)
+            session.commit()
+        session.close()
+
+        at = _bench_app(page)
+        key = key_template.format(id=task_id)
+        with _script_cpu() as cpu:
+            with _capture_messages() as page_load:
+                at.run()
+            fragment_id = _fragment_of(page_load, key)
+
+            cpu[0] = 0.0
+            with _capture_messages() as sent:
+                wall = time.perf_counter()
+                _click(at, key, fragment_id)
+                wall = time.perf_counter() - wall
+        if at.exception:
+            raise RuntimeError(f"{page} / {key}: {at.exception[0].value}")
+        results[f"{page}: {key_template.split('_{')[0]}"] = {
+            "cpu_ms": cpu[0] * 1000,
+            "wall_ms": wall * 1000,
+            "bytes": sum(msg.ByteSize() for msg in sent),
+            "messages": len(sent),
+            "scope": "fragment" if fragment_id else "full",
+        }
+    return results
+
+
+# --- Cache benchmarks ---
+def bench_cache(user_id: int, runs: int = 20) -> dict:
+    """Per cached read path: uncached ms, cached µs and entry bytes for one user, on the configured backend."""
+    from datetime import date, timedelta
+    from database import init_db
+    import logic_analytics, logic_badges, logic_rollups  # noqa: F401  (register their read paths)
+    from cache import CACHED_READS, get_cache, sizeof
+
+    init_db()
+    # Arguments the app passes to read paths that take more than the user id
+    year = (date.today() - timedelta(days=52 * 7 + date.today().weekday()), date.today())
+    extra_args = {"dashboard_snapshot": (date.today(), 5), "forecast": (date.today(), logic_analytics.FORECAST_MODEL, 1, 0.8),
+                  "get_activity_heatmap": year, "get_category_breakdown": year}
+    cache = get_cache()
+    results = {}
+    for name, func in sorted(CACHED_READS.items()):
+        call_args = extra_args.get(name, ())
+        start = time.perf_counter()
+        for _ in range(runs):
+            func(user_id, *call_args)
+        uncached = (time.perf_counter() - start) / runs
+        value = cache.get_or_load(user_id, name, func, *call_args)
+        start = time.perf_counter()
+        for _ in range(runs):
+            cache.get_or_load(user_id, name, func, *call_args)
+        results[name] = {"uncached_ms": uncached * 1000, "cached_us": (time.perf_counter() - start) / runs * 1e6,
+                         "bytes": sizeof(value)}
+    return results
+
+
+def _cache_worker(index, barrier, results):
+    """One process of check_shared_cache. Runs with the sqlite backend in a scratch directory."""
+    from database import SessionLocal, Task, init_db
+    from cache import get_cache
+    from logic_tasks import add_task
+
+    def count_tasks(user_id):
+        session = SessionLocal()
+        count = session.query(Task).filter(Task.user_id == user_id).count()
+        session.close()
+        return count
+
+    if index == 0:
+        init_db()  # create the scratch database before the others open it
+    barrier.wait()
+    cache = get_cache()
+    report = {"worker": index}
+    if index == 0:
+        cache.get_or_load(1, "task_count", count_tasks)
+    barrier.wait()
+    misses = cache.counters["misses"]
+    report["before"] = cache.get_or_load(1, "task_count", count_tasks)
+    report["shared_hit"] = cache.counters["misses"] == misses
+    start = time.perf_counter()
+    for _ in range(1000):
+        cache.get_or_load(1, "task_count", count_tasks)
+    report["hit_us"] = (time.perf_counter() - start) / 1000 * 1e6
+    barrier.wait()
+    if index == 1:
+        # A real write path in one process; its commit bumps user 1's version for all of them
+        session = SessionLocal()
+        add_task(session, Task(title="Cache check", user_id=1))
+        session.commit()
+        session.close()
+    barrier.wait()
+    report["after"] = cache.get_or_load(1, "task_count", count_tasks)
+    report["version"] = cache.backend.get_version(1)
+    results.put(report)
+
+
+def check_shared_cache(workers: int = 4) -> list:
+    """
+    Spawns `workers` processes on one shared sqlite cache and app database in a
+    scratch directory. Worker 0 loads an entry that the others must hit; worker 1
+    then commits a task, which every worker must see on its next lookup.
+    Returns one report per worker.
+    """
+    import multiprocessing
+    import os
+    import tempfile
+
+    context = multiprocessing.get_context("spawn")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ.update(USER_CACHE_BACKEND="sqlite", USER_CACHE_PATH=os.path.join(scratch, "user_cache.db"))
+        os.chdir(scratch)  # the app database defaults to ./productivity_app.db
+        try:
+            barrier, results = context.Barrier(workers, timeout=60), context.Queue()
+            procs = [context.Process(target=_cache_worker, args=(i, barrier, results)) for i in range(workers)]
+            for proc in procs:
+                proc.start()
+            reports = [results.get(timeout=120) for _ in procs]
+            for proc in procs:
+                proc.join()
+        finally:
+            os.chdir(cwd)
+    return sorted(reports, key=lambda r: r["worker"])
+
+
+# --- Forecast benchmarks ---
+def bench_batch_forecast(users: int = 100_000, sample: int = 2_000, horizon: int = 1) -> dict:
+    """
+    Seconds to forecast `users` synthetic users per model: logic_forecast.forecast_batch
+    in one pass vs forecast() in a per-user loop (timed on `sample` users and scaled up),
+    plus the largest difference between the two on that sample.
+    """
+    from datetime import date, timedelta
+    import numpy as np
+    from logic_forecast import MODELS, forecast, forecast_batch
+
+    rng = np.random.default_rng(0)
+    days = max(window for _, window, _ in MODELS.values())
+    start = date.today() - timedelta(days=days - 1)
+    # Users are active on a random share of days; about a third joined inside the window
+    observed = rng.random((users, days)) < rng.uniform(0.1, 0.9, (users, 1))
+    joined = np.where(rng.random(users) < 0.3, rng.integers(0, days, users), 0)
+    observed &= np.arange(days) >= joined[:, None]
+    scores = np.where(observed, rng.integers(0, 11, (users, days)) * 10.0, 0.0)
+
+    results = {}
+    for model, (_, window, _) in MODELS.items():
+        begin = time.perf_counter()
+        batch = forecast_batch(scores, observed, start, model, horizon)
+        batch_s = time.perf_counter() - begin
+
+        offset = days - window
+        begin, max_diff = time.perf_counter(), 0.0
+        for user in range(sample):
+            seen = observed[user, offset:]
+            if seen.sum() < 3:
+                continue
+            first = int(np.argmax(seen))
+            single = forecast(scores[user, offset + first:], start + timedelta(days=offset + first), model, horizon)
+            max_diff = max(max_diff, float(np.abs(np.array(single["values"]) - batch["values"][user]).max()))
+        loop_s = (time.perf_counter() - begin) * users / sample
+        results[model] = {"batch_s": batch_s, "loop_s": loop_s, "speedup": loop_s / batch_s, "max_diff": max_diff}
+    return results
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """Names of measurements more than `tolerance` slower than the baseline."""
+    regressions = []
+    for name, value in results.items():
+        if isinstance(value, dict):
+            regressions += [f"{name}.{sub}" for sub in compare_to_baseline(value, baseline.get(name, {}), tolerance)]
+        elif value is not None and baseline.get(name) and value > baseline[name] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import logging
+    import sys
+
+    if sys.argv[1:2] == ["_page"]:
+        # Internal: one page benchmark in a fresh interpreter (see bench_pages).
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(bench_page(sys.argv[2], int(sys.argv[3]))))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Startup, rerun and cache benchmarks")
+    parser.add_argument("command", choices=["imports", "reruns", "clicks", "all", "cache", "cache-check", "forecast-batch"])
+    parser.add_argument("--runs", type=int, default=5, help="Warm reruns per page, or lookups per cached read path")
+    parser.add_argument("--user", type=int, default=1, help="User for the cache benchmark")
+    parser.add_argument("--workers", type=int, default=4, help="Processes for cache-check")
+    parser.add_argument("--users", type=int, default=100_000, help="Synthetic users for forecast-batch")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Fail if results regress against this JSON file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # Streamlit warns about bare-mode imports
+
+    results = {}
+    if args.command in ("imports", "all"):
+        results["imports"] = profile_imports()
+        print(f"{'module':<28} {'cold import ms':>15}")
+        for module, ms in results["imports"].items():
+            print(f"{module:<28} {ms if ms is not None else float('nan'):>15.1f}")
+    if args.command in ("reruns", "all"):
+        results["reruns"] = bench_pages(runs=args.runs)
+        print(f"{'page':<20} {'first run ms':>14} {'warm rerun ms':>14} {'rerun bytes':>12}")
+        for page, r in results["reruns"].items():
+            print(f"{page:<20} {r['first_ms']:>14.1f} {r['warm_ms']:>14.1f} {r['bytes']:>12}")
+
+    if args.command in ("clicks", "all"):
+        results["clicks"] = bench_clicks()
+        print(f"{'action':<28} {'scope':>9} {'cpu ms':>8} {'wall ms':>8} {'bytes':>8}")
+        for action, r in results["clicks"].items():
+            print(f"{action:<28} {r['scope']:>9} {r['cpu_ms']:>8.1f} {r['wall_ms']:>8.1f} {r['bytes']:>8}")
+
+    if args.command == "cache":
+        results["cache"] = bench_cache(args.user, args.runs)
+        print(f"{'read path':<26} {'uncached ms':>12} {'cached µs':>10} {'bytes':>8}")
+        for name, r in results["cache"].items():
+            print(f"{name:<26} {r['uncached_ms']:>12.2f} {r['cached_us']:>10.1f} {r['bytes']:>8}")
+
+    if args.command == "forecast-batch":
+        results["forecast_batch"] = bench_batch_forecast(args.users)
+        print(f"{'model':<10} {'batch s':>9} {'loop s':>9} {'speedup':>8} {'max diff':>9}")
+        for model, r in results["forecast_batch"].items():
+            print(f"{model:<10} {r['batch_s']:>9.2f} {r['loop_s']:>9.1f} {r['speedup']:>7.0f}x {r['max_diff']:>9.1e}")
+
+    if args.command == "cache-check":
+        reports = check_shared_cache(args.workers)
+        print(f"{'worker':>6} {'shared hit':>11} {'hit µs':>8} {'before':>7} {'after':>6} {'version':>8}")
+        for r in reports:
+            print(f"{r['worker']:>6} {str(r['shared_hit']):>11} {r['hit_us']:>8.1f} {r['before']:>7} {r['after']:>6} {r['version']:>8}")
+        ok = all(r["before"] == 0 and r["after"] == 1 and r["version"] == 1 for r in reports) and \
+            all(r["shared_hit"] for r in reports if r["worker"] != 0)
+        print("OK: entries are shared and invalidation reached every worker" if ok else "FAILED")
+        sys.exit(0 if ok else 1)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f))
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,17 @@
+// Request notification permission
+if ('Notification' in window && Notification.permission === 'default') {
+    Notification.requestPermission();
+}
+
+// Show browser notification if permitted
+if ('Notification' in window && Notification.permission === 'granted') {
+    // Check if notification was already shown in this session
+    if (!sessionStorage.getItem('dailyReminderShown')) {
+        new Notification('🎯 Daily Target Reminder', {
+            body: 'It\'s time to set your daily targets! Stay focused and productive.',
+            icon: '🚀',
+            tag: 'daily-reminder'
+        });
+        sessionStorage.setItem('dailyReminderShown', 'true');
+    }
+}